@@ -4,8 +4,16 @@ import json
 from click import style
 from click.utils import echo
 
+from evalai.utils.archives import DirectoryArchive
 from evalai.utils.auth import get_host_url
+from evalai.utils.config import (
+    DOWNLOAD_WORKERS,
+    LARGE_FILE_THRESHOLD,
+    MAX_RATE_ENV_VAR,
+    UPLOAD_WORKERS,
+)
 from evalai.utils.common import (
+    ByteRate,
     Date,
     notify_user,
     upload_file_using_presigned_url,
@@ -23,14 +31,34 @@ from evalai.utils.challenges import (
     display_leaderboard,
 )
 from evalai.utils.submissions import (
+    convert_bytes_to,
     display_my_submission_details,
+    download_submission_files,
     get_submission_meta_attributes,
+    is_duplicate_submission,
+    is_large_file,
 )
+from evalai.utils.ratelimit import set_max_rate
 from evalai.utils.teams import participate_in_a_challenge
+from evalai.utils.uploads import (
+    get_content_hash,
+    get_file_hash,
+    get_indexed_content_hash,
+    is_regular_file,
+)
 from evalai.utils.submissions import make_submission
 from evalai.utils.urls import URLS
 
 
+# Submission fields holding the urls of the files to download
+SUBMISSION_FILE_FIELDS = {
+    "results": "submission_result_file",
+    "inputs": "input_file",
+    "stdout": "stdout_file",
+    "stderr": "stderr_file",
+}
+
+
 class Challenge(object):
     """
     Stores user input ID's.
@@ -66,7 +94,12 @@ class PhaseGroup(click.Group):
 @click.option(
     "--host", is_flag=True, help="List the challenges that you've hosted"
 )
-def challenges(ctx, participant, host):
+@click.option(
+    "--limit",
+    type=click.IntRange(min=1),
+    help="Maximum number of challenges to list",
+)
+def challenges(ctx, participant, host, limit):
     """
     Lists challenges
     """
@@ -74,9 +107,9 @@ def challenges(ctx, participant, host):
     Invoked by running `evalai challenges`
     """
     if participant or host:
-        display_participated_or_hosted_challenges(host, participant)
+        display_participated_or_hosted_challenges(host, participant, limit)
     elif ctx.invoked_subcommand is None:
-        display_all_challenge_list()
+        display_all_challenge_list(limit)
 
 
 @click.group(invoke_without_command=True)
@@ -92,36 +125,51 @@ def challenge(ctx, challenge):
 
 
 @challenges.command()
-def ongoing():
+@click.option(
+    "--limit",
+    type=click.IntRange(min=1),
+    help="Maximum number of challenges to list",
+)
+def ongoing(limit):
     """
     List all active challenges
     """
     """
     Invoked by running `evalai challenges ongoing`
     """
-    display_ongoing_challenge_list()
+    display_ongoing_challenge_list(limit)
 
 
 @challenges.command()
-def past():
+@click.option(
+    "--limit",
+    type=click.IntRange(min=1),
+    help="Maximum number of challenges to list",
+)
+def past(limit):
     """
     List all past challenges
     """
     """
     Invoked by running `evalai challenges past`
     """
-    display_past_challenge_list()
+    display_past_challenge_list(limit)
 
 
 @challenges.command()
-def future():
+@click.option(
+    "--limit",
+    type=click.IntRange(min=1),
+    help="Maximum number of challenges to list",
+)
+def future(limit):
     """
     List all upcoming challenges
     """
     """
     Invoked by running `evalai challenges future`
     """
-    display_future_challenge_list()
+    display_future_challenge_list(limit)
 
 
 @challenge.command()
@@ -166,7 +214,12 @@ def phase(ctx, json, phase):
     type=Date(format="%m/%d/%y"),
     help="End date for submissions in `mm/dd/yyyy` format.",
 )
-def submissions(ctx, start_date, end_date):
+@click.option(
+    "--limit",
+    type=click.IntRange(min=1),
+    help="Maximum number of submissions to list",
+)
+def submissions(ctx, start_date, end_date, limit):
     """
     Display submissions to a particular challenge.
     """
@@ -174,10 +227,52 @@ def submissions(ctx, start_date, end_date):
     Invoked by running `evalai challenge CHALLENGE phase PHASE submissions`.
     """
     display_my_submission_details(
-        ctx.challenge_id, ctx.phase_id, start_date, end_date
+        ctx.challenge_id, ctx.phase_id, start_date, end_date, limit
     )
 
 
+@phase.command()
+@click.pass_obj
+@click.option(
+    "--what",
+    type=click.Choice(sorted(SUBMISSION_FILE_FIELDS)),
+    multiple=True,
+    default=["results"],
+    show_default=True,
+    help="Files of the submissions to download, can be repeated",
+)
+@click.option(
+    "--out",
+    type=click.Path(file_okay=False, writable=True),
+    default=".",
+    show_default=True,
+    help="Directory the files are downloaded to",
+)
+@click.option(
+    "--workers",
+    type=click.IntRange(min=1),
+    default=DOWNLOAD_WORKERS,
+    show_default=True,
+    help="Number of files downloaded in parallel",
+)
+@click.option(
+    "--max-rate",
+    type=ByteRate(),
+    envvar=MAX_RATE_ENV_VAR,
+    help="Maximum download rate in bytes per second, such as 50M, shared by all files",
+)
+def download(ctx, what, out, workers, max_rate):
+    """
+    Download the files of your submissions to a phase.
+    """
+    """
+    Invoked by running `evalai challenge CHALLENGE phase PHASE download`
+    """
+    set_max_rate(max_rate)
+    fields = [SUBMISSION_FILE_FIELDS[kind] for kind in what]
+    download_submission_files(ctx.challenge_id, ctx.phase_id, fields, out, workers)
+
+
 @phase.command()
 @click.pass_obj
 def splits(ctx):
@@ -193,14 +288,19 @@ def splits(ctx):
 @challenge.command()
 @click.pass_obj
 @click.argument("CPS", type=int)
-def leaderboard(ctx, cps):
+@click.option(
+    "--limit",
+    type=click.IntRange(min=1),
+    help="Maximum number of leaderboard rows to list",
+)
+def leaderboard(ctx, cps, limit):
     """
     Displays the Leaderboard to a Challenge Phase Split.
     """
     """
     Invoked by running `evalai challenge CHALLENGE leaderboard CPS`.
     """
-    display_leaderboard(ctx.challenge_id, cps)
+    display_leaderboard(ctx.challenge_id, cps, limit)
 
 
 @challenge.command()
@@ -236,41 +336,146 @@ def participate(ctx, team):
 @phase.command()
 @click.pass_obj
 @click.option("--large", is_flag=True)
+@click.option(
+    "--resume",
+    is_flag=True,
+    help="Resume an interrupted upload of a large file",
+)
 @click.option("--annotation", is_flag=True)
 @click.option("--public", is_flag=True)
 @click.option("--private", is_flag=True)
 @click.option(
     "--file",
     type=click.File("rb"),
-    required=True,
-    help="File path to the submission or annotation file",
+    help="File path to the submission or annotation file, or '-' to read it from stdin",
+)
+@click.option(
+    "--file-name",
+    help="Name to submit the file with, such as predictions.json. Required with '--file -'",
 )
-def submit(ctx, file, annotation, large, public, private):
+@click.option(
+    "--dir",
+    "directory",
+    type=click.Path(exists=True, file_okay=False),
+    help="Directory to submit as a compressed tar archive",
+)
+@click.option(
+    "--compress",
+    type=click.Choice(["gzip", "zstd"]),
+    default="gzip",
+    show_default=True,
+    help="Compression of the archive of a directory",
+)
+@click.option(
+    "--workers",
+    type=click.IntRange(min=1),
+    default=UPLOAD_WORKERS,
+    show_default=True,
+    help="Number of file parts uploaded in parallel for large files",
+)
+@click.option(
+    "--max-rate",
+    type=ByteRate(),
+    envvar=MAX_RATE_ENV_VAR,
+    help="Maximum upload rate in bytes per second, such as 50M, shared by all parts",
+)
+@click.option(
+    "--skip-duplicates",
+    is_flag=True,
+    help="Skip the submission if the same file was already submitted to the phase",
+)
+def submit(
+    ctx,
+    file,
+    file_name,
+    directory,
+    compress,
+    annotation,
+    large,
+    resume,
+    public,
+    private,
+    workers,
+    max_rate,
+    skip_duplicates,
+):
     """
     For uploading submission files to evalai:
         - Invoked by running 'evalai challenge CHALLENGE phase PHASE submit --file FILE'
-        - For large files, add a '--large' option at the end of the command
+        - For large files, add a '--large' option at the end of the command. Files
+          larger than EVALAI_LARGE_FILE_THRESHOLD bytes (100 MB by default) are
+          always uploaded this way
+        - To continue an interrupted upload of a large file, add the '--resume' option
+        - To read the file from stdin, use '--file -' along with '--file-name NAME'. It is
+          uploaded in parts as it is read
+        - To submit a directory, use '--dir DIR' instead of '--file'. It is packed into a tar
+          archive compressed with '--compress gzip' (default) or '--compress zstd' while it is
+          uploaded
+        - Resubmitting a file already submitted to the phase prints a warning, add the
+          '--skip-duplicates' option to skip it instead
 
     For uploading test annotation files to evalai:
         - Invoked by running "evalai challenge CHALLENGE phase PHASE submit --file FILE --annotation"
 
     Arguments:
         ctx (class click.Context) --  The context object which holds state of the invocation
-        file (str) -- the path of the file to be uploaded
+        file (str) -- the path of the file to be uploaded, or '-' for stdin
+        file_name (str) -- the name the file is submitted with, the name of the file by default
+        directory (str) -- the path of a directory to be uploaded as a tar archive
+        compress (str) -- the compression of the archive of the directory, gzip or zstd
         annotations (boolean) -- flag to denote if file is a test annotation file
         large (boolean) -- flag to denote if submission file is large (if large, presigned urls are used for uploads)
+        resume (boolean) -- flag to resume an interrupted upload using presigned urls
         public (boolean) -- flag to denote if submission is public
         private (boolean) -- flag to denote if submission is private
+        workers (int) -- number of parts uploaded in parallel when presigned urls are used
+        max_rate (int) -- maximum upload rate in bytes per second, EVALAI_MAX_RATE by default
+        skip_duplicates (boolean) -- flag to skip files which were already submitted to the phase
     Returns:
         None
     """
     if public and private:
         message = "\nError: Submission can't be public and private.\nPlease select either --public or --private"
         notify_user(message, color="red")
+    elif (file is None) == (directory is None):
+        message = "\nError: Please select either --file or --dir"
+        notify_user(message, color="red")
+    elif file is click.get_binary_stream("stdin") and file_name is None:
+        # The name and extension of the file are needed to evaluate it
+        message = (
+            "\nError: Please give the name of the file read from stdin with"
+            " --file-name, such as --file-name predictions.json"
+        )
+        notify_user(message, color="red")
     else:
+        set_max_rate(max_rate)
+        if directory is not None:
+            # The archive is uploaded as it is built, like a file read from stdin
+            file = DirectoryArchive(directory, compress)
+            click.get_current_context().call_on_close(file.close)
         if annotation:
-            upload_file_using_presigned_url(ctx.phase_id, file, "annotation")
+            upload_file_using_presigned_url(
+                ctx.phase_id,
+                file,
+                "annotation",
+                workers=workers,
+                resume=resume,
+                file_name=file_name,
+            )
         else:
+            content_hash = None
+            if is_regular_file(file):
+                # Unchanged files uploaded before aren't read again to hash
+                # them. Other files, including large ones regenerated with
+                # the same content, are hashed before they are uploaded so
+                # that duplicates are found before the upload
+                content_hash = get_indexed_content_hash(get_file_hash(file))
+                if content_hash is None:
+                    content_hash = get_content_hash(file)
+            if content_hash is not None and is_duplicate_submission(
+                content_hash, ctx.phase_id, skip_duplicates, resume
+            ):
+                return
             submission_metadata = {}
             if public:
                 submission_metadata["is_public"] = json.dumps(True)
@@ -278,7 +483,11 @@ def submit(ctx, file, annotation, large, public, private):
                 submission_metadata["is_public"] = json.dumps(False)
             else:
                 submission_metadata["is_public"] = None
-            if click.confirm("Do you want to include the Submission Details?"):
+            # Answers can't be read from stdin when it holds the file
+            interactive = file is not click.get_binary_stream("stdin")
+            if interactive and click.confirm(
+                "Do you want to include the Submission Details?"
+            ):
                 submission_metadata["method_name"] = click.prompt(
                     style("Method Name", fg="yellow"), type=str, default=""
                 )
@@ -301,7 +510,7 @@ def submit(ctx, file, annotation, large, public, private):
                 submission_meta_attributes
                 and len(submission_meta_attributes) > 0
             ):
-                if click.confirm(
+                if interactive and click.confirm(
                     "Do you want to include the Submission Metadata?"
                 ):
                     for attribute in submission_meta_attributes:
@@ -413,9 +622,31 @@ def submit(ctx, file, annotation, large, public, private):
                             attribute_data['options'] = attribute['options']
                             attribute_data['values'] = value
                         submission_attribute_metadata.append(attribute_data)
-            if large:
+            if not is_regular_file(file):
+                # The size of a stream isn't known up front, so it is
+                # uploaded in parts as it is read
+                large = True
+            elif not large and is_large_file(file):
+                # Files above the threshold would tie up the API server for
+                # the whole upload, so they are sent to S3 directly
+                large = True
+                notify_user(
+                    "\nThe file is larger than {} MB, so it will be uploaded"
+                    " in parts.".format(
+                        convert_bytes_to(LARGE_FILE_THRESHOLD, "mb")
+                    ),
+                    color="yellow",
+                )
+            if large or resume:
                 upload_file_using_presigned_url(
-                    ctx.phase_id, file, "submission", submission_metadata
+                    ctx.phase_id,
+                    file,
+                    "submission",
+                    submission_metadata,
+                    workers,
+                    resume,
+                    content_hash,
+                    file_name,
                 )
             else:
                 make_submission(
@@ -424,6 +655,8 @@ def submit(ctx, file, annotation, large, public, private):
                     file,
                     submission_metadata,
                     submission_attribute_metadata,
+                    content_hash,
+                    file_name,
                 )
 
 
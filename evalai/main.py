@@ -1,26 +1,95 @@
 import click
+import importlib
 import sys
 
 from click import echo, style
 
-from .challenges import challenge, challenges
-from .set_host import host
-from .add_token import set_token
-from .submissions import submission, push, download_file
-from .teams import teams
-from .get_token import get_token
-from .login import login
-from .utils.updates import get_latest_version
+from .utils.config import NO_CACHE_ENV_VAR, OFFLINE_ENV_VAR
 from .version import __version__
 
 
+class LazyGroup(click.Group):
+    """
+    Group which imports the module of a subcommand only when it is used.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self.lazy_commands = kwargs.pop("lazy_commands", {})
+        super(LazyGroup, self).__init__(*args, **kwargs)
+
+    def list_commands(self, ctx):
+        commands = super(LazyGroup, self).list_commands(ctx)
+        return sorted(set(commands) | set(self.lazy_commands))
+
+    def get_command(self, ctx, cmd_name):
+        if cmd_name in self.lazy_commands and cmd_name not in self.commands:
+            module_name, attribute = self.lazy_commands[cmd_name]
+            module = importlib.import_module(module_name, __package__)
+            self.add_command(getattr(module, attribute), cmd_name)
+        return super(LazyGroup, self).get_command(ctx, cmd_name)
+
+
 @click.version_option()
-@click.group(invoke_without_command=True)
+@click.group(
+    invoke_without_command=True,
+    cls=LazyGroup,
+    lazy_commands={
+        "challenges": (".challenges", "challenges"),
+        "challenge": (".challenges", "challenge"),
+        "download_file": (".submissions", "download_file"),
+        "host": (".set_host", "host"),
+        "push": (".submissions", "push"),
+        "set_token": (".add_token", "set_token"),
+        "submission": (".submissions", "submission"),
+        "teams": (".teams", "teams"),
+        "get_token": (".get_token", "get_token"),
+        "login": (".login", "login"),
+    },
+)
+@click.option(
+    "--no-cache",
+    is_flag=True,
+    envvar=NO_CACHE_ENV_VAR,
+    help="Neither read nor store cached responses.",
+)
+@click.option(
+    "--refresh",
+    is_flag=True,
+    help="Check cached responses with the server before using them.",
+)
+@click.option(
+    "--offline",
+    is_flag=True,
+    envvar=OFFLINE_ENV_VAR,
+    help="Only show cached responses, without connecting to EvalAI.",
+)
 @click.pass_context
-def main(ctx):
+def main(ctx, no_cache, refresh, offline):
     """
     Welcome to the EvalAI CLI.
     """
+    if offline and (no_cache or refresh):
+        echo(
+            style(
+                "\nError: --offline only shows cached responses, so it can't"
+                " be used with --no-cache or --refresh.\n",
+                fg="red",
+                bold=True,
+            )
+        )
+        sys.exit(1)
+    if no_cache or refresh or offline:
+        from .utils.cache import (
+            CACHE_DISABLED,
+            CACHE_OFFLINE,
+            CACHE_REFRESH,
+            set_cache_mode,
+        )
+
+        if offline:
+            set_cache_mode(CACHE_OFFLINE)
+        else:
+            set_cache_mode(CACHE_DISABLED if no_cache else CACHE_REFRESH)
     if ctx.invoked_subcommand is None:
         welcome_text = (
             """
@@ -34,27 +103,18 @@ def main(ctx):
             " for challenge_id\nand phase_id of the challenges and phases."
         )
         echo(welcome_text)
-    latest_version = get_latest_version()
-    if __version__ < latest_version:
+    from .utils.updates import get_cached_latest_version, is_newer_version
+
+    # PyPI isn't checked for updates in offline mode either
+    latest_version = None if offline else get_cached_latest_version()
+    if latest_version and is_newer_version(latest_version, __version__):
         echo(
             style(
                 "\nUpdate:\n"
-                "\nPlease install the latest version of EvalAI-CLI!\n",
+                "\nPlease install the latest version of EvalAI-CLI!\n"
                 "\nUse: pip install --upgrade evalai\n",
                 fg="red",
                 bold=True,
             )
         )
         sys.exit(1)
-
-
-main.add_command(challenges)
-main.add_command(challenge)
-main.add_command(download_file)
-main.add_command(host)
-main.add_command(push)
-main.add_command(set_token)
-main.add_command(submission)
-main.add_command(teams)
-main.add_command(get_token)
-main.add_command(login)
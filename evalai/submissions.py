@@ -1,9 +1,7 @@
 import os
 
 import base64
-import boto3
 import click
-import docker
 import json
 import requests
 import shutil
@@ -14,19 +12,25 @@ import uuid
 
 from click import echo, style
 
-from evalai.utils.common import notify_user
+from evalai.utils.common import ByteRate, notify_user
+from evalai.utils.downloads import download
+from evalai.utils.ratelimit import set_max_rate
 from evalai.utils.requests import make_request
 from evalai.utils.submissions import (
     display_submission_details,
     display_submission_result,
     convert_bytes_to,
+    is_duplicate_submission,
 )
+from evalai.utils.uploads import SUBMISSION_SUBMITTED, index_submission
 from evalai.utils.urls import URLS
 from evalai.utils.config import (
+    DOWNLOAD_WORKERS,
     ENVIRONMENT,
     EVALAI_HOST_URLS,
     HOST_URL_FILE_PATH,
     LOCAL_DOCKER_REGISTRY_URI,
+    MAX_RATE_ENV_VAR,
 )
 
 
@@ -81,13 +85,21 @@ def result(ctx):
 )
 @click.option("--public", is_flag=True)
 @click.option("--private", is_flag=True)
-def push(image, phase, url, public, private):
+@click.option(
+    "--skip-duplicates",
+    is_flag=True,
+    help="Skip the submission if the same image was already submitted to the phase",
+)
+def push(image, phase, url, public, private, skip_duplicates):
     """
     Push docker image to a particular challenge phase.
     """
     """
     Invoked by `evalai push IMAGE:TAG -p PHASE_ID`.
     """
+    import boto3
+    import docker
+
     if len(image.split(":")) != 2:
         message = "\nError: Please enter the tag name with image.\n\nFor eg: `evalai push ubuntu:latest --phase 123`"
         notify_user(message, color="red")
@@ -115,13 +127,20 @@ def push(image, phase, url, public, private):
 
     request_path = URLS.phase_details_using_slug.value
     request_path = request_path.format(phase)
-    response = make_request(request_path, "GET")
+    response = make_request(
+        request_path, "GET", endpoint=URLS.phase_details_using_slug
+    )
     challenge_pk = response.get("challenge")
     phase_pk = response.get("id")
 
+    # Images are identified by the digest of their config, so retagging an
+    # unchanged image doesn't make it a new submission
+    if is_duplicate_submission(docker_image.id, phase_pk, skip_duplicates):
+        return
+
     request_path = URLS.challenge_details.value
     request_path = request_path.format(challenge_pk)
-    response = make_request(request_path, "GET")
+    response = make_request(request_path, "GET", endpoint=URLS.challenge_details)
     max_docker_image_size = response.get("max_docker_image_size")
 
     docker_image_size = docker_image.__dict__.get("attrs").get("VirtualSize")
@@ -208,6 +227,13 @@ def push(image, phase, url, public, private):
             request_path = request_path.format(challenge_pk, phase_pk)
             response = make_request(request_path, "POST", submission_file_path, data=submission_metadata)
             shutil.rmtree(BASE_TEMP_DIR)
+            index_submission(
+                docker_image.id,
+                phase_pk,
+                response.get("id"),
+                SUBMISSION_SUBMITTED,
+                image,
+            )
         else:
             print(
                 " ".join(
@@ -220,7 +246,22 @@ def push(image, phase, url, public, private):
 
 @click.command()
 @click.argument("URL", nargs=1)
-def download_file(url):
+@click.option(
+    "--max-rate",
+    type=ByteRate(),
+    envvar=MAX_RATE_ENV_VAR,
+    help="Maximum download rate in bytes per second, such as 50M",
+)
+@click.option(
+    "--workers",
+    type=click.IntRange(min=1),
+    default=DOWNLOAD_WORKERS,
+    show_default=True,
+    help="Number of parts of the file downloaded in parallel",
+)
+def download_file(url, max_rate, workers):
+    from tqdm import tqdm
+
     parsed_url = urlparse.urlparse(url)
     parsed_host_url = "{parsed_url.scheme}://{parsed_url.netloc}".format(
         parsed_url=parsed_url
@@ -235,6 +276,7 @@ def download_file(url):
         is_correct_host = True
 
     if is_correct_host:
+        set_max_rate(max_rate)
         bucket = urlparse.parse_qs(parsed_url.query).get("bucket")
         key = urlparse.parse_qs(parsed_url.query).get("key")
         if not bucket or not key:
@@ -252,8 +294,21 @@ def download_file(url):
         signed_url = response.get("signed_url")
         file_name = key[0].split("/")[-1]
         try:
-            response = requests.get(signed_url, stream=True)
-            response.raise_for_status()
+            with tqdm(
+                desc="Downloading file", unit="B", unit_scale=True, disable=None
+            ) as progress_bar:
+
+                def on_size(size):
+                    progress_bar.total = size
+                    progress_bar.refresh()
+
+                download(
+                    signed_url,
+                    file_name,
+                    workers,
+                    callback=progress_bar.update,
+                    on_size=on_size,
+                )
         except requests.exceptions.HTTPError as err:
             echo(err)
             sys.exit(1)
@@ -267,24 +322,13 @@ def download_file(url):
                 )
             )
             sys.exit(1)
-        with open(file_name, "wb") as file:
-            total_file_length = int(response.headers.get("content-length"))
-            chunk_size = 1024
-            with click.progressbar(
-                length=total_file_length, label="Downloading file"
-            ) as bar:
-                for data in response.iter_content(chunk_size=chunk_size):
-                    file.write(data)
-                    bar.update(chunk_size)
-            echo(
-                style(
-                    "\nYour file {} is successfully downloaded.\n".format(
-                        file_name
-                    ),
-                    fg="green",
-                    bold=True,
-                )
+        echo(
+            style(
+                "\nYour file {} is successfully downloaded.\n".format(file_name),
+                fg="green",
+                bold=True,
             )
+        )
     else:
         echo(
             style(
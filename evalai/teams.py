@@ -13,7 +13,12 @@ from evalai.utils.teams import create_team, display_teams
 @click.option(
     "--participant", "-p", is_flag=True, help="View your host teams."
 )
-def teams(ctx, host, participant):
+@click.option(
+    "--limit",
+    type=click.IntRange(min=1),
+    help="Maximum number of teams to list",
+)
+def teams(ctx, host, participant, limit):
     """
     List all the participant/host teams of a user.
     """
@@ -31,7 +36,7 @@ def teams(ctx, host, participant):
             )
             sys.exit(1)
 
-        display_teams(host)
+        display_teams(host, limit)
 
 
 @teams.command()
@@ -0,0 +1,104 @@
+import io
+import os
+import sys
+import tarfile
+import threading
+
+from click import echo, style
+
+
+ARCHIVE_EXTENSIONS = {"gzip": ".tar.gz", "zstd": ".tar.zst"}
+
+
+class DirectoryArchive(io.RawIOBase):
+    """
+    Reads a directory as a compressed tar archive without writing the
+    archive to disk.
+
+    The archive is built and compressed by a separate thread which writes
+    it to a pipe, so compression overlaps with the upload of the parts
+    already read. The archive unpacks to the contents of the directory.
+
+    If the archive can't be built, reading its end raises the error, so a
+    truncated archive is never uploaded as a complete one.
+    """
+
+    def __init__(self, path, compression="gzip"):
+        super(DirectoryArchive, self).__init__()
+        self.path = path
+        self.compression = compression
+        self.name = "{}{}".format(
+            os.path.basename(os.path.abspath(path)),
+            ARCHIVE_EXTENSIONS[compression],
+        )
+        self.error = None
+        compressor = get_compressor(compression)
+        read_fd, write_fd = os.pipe()
+        self._reader = io.FileIO(read_fd, "rb")
+        self._writer = io.FileIO(write_fd, "wb")
+        self._thread = threading.Thread(
+            target=self._write_archive, args=(compressor,)
+        )
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _write_archive(self, compressor):
+        try:
+            with self._writer:
+                if compressor is None:
+                    fileobj, mode = self._writer, "w|gz"
+                else:
+                    fileobj = compressor.stream_writer(self._writer, closefd=False)
+                    mode = "w|"
+                with tarfile.open(fileobj=fileobj, mode=mode) as tar:
+                    for name in sorted(os.listdir(self.path)):
+                        tar.add(os.path.join(self.path, name), arcname=name)
+                if compressor is not None:
+                    fileobj.close()
+        except Exception as err:
+            self.error = err
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        count = self._reader.readinto(buffer)
+        if not count:
+            self._thread.join()
+            if self.error is not None:
+                raise IOError(
+                    "Could not archive {}: {}".format(self.path, self.error)
+                )
+        return count
+
+    def close(self):
+        if not self.closed:
+            # Closing the pipe makes the thread stop with a broken pipe if
+            # the archive wasn't read to the end
+            self._reader.close()
+            self._thread.join()
+        super(DirectoryArchive, self).close()
+
+
+def get_compressor(compression):
+    """
+    Returns the zstandard compressor for "zstd", or None for gzip, which is
+    handled by tarfile.
+    """
+    if compression != "zstd":
+        return None
+    try:
+        import zstandard
+    except ImportError:
+        echo(
+            style(
+                "\nError: zstd compression requires the zstandard package."
+                " Please install it with `pip install zstandard` or use"
+                " `--compress gzip`.\n",
+                bold=True,
+                fg="red",
+            )
+        )
+        sys.exit(1)
+    # Compress with all the cores, the upload runs alongside
+    return zstandard.ZstdCompressor(threads=-1)
@@ -2,14 +2,18 @@ import os
 import json
 import sys
 import requests
+import threading
 
 from click import echo, style
 from evalai.utils.config import (
+    AUTH_TOKEN_ENV_VAR,
     AUTH_TOKEN_PATH,
     API_HOST_URL,
+    API_HOST_URL_ENV_VAR,
     EVALAI_ERROR_CODES,
     HOST_URL_FILE_PATH,
 )
+from evalai.utils.session import get_session
 from evalai.utils.urls import URLS
 
 
@@ -23,7 +27,7 @@ def get_user_access_token(token):
     url = "{}{}".format(get_host_url(), URLS.get_access_token.value)
     try:
         headers = {"Authorization": "Token {}".format(token["token"])}
-        response = requests.get(url, headers=headers)
+        response = get_session().get(url, headers=headers)
         response.raise_for_status()
     except requests.exceptions.HTTPError:
         if response.status_code in EVALAI_ERROR_CODES:
@@ -56,7 +60,7 @@ def get_user_auth_token_by_login(username, password):
     url = "{}{}".format(get_host_url(), URLS.login.value)
     try:
         payload = {"username": username, "password": password}
-        response = requests.post(url, data=payload)
+        response = get_session().post(url, data=payload)
         response.raise_for_status()
     except requests.exceptions.HTTPError:
         if response.status_code in EVALAI_ERROR_CODES:
@@ -85,51 +89,104 @@ def get_user_auth_token_by_login(username, password):
     return token
 
 
+class Config(object):
+    """
+    Host URL, auth token and request headers of the CLI.
+
+    Values come from the environment when set, otherwise from the files
+    under ~/.evalai/, which are only re-read when their mtime changes.
+    """
+
+    def __init__(self):
+        self._files = {}
+        self._headers = (None, None)
+        self._lock = threading.Lock()
+
+    def _read(self, path):
+        """
+        Returns the contents of `path`, or None if it doesn't exist.
+        """
+        try:
+            stat = os.stat(path)
+        except OSError:
+            self._files.pop(path, None)
+            return None
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        cached = self._files.get(path)
+        if cached is not None and cached[0] == stamp:
+            return cached[1]
+        with self._lock:
+            with open(str(path), "r") as fr:
+                data = fr.read()
+            self._files[path] = (stamp, data)
+        return data
+
+    @property
+    def host_url(self):
+        host_url = os.environ.get(API_HOST_URL_ENV_VAR)
+        if host_url:
+            return host_url
+        try:
+            data = self._read(HOST_URL_FILE_PATH)
+        except (OSError, IOError) as e:
+            echo(style(e, bold=True, fg="red"))
+            return None
+        if data is None:
+            return API_HOST_URL
+        return str(data)
+
+    @property
+    def token(self):
+        token = os.environ.get(AUTH_TOKEN_ENV_VAR)
+        if token:
+            return token
+        try:
+            data = self._read(AUTH_TOKEN_PATH)
+        except (OSError, IOError) as e:
+            echo(style(e, bold=True, fg="red"))
+            sys.exit(1)
+        if data is None:
+            echo(
+                style(
+                    "\nThe authentication token json file doesn't exists at the required path. "
+                    "Please download the file from the Profile section of the EvalAI webapp and "
+                    "place it at ~/.evalai/token.json\n",
+                    bold=True,
+                    fg="red",
+                )
+            )
+            sys.exit(1)
+        return json.loads(data)["token"]
+
+    @property
+    def headers(self):
+        token = self.token
+        cached_token, headers = self._headers
+        if cached_token != token:
+            headers = {"Authorization": "Bearer {}".format(token)}
+            self._headers = (token, headers)
+        return dict(headers)
+
+
+config = Config()
+
+
 def get_user_auth_token():
     """
     Loads token to be used for sending requests.
     """
-    if os.path.exists(AUTH_TOKEN_PATH):
-        with open(str(AUTH_TOKEN_PATH), "r") as TokenObj:
-            try:
-                data = TokenObj.read()
-            except (OSError, IOError) as e:
-                echo(style(e, bold=True, fg="red"))
-        data = json.loads(data)
-        token = data["token"]
-        return token
-    else:
-        echo(
-            style(
-                "\nThe authentication token json file doesn't exists at the required path. "
-                "Please download the file from the Profile section of the EvalAI webapp and "
-                "place it at ~/.evalai/token.json\n",
-                bold=True,
-                fg="red",
-            )
-        )
-        sys.exit(1)
+    return config.token
 
 
 def get_request_header():
     """
     Returns user auth token formatted in header for sending requests.
     """
-    header = {"Authorization": "Bearer {}".format(get_user_auth_token())}
-
-    return header
+    return config.headers
 
 
 def get_host_url():
     """
     Returns the host url.
     """
-    if not os.path.exists(HOST_URL_FILE_PATH):
-        return API_HOST_URL
-    else:
-        with open(HOST_URL_FILE_PATH, "r") as fr:
-            try:
-                data = fr.read()
-                return str(data)
-            except (OSError, IOError) as e:
-                echo(style(e, bold=True, fg="red"))
+    return config.host_url
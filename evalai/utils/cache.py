@@ -0,0 +1,379 @@
+import atexit
+import hashlib
+import json
+import os
+import re
+import requests
+import sys
+import time
+import urllib.parse as urlparse
+
+from click import echo, style
+from datetime import datetime
+from http import HTTPStatus
+from requests.structures import CaseInsensitiveDict
+
+from evalai.utils.auth import get_request_header
+from evalai.utils.config import (
+    AUTH_TOKEN_ENV_VAR,
+    CACHE_DIR,
+    CACHE_MAX_STALE,
+    CACHE_REVALIDATE_TIMEOUT,
+    CACHE_TTLS,
+    CACHE_TTLS_ENV_VAR,
+)
+from evalai.utils.files import write_json_file
+from evalai.utils.processes import spawn_detached
+from evalai.utils.session import get_session, set_offline
+from evalai.utils.urls import URLS
+
+
+# Response headers kept with a cached body
+CACHED_HEADERS = ("Cache-Control", "Content-Type", "Date", "ETag", "Last-Modified")
+
+CACHE_ENABLED = "enabled"
+CACHE_REFRESH = "refresh"
+CACHE_DISABLED = "disabled"
+CACHE_OFFLINE = "offline"
+
+_cache_mode = CACHE_ENABLED
+
+# Responses served from the cache while they are refreshed in the background
+_stale_requests = []
+
+_data_as_of_shown = False
+
+
+def set_cache_mode(mode):
+    """
+    Sets whether responses are read from and written to the cache.
+
+    With CACHE_REFRESH, cached responses are always revalidated with the
+    server before being used and with CACHE_DISABLED the cache is bypassed.
+    With CACHE_OFFLINE, only cached responses are used and no request is
+    sent at all.
+    """
+    global _cache_mode
+    _cache_mode = mode
+    if mode == CACHE_OFFLINE:
+        set_offline()
+
+
+def get_ttl(endpoint):
+    """
+    Returns the number of seconds the responses of `endpoint`, one of URLS,
+    are used without revalidation, or None to follow the Cache-Control of
+    the server.
+    """
+    ttls = dict(CACHE_TTLS)
+    for item in os.environ.get(CACHE_TTLS_ENV_VAR, "").split(","):
+        name, _, value = item.partition("=")
+        if name.strip() and value.strip().isdigit():
+            ttls[name.strip()] = int(value)
+    return ttls.get(endpoint.name)
+
+
+def parse_cache_control(value):
+    """
+    Returns the directives of a Cache-Control header, such as
+    {"max-age": "60", "private": None}.
+    """
+    directives = {}
+    for directive in (value or "").split(","):
+        name, _, argument = directive.strip().partition("=")
+        if name:
+            directives[name.lower()] = argument.strip('"') or None
+    return directives
+
+
+def get_freshness_lifetime(headers, ttl):
+    """
+    Returns the number of seconds a response can be used without
+    revalidation, from the `ttl` of its endpoint or else its Cache-Control.
+    """
+    directives = parse_cache_control(headers.get("Cache-Control"))
+    if "no-cache" in directives:
+        return 0
+    if ttl is not None:
+        return ttl
+    max_age = directives.get("max-age") or ""
+    if not re.match(r"^\d+$", max_age):
+        return 0
+    age = headers.get("Age") or ""
+    return max(int(max_age) - (int(age) if age.isdigit() else 0), 0)
+
+
+def get_identity(headers):
+    """
+    Returns a hash of the credentials of `headers`, which identifies the
+    user without storing their token.
+    """
+    authorization = (headers or {}).get("Authorization", "")
+    return hashlib.sha256(authorization.encode("utf-8")).hexdigest()
+
+
+def get_cache_key(url, headers):
+    """
+    Returns the key of the responses to `url` for the user authenticated by
+    `headers`, so that users never share cached responses.
+    """
+    parsed_url = urlparse.urlsplit(url)
+    key = json.dumps(
+        [
+            parsed_url.scheme,
+            parsed_url.netloc,
+            parsed_url.path,
+            parsed_url.query,
+            get_identity(headers),
+        ]
+    )
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+def get_entry_path(key):
+    return os.path.join(CACHE_DIR, "{}.json".format(key))
+
+
+def read_entry(key):
+    try:
+        with open(get_entry_path(key), "r") as fr:
+            entry = json.load(fr)
+    except (OSError, IOError, ValueError):
+        return None
+    if not isinstance(entry, dict) or not {"body", "headers", "expires_at"} <= set(entry):
+        return None
+    return entry
+
+
+def save_entry(key, entry):
+    """
+    Stores `entry`, leaving the cache unchanged if it can't be written.
+    """
+    try:
+        write_json_file(get_entry_path(key), entry)
+    except (OSError, IOError):
+        pass
+
+
+def delete_entry(key):
+    try:
+        os.remove(get_entry_path(key))
+    except (OSError, IOError):
+        pass
+
+
+def invalidate(endpoints, headers):
+    """
+    Deletes the cached responses of `endpoints`, a list of URLS, for the
+    user authenticated by `headers`, once a change made by the user makes
+    them out of date.
+    """
+    names = [endpoint.name for endpoint in endpoints]
+    identity = get_identity(headers)
+    try:
+        file_names = os.listdir(CACHE_DIR)
+    except (OSError, IOError):
+        return
+    for file_name in file_names:
+        key, extension = os.path.splitext(file_name)
+        if extension != ".json":
+            continue
+        entry = read_entry(key)
+        if (
+            entry is not None
+            and entry.get("endpoint") in names
+            and entry.get("identity") == identity
+        ):
+            delete_entry(key)
+
+
+def create_entry(response, ttl, entry=None):
+    """
+    Returns the cache entry of a response, or of a 304 response which
+    revalidated `entry`, or None if the response mustn't be stored.
+    """
+    if "no-store" in parse_cache_control(response.headers.get("Cache-Control")):
+        return None
+    if entry is None:
+        try:
+            body = response.content.decode("utf-8")
+        except UnicodeDecodeError:
+            return None
+        entry = {"url": response.url, "body": body, "headers": {}}
+    headers = dict(entry["headers"])
+    for name in CACHED_HEADERS:
+        if name in response.headers:
+            headers[name] = response.headers[name]
+    stored_at = time.time()
+    return dict(
+        entry,
+        headers=headers,
+        stored_at=stored_at,
+        expires_at=stored_at + get_freshness_lifetime(response.headers, ttl),
+    )
+
+
+def create_response(url, entry):
+    """
+    Returns the cached response of `entry` as a requests Response.
+    """
+    response = requests.Response()
+    response.status_code = HTTPStatus.OK
+    response.reason = "OK"
+    response.url = url
+    response.headers = CaseInsensitiveDict(entry["headers"])
+    response.encoding = "utf-8"
+    response._content = entry["body"].encode("utf-8")
+    response.from_cache = True
+    return response
+
+
+def show_data_as_of(entry):
+    """
+    Tells on stderr, once per command, when the cached data being shown
+    was fetched.
+    """
+    global _data_as_of_shown
+    if _data_as_of_shown:
+        return
+    _data_as_of_shown = True
+    date = datetime.fromtimestamp(entry["stored_at"]).strftime("%D %r")
+    echo(style("Data as of {}".format(date), fg="yellow"), err=True)
+
+
+def spawn_refresh(requests_to_refresh):
+    """
+    Refreshes the cached responses of `requests_to_refresh`, a list of
+    (url, headers, endpoint), in a detached process which outlives the CLI
+    call. The token is passed through the environment rather than the
+    command line, where other users could read it.
+    """
+    env = dict(os.environ)
+    urls = []
+    for url, headers, endpoint in requests_to_refresh:
+        authorization = (headers or {}).get("Authorization", "")
+        if authorization.startswith("Bearer "):
+            env[AUTH_TOKEN_ENV_VAR] = authorization[len("Bearer "):]
+        urls.append([url, endpoint.name if endpoint is not None else None])
+    spawn_detached(
+        [sys.executable, "-m", "evalai.utils.cache", json.dumps(urls)], env
+    )
+
+
+def refresh_stale_requests():
+    if _stale_requests:
+        spawn_refresh(list(_stale_requests))
+        del _stale_requests[:]
+
+
+def schedule_refresh(url, headers, endpoint):
+    """
+    Refreshes a response served stale once the command is done, in a
+    single process for all the responses of the command.
+    """
+    if not _stale_requests:
+        atexit.register(refresh_stale_requests)
+    _stale_requests.append((url, headers, endpoint))
+
+
+def refresh(urls):
+    """
+    Revalidates the cached responses of `urls`, a list of [url, endpoint
+    name], with the token of the environment.
+    """
+    set_cache_mode(CACHE_REFRESH)
+    headers = get_request_header()
+    for url, endpoint in urls:
+        endpoint = URLS[endpoint] if endpoint in URLS.__members__ else None
+        try:
+            cached_get(url, headers, endpoint)
+        except requests.exceptions.RequestException:
+            pass
+
+
+def cached_get(url, headers=None, endpoint=None, stale_while_revalidate=False):
+    """
+    Makes a GET request to `url` through the on-disk response cache.
+
+    Responses are reused without a request while they are fresh, for the
+    TTL of `endpoint` or else the max-age of their Cache-Control. Stale
+    responses are revalidated with If-None-Match and If-Modified-Since, so
+    an unchanged body isn't sent again. Only successful responses are
+    cached and errors are returned like the ones of the session.
+
+    With `stale_while_revalidate`, used by read commands, a response up to
+    CACHE_MAX_STALE seconds past its expiry is returned if the server takes
+    longer than CACHE_REVALIDATE_TIMEOUT seconds to revalidate it, and is
+    then refreshed in the background. A cached response of any age is
+    returned if the server can't be reached. The date of such responses is
+    shown on stderr.
+    """
+    if _cache_mode == CACHE_DISABLED:
+        return get_session().get(url, headers=headers)
+
+    ttl = get_ttl(endpoint) if endpoint is not None else None
+    key = get_cache_key(url, headers)
+    entry = read_entry(key)
+    if _cache_mode == CACHE_OFFLINE:
+        if entry is None:
+            echo(
+                style(
+                    "\nError: {} isn't cached, so it can't be shown in"
+                    " offline mode. Please run the command again without"
+                    " --offline.\n".format(url),
+                    bold=True,
+                    fg="red",
+                )
+            )
+            sys.exit(1)
+        show_data_as_of(entry)
+        return create_response(url, entry)
+    timeout = None
+    if entry is not None and _cache_mode != CACHE_REFRESH:
+        staleness = time.time() - entry["expires_at"]
+        if staleness < 0:
+            return create_response(url, entry)
+        if stale_while_revalidate and staleness < CACHE_MAX_STALE:
+            # The stale response is only shown if the server is slow
+            timeout = CACHE_REVALIDATE_TIMEOUT
+
+    request_headers = dict(headers or {})
+    if entry is not None:
+        if "ETag" in entry["headers"]:
+            request_headers["If-None-Match"] = entry["headers"]["ETag"]
+        if "Last-Modified" in entry["headers"]:
+            request_headers["If-Modified-Since"] = entry["headers"]["Last-Modified"]
+    try:
+        response = get_session().get(
+            url, headers=request_headers, timeout=timeout
+        )
+    except (
+        requests.exceptions.ConnectionError,
+        requests.exceptions.Timeout,
+    ):
+        if stale_while_revalidate and entry is not None:
+            if timeout is not None:
+                schedule_refresh(url, headers, endpoint)
+            show_data_as_of(entry)
+            return create_response(url, entry)
+        raise
+
+    if response.status_code == HTTPStatus.NOT_MODIFIED and entry is not None:
+        revalidated_entry = create_entry(response, ttl, entry)
+        if revalidated_entry is None:
+            delete_entry(key)
+            return create_response(url, entry)
+        save_entry(key, revalidated_entry)
+        return create_response(url, revalidated_entry)
+    if response.status_code == HTTPStatus.OK:
+        entry = create_entry(response, ttl)
+        if entry is not None:
+            # Lets the entries of a user be invalidated by endpoint
+            entry["endpoint"] = endpoint.name if endpoint is not None else None
+            entry["identity"] = get_identity(headers)
+            save_entry(key, entry)
+    return response
+
+
+if __name__ == "__main__":
+    refresh(json.loads(sys.argv[1]))
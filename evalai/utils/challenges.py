@@ -2,20 +2,25 @@ import json
 import requests
 import sys
 
-from bs4 import BeautifulSoup
+from itertools import islice
+
 from beautifultable import BeautifulTable
 from click import echo, style
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from termcolor import colored
 
 from evalai.utils.auth import get_request_header, get_host_url
+from evalai.utils.cache import cached_get
 from evalai.utils.common import (
     clean_data,
     convert_UTC_date_to_local,
     validate_date_format,
     validate_token,
 )
-from evalai.utils.config import EVALAI_ERROR_CODES
+from evalai.utils.config import EVALAI_ERROR_CODES, TEAM_WORKERS
+from evalai.utils.requests import paginate
 from evalai.utils.urls import URLS
 
 
@@ -54,17 +59,25 @@ def pretty_print_challenge_data(challenges):
     echo(table, color='yes')
 
 
-def display_challenges(url):
+def display_challenges(endpoint, limit=None):
     """
     Function to fetch & display the challenge list based on API
     """
+    url = "{}{}".format(get_host_url(), endpoint.value)
     header = get_request_header()
     try:
-        response = requests.get(url, headers=header)
-        response.raise_for_status()
+        challenges = list(
+            paginate(
+                url,
+                header,
+                limit,
+                endpoint=endpoint,
+                stale_while_revalidate=True,
+            )
+        )
     except requests.exceptions.HTTPError as err:
-        if response.status_code == 401:
-            validate_token(response.json())
+        if err.response.status_code == 401:
+            validate_token(err.response.json())
         echo(err)
         sys.exit(1)
     except requests.exceptions.RequestException:
@@ -78,32 +91,27 @@ def display_challenges(url):
         )
         sys.exit(1)
 
-    response = response.json()
-
-    challenges = response["results"]
     if len(challenges) != 0:
         pretty_print_challenge_data(challenges)
     else:
         echo(style("Sorry, no challenges found.", bold=True, fg="red"))
 
 
-def display_all_challenge_list():
+def display_all_challenge_list(limit=None):
     """
     Displays the list of all challenges from the backend
     """
-    url = "{}{}".format(get_host_url(), URLS.challenge_list.value)
-    display_challenges(url)
+    display_challenges(URLS.challenge_list, limit)
 
 
-def display_past_challenge_list():
+def display_past_challenge_list(limit=None):
     """
     Displays the list of past challenges from the backend
     """
-    url = "{}{}".format(get_host_url(), URLS.past_challenge_list.value)
-    display_challenges(url)
+    display_challenges(URLS.past_challenge_list, limit)
 
 
-def display_ongoing_challenge_list():
+def display_ongoing_challenge_list(limit=None):
     """
     Displays the list of ongoing challenges from the backend
     """
@@ -111,11 +119,28 @@ def display_ongoing_challenge_list():
 
     header = get_request_header()
     try:
-        response = requests.get(url, headers=header)
-        response.raise_for_status()
+        # Filter out past/unapproved/unpublished challenges while the pages
+        # are fetched, so only the pages needed for `limit` are requested
+        challenges = list(
+            islice(
+                filter(
+                    lambda challenge: validate_date_format(challenge["end_date"])
+                    > datetime.now()
+                    and challenge["approved_by_admin"]
+                    and challenge["published"],
+                    paginate(
+                        url,
+                        header,
+                        endpoint=URLS.challenge_list,
+                        stale_while_revalidate=True,
+                    ),
+                ),
+                limit,
+            )
+        )
     except requests.exceptions.HTTPError as err:
-        if response.status_code == 401:
-            validate_token(response.json())
+        if err.response.status_code == 401:
+            validate_token(err.response.json())
         echo(err)
         sys.exit(1)
     except requests.exceptions.RequestException:
@@ -129,77 +154,102 @@ def display_ongoing_challenge_list():
         )
         sys.exit(1)
 
-    response = response.json()
-    challenges = response["results"]
-
-    # Filter out past/unapproved/unpublished challenges.
-    challenges = list(
-        filter(
-            lambda challenge: validate_date_format(challenge["end_date"])
-            > datetime.now()
-            and challenge["approved_by_admin"]
-            and challenge["published"],
-            challenges,
-        )
-    )
-
     if len(challenges) != 0:
         pretty_print_challenge_data(challenges)
     else:
         echo(style("Sorry, no challenges found.", bold=True, fg="red"))
 
 
-def display_future_challenge_list():
+def display_future_challenge_list(limit=None):
     """
     Displays the list of future challenges from the backend
     """
-    url = "{}{}".format(get_host_url(), URLS.future_challenge_list.value)
-    display_challenges(url)
+    display_challenges(URLS.future_challenge_list, limit)
 
 
-def get_participant_or_host_teams(url):
+def get_participant_or_host_teams(endpoint):
     """
     Returns the participant or host teams corresponding to the user
     """
+    url = "{}{}".format(get_host_url(), endpoint.value)
+    return list(
+        paginate(
+            url,
+            get_request_header(),
+            endpoint=endpoint,
+            stale_while_revalidate=True,
+        )
+    )
+
+
+def get_participant_or_host_team_challenges(endpoint, teams):
+    """
+    Returns the challenges corresponding to the participant or host teams
+
+    The challenges of the teams are requested concurrently. A challenge of
+    several teams is only returned once, in the place of its first team.
+    """
+    url = "{}{}".format(get_host_url(), endpoint.value)
     header = get_request_header()
 
-    try:
-        response = requests.get(url, headers=header)
-        response.raise_for_status()
-    except requests.exceptions.HTTPError as err:
-        if response.status_code == 401:
-            validate_token(response.json())
-        echo(err)
-        sys.exit(1)
-    except requests.exceptions.RequestException:
-        echo(
-            style(
-                "\nCould not establish a connection to EvalAI."
-                " Please check the Host URL.\n",
-                bold=True,
-                fg="red",
+    def get_challenges(team):
+        return list(
+            paginate(
+                url.format(team["id"]),
+                header,
+                endpoint=endpoint,
+                stale_while_revalidate=True,
             )
         )
-        sys.exit(1)
 
-    response = response.json()
+    executor = ThreadPoolExecutor(max_workers=TEAM_WORKERS)
+    futures = [executor.submit(get_challenges, team) for team in teams]
+    challenges = OrderedDict()
+    try:
+        for future in futures:
+            for challenge in future.result():
+                challenges.setdefault(challenge["id"], challenge)
+    finally:
+        for future in futures:
+            future.cancel()
+        executor.shutdown(wait=False)
+    return list(challenges.values())
 
-    return response["results"]
+
+def get_team_challenges(team_endpoint, challenge_endpoint):
+    """
+    Returns the challenges of all the teams listed at `team_endpoint`
+    """
+    teams = get_participant_or_host_teams(team_endpoint)
+    return get_participant_or_host_team_challenges(challenge_endpoint, teams)
 
 
-def get_participant_or_host_team_challenges(url, teams):
+def display_participated_or_hosted_challenges(
+    is_host=False, is_participant=False, limit=None
+):
     """
-    Returns the challenges corresponding to the participant or host teams
+    Function to display the participated or hosted challenges by a user
     """
-    challenges = []
-    for team in teams:
-        header = get_request_header()
+    # The hosted and participated challenges are fetched concurrently
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        if is_host:
+            host_challenges = executor.submit(
+                get_team_challenges, URLS.host_teams, URLS.host_challenges
+            )
+        if is_participant:
+            participant_challenges = executor.submit(
+                get_team_challenges,
+                URLS.participant_teams,
+                URLS.participant_challenges,
+            )
         try:
-            response = requests.get(url.format(team["id"]), headers=header)
-            response.raise_for_status()
+            if is_host:
+                host_challenges = host_challenges.result()
+            if is_participant:
+                participant_challenges = participant_challenges.result()
         except requests.exceptions.HTTPError as err:
-            if response.status_code == 401:
-                validate_token(response.json())
+            if err.response.status_code == 401:
+                validate_token(err.response.json())
             echo(err)
             sys.exit(1)
         except requests.exceptions.RequestException:
@@ -212,30 +262,9 @@ def get_participant_or_host_team_challenges(url, teams):
                 )
             )
             sys.exit(1)
-        response = response.json()
-        challenges += response["results"]
-    return challenges
-
-
-def display_participated_or_hosted_challenges(
-    is_host=False, is_participant=False
-):
-    """
-    Function to display the participated or hosted challenges by a user
-    """
-
-    challenges = []
 
     if is_host:
-        team_url = "{}{}".format(get_host_url(), URLS.host_teams.value)
-        challenge_url = "{}{}".format(
-            get_host_url(), URLS.host_challenges.value
-        )
-
-        teams = get_participant_or_host_teams(team_url)
-        challenges = get_participant_or_host_team_challenges(
-            challenge_url, teams
-        )
+        challenges = host_challenges[:limit]
         echo(style("\nHosted Challenges\n", bold=True))
 
         if len(challenges) != 0:
@@ -244,15 +273,7 @@ def display_participated_or_hosted_challenges(
             echo(style("Sorry, no challenges found.", bold=True, fg="red"))
 
     if is_participant:
-        team_url = "{}{}".format(get_host_url(), URLS.participant_teams.value)
-        challenge_url = "{}{}".format(
-            get_host_url(), URLS.participant_challenges.value
-        )
-
-        teams = get_participant_or_host_teams(team_url)
-        challenges = get_participant_or_host_team_challenges(
-            challenge_url, teams
-        )
+        challenges = participant_challenges
 
         if len(challenges) != 0:
 
@@ -267,7 +288,7 @@ def display_participated_or_hosted_challenges(
                     and challenge["published"],
                     challenges,
                 )
-            )
+            )[:limit]
             if challenges:
                 echo(style("\nParticipated Challenges\n", bold=True))
                 pretty_print_challenge_data(challenges)
@@ -316,7 +337,9 @@ def display_challenge_details(challenge):
 
     header = get_request_header()
     try:
-        response = requests.get(url, headers=header)
+        response = cached_get(
+            url, header, URLS.challenge_details, stale_while_revalidate=True
+        )
         response.raise_for_status()
     except requests.exceptions.HTTPError as err:
         if response.status_code in EVALAI_ERROR_CODES:
@@ -383,9 +406,16 @@ def display_challenge_phase_list(challenge_id):
     url = url.format(challenge_id)
     headers = get_request_header()
     try:
-        response = requests.get(url, headers=headers)
-        response.raise_for_status()
+        challenge_phases = list(
+            paginate(
+                url,
+                headers,
+                endpoint=URLS.challenge_phase_list,
+                stale_while_revalidate=True,
+            )
+        )
     except requests.exceptions.HTTPError as err:
+        response = err.response
         if response.status_code in EVALAI_ERROR_CODES:
             validate_token(response.json())
             echo(
@@ -423,8 +453,6 @@ def display_challenge_phase_list(challenge_id):
         )
         sys.exit(1)
 
-    response = response.json()
-    challenge_phases = response["results"]
     pretty_print_all_challenge_phases(challenge_phases)
 
 
@@ -432,6 +460,8 @@ def pretty_print_challenge_phase_data(phase):
     """
     Function to print the details of a challenge phase.
     """
+    from bs4 import BeautifulSoup
+
     phase_title = "\n{}".format(style(phase["name"], bold=True, fg="green"))
     challenge_id = "Challenge ID: {}".format(
         style(str(phase["challenge"]), bold=True, fg="blue")
@@ -499,7 +529,9 @@ def display_challenge_phase_detail(challenge_id, phase_id, is_json):
     headers = get_request_header()
 
     try:
-        response = requests.get(url, headers=headers)
+        response = cached_get(
+            url, headers, URLS.challenge_phase_detail, stale_while_revalidate=True
+        )
         response.raise_for_status()
     except requests.exceptions.HTTPError as err:
         if response.status_code in EVALAI_ERROR_CODES:
@@ -567,7 +599,12 @@ def display_challenge_phase_split_list(challenge_id):
     url = url.format(challenge_id)
     headers = get_request_header()
     try:
-        response = requests.get(url, headers=headers)
+        response = cached_get(
+            url,
+            headers,
+            URLS.challenge_phase_split_detail,
+            stale_while_revalidate=True,
+        )
         response.raise_for_status()
     except requests.exceptions.HTTPError as err:
         if response.status_code in EVALAI_ERROR_CODES:
@@ -625,7 +662,7 @@ def pretty_print_leaderboard_data(attributes, results):
     echo(leaderboard_table)
 
 
-def display_leaderboard(challenge_id, phase_split_id):
+def display_leaderboard(challenge_id, phase_split_id, limit=None):
     """
     Function to display the Leaderboard of a particular CPS.
     """
@@ -633,9 +670,17 @@ def display_leaderboard(challenge_id, phase_split_id):
     url = url.format(phase_split_id)
     headers = get_request_header()
     try:
-        response = requests.get(url, headers=headers)
-        response.raise_for_status()
+        results = list(
+            paginate(
+                url,
+                headers,
+                limit,
+                endpoint=URLS.leaderboard,
+                stale_while_revalidate=True,
+            )
+        )
     except requests.exceptions.HTTPError as err:
+        response = err.response
         if response.status_code in EVALAI_ERROR_CODES:
             validate_token(response.json())
             echo(
@@ -659,9 +704,6 @@ def display_leaderboard(challenge_id, phase_split_id):
         )
         sys.exit(1)
 
-    response = response.json()
-
-    results = response["results"]
     if len(results) != 0:
         attributes = results[0]["leaderboard__schema"]["labels"]
         pretty_print_leaderboard_data(attributes, results)
@@ -1,20 +1,39 @@
 import click
 import json
+import os
 import random
 import requests
 import string
 import sys
+import time
 
-from bs4 import BeautifulSoup
 from click import echo, style
 from datetime import datetime
 from dateutil import tz
 from http import HTTPStatus
-from pathlib import Path
-from tqdm import tqdm
 
 from evalai.utils.auth import get_request_header, get_host_url
-from evalai.utils.config import EVALAI_ERROR_CODES
+from evalai.utils.config import (
+    EVALAI_ERROR_CODES,
+    UPLOAD_STREAM_MAX_SIZE,
+    UPLOAD_WORKERS,
+)
+from evalai.utils.ratelimit import parse_rate
+from evalai.utils.session import get_session
+from evalai.utils.uploads import (
+    SUBMISSION_SUBMITTED,
+    SUBMISSION_UPLOADING,
+    FileParts,
+    UploadJournal,
+    get_file_hash,
+    get_num_parts,
+    get_part_size,
+    index_submission,
+    is_regular_file,
+    read_upload_throughput,
+    record_upload_throughput,
+    upload_parts,
+)
 from evalai.utils.urls import URLS
 
 
@@ -40,14 +59,42 @@ class Date(click.ParamType):
             )
 
 
-def upload_file_to_s3(file, presigned_urls, max_chunk_size):
+class ByteRate(click.ParamType):
+    """
+    Transfer rate in bytes per second, such as 500K or 50M.
+    """
+
+    name = "rate"
+
+    def convert(self, value, param, ctx):
+        try:
+            return parse_rate(value)
+        except ValueError:
+            self.fail(
+                "Invalid rate {}, please use a number of bytes per second with an"
+                " optional K, M or G unit. Example: 50M.".format(value)
+            )
+
+
+def upload_file_to_s3(
+    file, presigned_urls, max_chunk_size, workers=UPLOAD_WORKERS, journal=None
+):
     """
     Function to upload a file, given the target presigned s3 url
 
     Arguments:
-        file_name (str) -- the path of the file to be uploaded
-        presigned_url (str) -- the presigned url to upload the file on s3
+        file (file) -- the file to be uploaded, streams are uploaded until they end
+        presigned_urls (list) -- the presigned urls to upload the file parts on s3
+        max_chunk_size (int) -- the size of each part in bytes
+        workers (int) -- the number of parts uploaded concurrently
+        journal (UploadJournal) -- records uploaded parts, parts already in it are skipped
+    Returns:
+        dict: whether the upload succeeded, the uploaded parts and the sha256
+            digest of the file computed while uploading it, or the error
+            which stopped the upload
     """
+    from tqdm import tqdm
+
     echo(
         style(
             "Uploading the file...",
@@ -57,32 +104,64 @@ def upload_file_to_s3(file, presigned_urls, max_chunk_size):
     )
 
     try:
-        parts = []
-        index = 0
-        file_size = Path(file.name).stat().st_size
-        for chunk_size in tqdm(range(0, file_size, max_chunk_size)):
-            presigned_url_object = presigned_urls[index]
-            part = presigned_url_object["partNumber"]
-            url = presigned_url_object["url"]
-            file_data = file.read(max_chunk_size)
-            response = requests.put(url, data=file_data)
-            if response.status_code != HTTPStatus.OK:
-                response.raise_for_status()
-
-            etag = response.headers["ETag"]
-            parts.append({"ETag": etag, "PartNumber": part})
-            index += 1
-
-        response = {"success": True, "parts": parts}
+        uploaded_parts = dict(journal.parts) if journal is not None else {}
+        num_skipped_parts = len(uploaded_parts)
+        num_parts = None
+        if is_regular_file(file):
+            file_size = os.fstat(file.fileno()).st_size
+            num_parts = get_num_parts(file_size, max_chunk_size)
+        start_time = time.time()
+        parts = FileParts(
+            file, presigned_urls, max_chunk_size, uploaded_parts, workers + 1
+        )
+        with parts, tqdm(
+            total=num_parts, initial=len(uploaded_parts)
+        ) as progress_bar:
+
+            def on_part_uploaded(part_number, etag):
+                uploaded_parts[part_number] = etag
+                if journal is not None:
+                    journal.record_part(part_number, etag)
+                progress_bar.update(1)
+
+            upload_parts(parts, workers, on_part_uploaded)
+            parts_digest = parts.content_hash
+
+        record_upload_throughput(
+            parts.num_bytes,
+            time.time() - start_time,
+            min(workers, len(uploaded_parts) - num_skipped_parts),
+        )
+        parts = [
+            {"ETag": uploaded_parts[part_number], "PartNumber": part_number}
+            for part_number in sorted(uploaded_parts)
+        ]
+        response = {
+            "success": True,
+            "parts": parts,
+            "content_hash": parts_digest,
+        }
     except Exception as err:
         echo(style("\nThere was an error while uploading the file: {}".format(err), fg="red", bold=True))
         response = {
             "success": False,
-            "parts": []
+            "parts": [],
+            "error": err,
         }
     return response
 
 
+def is_expired_upload_error(err):
+    """
+    Returns True if S3 refused a part because its presigned url expired.
+    """
+    return (
+        isinstance(err, requests.exceptions.HTTPError)
+        and err.response is not None
+        and err.response.status_code == HTTPStatus.FORBIDDEN
+    )
+
+
 def validate_token(response):
     """
     Function to check if the authentication token provided by user is valid or not.
@@ -135,6 +214,8 @@ def clean_data(data):
     """
     Strip HTML and clean spaces
     """
+    from bs4 import BeautifulSoup
+
     data = BeautifulSoup(data, "lxml").text.strip()
     data = " ".join(data.split()).encode("utf-8")
     return data
@@ -152,14 +233,31 @@ def generate_random_string(length):
 def publish_submission_message(challenge_phase_pk, submission_pk, headers):
     url = "{}{}".format(get_host_url(), URLS.send_submission_message.value)
     url = url.format(challenge_phase_pk, submission_pk)
-    response = requests.post(
+    response = get_session().post(
         url,
         headers=headers,
     )
     return response
 
 
-def upload_file_using_presigned_url(challenge_phase_pk, file, file_type, submission_metadata={}):
+def upload_file_using_presigned_url(
+    challenge_phase_pk,
+    file,
+    file_type,
+    submission_metadata={},
+    workers=UPLOAD_WORKERS,
+    resume=False,
+    content_hash=None,
+    file_name=None,
+):
+    """
+    Uploads `file` to the phase in parts using presigned urls.
+
+    `file_name` is the name the file is submitted with, the name of `file`
+    by default. Streams such as stdin have no name of their own.
+    """
+    if file_name is None:
+        file_name = file.name
     if file_type == "submission":
         url = "{}{}".format(
             get_host_url(), URLS.get_presigned_url_for_submission_file.value
@@ -177,55 +275,147 @@ def upload_file_using_presigned_url(challenge_phase_pk, file, file_type, submiss
     url = url.format(challenge_phase_pk)
     headers = get_request_header()
 
-    # Limit to max 100 MB chunk for multipart upload
-    max_chunk_size = 20 * 1024 * 1024
+    # Streams such as stdin are uploaded as they are read, so they can't be
+    # hashed up front or read again to resume the upload
+    stream = not is_regular_file(file)
+    if stream and resume:
+        echo(
+            style(
+                "\nError: Uploads from a stream such as stdin can't be resumed.\n",
+                fg="red",
+                bold=True,
+            )
+        )
+        sys.exit(1)
+    file_hash = None if stream else get_file_hash(file)
+    journal = None
+    if resume:
+        journal = UploadJournal.load(file_hash, challenge_phase_pk, file_type)
+        if journal is None:
+            notify_user(
+                "\nNo interrupted upload of {} was found. Starting a new upload.".format(
+                    file_name
+                ),
+                color="yellow",
+            )
 
     try:
-        # Fetching the presigned url
-        if file_type == "submission":
-            file_size = Path(file.name).stat().st_size
-            num_file_chunks = int(file_size / max_chunk_size) + 1
-            data = {
-                "status": "submitting",
-                "file_name": file.name,
-                "num_file_chunks": num_file_chunks,
+        if journal is not None:
+            upload = journal.upload
+            notify_user(
+                "\nResuming the upload of {}: {} parts are already uploaded.".format(
+                    file_name, len(journal.parts)
+                ),
+                color="yellow",
+            )
+        else:
+            # Fetching the presigned url
+            if stream:
+                # Parts of streams are held in memory while they are
+                # uploaded, so they keep the default size whatever the
+                # throughput
+                file_size = UPLOAD_STREAM_MAX_SIZE
+                max_chunk_size = get_part_size(file_size)
+            else:
+                file_size = os.fstat(file.fileno()).st_size
+                max_chunk_size = get_part_size(
+                    file_size, read_upload_throughput()
+                )
+            num_file_chunks = get_num_parts(file_size, max_chunk_size)
+            if file_type == "submission":
+                data = {
+                    "status": "submitting",
+                    "file_name": file_name,
+                    "num_file_chunks": num_file_chunks,
+                }
+                data = dict(data, **submission_metadata)
+                response = get_session().post(url, headers=headers, data=data)
+
+                if response.status_code is not HTTPStatus.CREATED:
+                    response.raise_for_status()
+            elif file_type == "annotation":
+                data = {"file_name": file_name, "num_file_chunks": num_file_chunks}
+                response = get_session().post(url, headers=headers, data=data)
+                if response.status_code is not HTTPStatus.OK:
+                    response.raise_for_status()
+
+            response = response.json()
+            upload = {
+                "upload_id": response.get("upload_id"),
+                "presigned_urls": response.get("presigned_urls"),
+                "submission_pk": response.get("submission_pk"),
+                "max_chunk_size": max_chunk_size,
             }
-            data = dict(data, **submission_metadata)
-            response = requests.post(url, headers=headers, data=data)
+            if not stream:
+                journal = UploadJournal.create(
+                    file_hash, challenge_phase_pk, file_type, upload
+                )
+            if content_hash is not None:
+                index_submission(
+                    content_hash,
+                    challenge_phase_pk,
+                    upload["submission_pk"],
+                    SUBMISSION_UPLOADING,
+                    file_name,
+                    file_hash,
+                )
 
-            if response.status_code is not HTTPStatus.CREATED:
-                response.raise_for_status()
+        presigned_urls = upload["presigned_urls"]
+        upload_id = upload["upload_id"]
+        max_chunk_size = upload["max_chunk_size"]
+        submission_pk = upload["submission_pk"]
 
-            # Update url params for multipart upload on S3
+        # Update url params for multipart upload on S3
+        if file_type == "submission":
             finish_upload_url = finish_upload_url.format(
-                challenge_phase_pk, response.json().get("submission_pk")
+                challenge_phase_pk, submission_pk
             )
         elif file_type == "annotation":
-            file_size = Path(file.name).stat().st_size
-            num_file_chunks = int(file_size / max_chunk_size) + 1
-
-            data = {"file_name": file.name, "num_file_chunks": num_file_chunks}
-            response = requests.post(url, headers=headers, data=data)
-            if response.status_code is not HTTPStatus.OK:
-                response.raise_for_status()
-
-            # Update url params for multipart upload on S3
             finish_upload_url = finish_upload_url.format(challenge_phase_pk)
 
-        response = response.json()
-        presigned_urls = response.get("presigned_urls")
-        upload_id = response.get("upload_id")
-        if file_type == "submission":
-            submission_pk = response.get("submission_pk")
-
         # Uploading the file to S3
-        response = upload_file_to_s3(file, presigned_urls, max_chunk_size)
+        response = upload_file_to_s3(
+            file, presigned_urls, max_chunk_size, workers, journal
+        )
 
-        if not response["success"] and file_type == "submission":
-            # Publishing submission message to the message queue for processing
-            response = publish_submission_message(challenge_phase_pk, submission_pk, headers)
-            response.raise_for_status()
+        if not response["success"]:
+            if is_expired_upload_error(response["error"]):
+                # The presigned urls of the journal can't be used anymore,
+                # so resuming the upload would fail the same way
+                if journal is not None:
+                    journal.delete()
+                echo(
+                    style(
+                        "\nThe upload links have expired, so the upload can't"
+                        " be resumed. Please run the command again without"
+                        " --resume to start a new upload.\n",
+                        fg="red",
+                        bold=True,
+                    )
+                )
+                sys.exit(1)
+            if stream:
+                echo(
+                    style(
+                        "\nThe upload was interrupted. Please submit again.\n",
+                        fg="red",
+                        bold=True,
+                    )
+                )
+                sys.exit(1)
+            # Keep the journal and the upload open so that the remaining
+            # parts can be uploaded with --resume
+            echo(
+                style(
+                    "\nThe upload was interrupted. Run the same command with"
+                    " --resume to upload only the remaining parts.\n",
+                    fg="red",
+                    bold=True,
+                )
+            )
+            sys.exit(1)
 
+        response_content_hash = response["content_hash"]
         data = {
             "parts": json.dumps(response.get("parts")),
             "upload_id": upload_id,
@@ -234,7 +424,7 @@ def upload_file_using_presigned_url(challenge_phase_pk, file, file_type, submiss
             data["annotations_uploaded_using_cli"] = True
 
         # Complete multipart S3 upload
-        upload_response = requests.post(
+        upload_response = get_session().post(
             finish_upload_url, headers=headers, data=data
         )
 
@@ -246,6 +436,19 @@ def upload_file_using_presigned_url(challenge_phase_pk, file, file_type, submiss
         # Publish submission before throwing submission upload error
         if upload_response.status_code is not HTTPStatus.OK:
             upload_response.raise_for_status()
+        if journal is not None:
+            journal.delete()
+        if file_type == "submission":
+            # The digest computed while uploading also covers files which
+            # weren't hashed up front, such as streams
+            index_submission(
+                response_content_hash,
+                challenge_phase_pk,
+                submission_pk,
+                SUBMISSION_SUBMITTED,
+                file_name,
+                file_hash,
+            )
     except requests.exceptions.HTTPError as err:
         if response.status_code in EVALAI_ERROR_CODES:
             validate_token(response.json())
@@ -280,11 +483,11 @@ def upload_file_using_presigned_url(challenge_phase_pk, file, file_type, submiss
 
     if file_type == "submission":
         success_message = "\nYour submission {} with the id {} is successfully submitted for evaluation.\n".format(
-            file.name, submission_pk
+            file_name, submission_pk
         )
     elif file_type == "annotation":
         success_message = "\nThe annotation file {} for challenge phase {} is successfully uploaded.\n".format(
-            file.name, challenge_phase_pk
+            file_name, challenge_phase_pk
         )
     echo(
         style(
@@ -6,6 +6,8 @@ from os.path import expanduser
 
 LEN_OF_TOKEN = 210
 
+TRUTHY_VALUES = ("1", "true", "yes")
+
 AUTH_TOKEN_FILE_NAME = "token.json"
 
 HOST_URL_FILE_NAME = "host_url"
@@ -14,7 +16,11 @@ AUTH_TOKEN_DIR = expanduser("~/.evalai/")
 
 AUTH_TOKEN_PATH = os.path.join(AUTH_TOKEN_DIR, AUTH_TOKEN_FILE_NAME)
 
-API_HOST_URL = os.environ.get("EVALAI_API_URL", "https://eval.ai")
+API_HOST_URL_ENV_VAR = "EVALAI_API_URL"
+
+API_HOST_URL = os.environ.get(API_HOST_URL_ENV_VAR, "https://eval.ai")
+
+AUTH_TOKEN_ENV_VAR = "EVALAI_AUTH_TOKEN"
 
 EVALAI_ERROR_CODES = [400, 401, 403, 406]
 
@@ -31,3 +37,136 @@ ENVIRONMENT = os.environ.get("EVALAI_CLI_ENVIRONMENT", "PRODUCTION")
 LOCAL_DOCKER_REGISTRY_URI = os.environ.get(
     "EVALAI_LOCAL_DOCKER_REGISTRY_URI", "localhost:5000"
 )
+
+# Connection pool settings of the shared HTTP session
+HTTP_POOL_CONNECTIONS = int(os.environ.get("EVALAI_HTTP_POOL_CONNECTIONS", 10))
+
+HTTP_POOL_MAXSIZE = int(os.environ.get("EVALAI_HTTP_POOL_MAXSIZE", 32))
+
+HTTP_MAX_RETRIES = int(os.environ.get("EVALAI_HTTP_MAX_RETRIES", 3))
+
+HTTP_POOL_BLOCK = (
+    os.environ.get("EVALAI_HTTP_POOL_BLOCK", "").lower() in TRUTHY_VALUES
+)
+
+# Responses of rarely changing endpoints cached on disk
+CACHE_DIR = os.path.join(AUTH_TOKEN_DIR, "cache")
+
+NO_CACHE_ENV_VAR = "EVALAI_NO_CACHE"
+
+# Seconds a cached response is used without asking the server, overriding
+# its Cache-Control. Set them per endpoint with, for example,
+# EVALAI_CACHE_TTLS="challenge_details=60,challenge_phase_list=0"
+CACHE_TTLS = {
+    "challenge_details": 300,
+    "challenge_phase_list": 300,
+    "challenge_phase_detail": 300,
+    "challenge_phase_split_detail": 300,
+    "phase_details_using_slug": 300,
+}
+
+CACHE_TTLS_ENV_VAR = "EVALAI_CACHE_TTLS"
+
+# Seconds past its expiry a cached response of a read command is still shown
+# when the server takes longer than CACHE_REVALIDATE_TIMEOUT seconds to
+# revalidate it, in which case it's refreshed in the background
+CACHE_MAX_STALE = int(os.environ.get("EVALAI_CACHE_MAX_STALE", 24 * 60 * 60))
+
+CACHE_REVALIDATE_TIMEOUT = float(
+    os.environ.get("EVALAI_CACHE_REVALIDATE_TIMEOUT", 2)
+)
+
+# Number of pages of a paginated list requested concurrently
+PAGINATE_WORKERS = int(os.environ.get("EVALAI_PAGINATE_WORKERS", 4))
+
+# Number of teams whose challenges are requested concurrently
+TEAM_WORKERS = int(os.environ.get("EVALAI_TEAM_WORKERS", 8))
+
+# Cached check for newer releases of the CLI on PyPI
+UPDATE_CHECK_FILE_PATH = os.path.join(AUTH_TOKEN_DIR, "latest_version.json")
+
+UPDATE_CHECK_TTL = int(os.environ.get("EVALAI_UPDATE_CHECK_TTL", 24 * 60 * 60))
+
+UPDATE_CHECK_TIMEOUT = 5
+
+DISABLE_UPDATE_CHECK_ENV_VAR = "EVALAI_DISABLE_UPDATE_CHECK"
+
+OFFLINE_ENV_VAR = "EVALAI_OFFLINE"
+
+# Number of parts uploaded concurrently to the presigned urls
+UPLOAD_WORKERS = int(os.environ.get("EVALAI_UPLOAD_WORKERS", 4))
+
+# Journals of interrupted multipart uploads
+UPLOAD_JOURNAL_DIR = os.path.join(AUTH_TOKEN_DIR, "uploads")
+
+# Retries of failed part uploads
+UPLOAD_PART_ATTEMPTS = int(os.environ.get("EVALAI_UPLOAD_PART_ATTEMPTS", 5))
+
+UPLOAD_RETRY_BUDGET = int(os.environ.get("EVALAI_UPLOAD_RETRY_BUDGET", 20))
+
+UPLOAD_RETRY_BASE_DELAY = 1
+
+UPLOAD_RETRY_MAX_DELAY = 30
+
+# Integrity check of uploaded parts against their MD5 digest:
+#   etag - compare the ETag returned by S3 with the digest (the default),
+#       except for parts encrypted with SSE-KMS or SSE-C
+#   content-md5 - send a Content-MD5 header so that S3 rejects corrupted
+#       parts, which requires presigned urls that allow the header
+#   none - for buckets whose ETags aren't MD5 digests, e.g. with SSE-KMS
+UPLOAD_CHECKSUM = os.environ.get("EVALAI_UPLOAD_CHECKSUM", "etag").lower()
+
+# Part sizes of multipart uploads, within the limits of S3
+S3_MIN_PART_SIZE = 5 * 1024 * 1024
+
+S3_MAX_PART_SIZE = 5 * 1024 * 1024 * 1024
+
+S3_MAX_PARTS = 10000
+
+UPLOAD_MIN_PART_SIZE = 8 * 1024 * 1024
+
+UPLOAD_MAX_PART_SIZE = 256 * 1024 * 1024
+
+UPLOAD_DEFAULT_PART_SIZE = 20 * 1024 * 1024
+
+# Parts are sized to take about this long at the measured throughput
+UPLOAD_TARGET_PART_SECONDS = 10
+
+UPLOAD_STATS_FILE_PATH = os.path.join(AUTH_TOKEN_DIR, "upload_stats.json")
+
+# Number of ranges downloaded concurrently and the size of each range
+DOWNLOAD_WORKERS = int(os.environ.get("EVALAI_DOWNLOAD_WORKERS", 4))
+
+DOWNLOAD_PART_SIZE = int(
+    os.environ.get("EVALAI_DOWNLOAD_PART_SIZE", 16 * 1024 * 1024)
+)
+
+# Size of the buffer each download thread reads into
+DOWNLOAD_BUFFER_SIZE = int(
+    os.environ.get("EVALAI_DOWNLOAD_BUFFER_SIZE", 1024 * 1024)
+)
+
+# Seconds between progress updates of a download thread
+DOWNLOAD_PROGRESS_INTERVAL = 0.2
+
+# Records the size and ETag of the files downloaded to a directory
+DOWNLOAD_MANIFEST_FILE_NAME = ".evalai_downloads.json"
+
+# Limits the bandwidth of uploads and downloads, e.g. 50M for 50 MiB/s
+MAX_RATE_ENV_VAR = "EVALAI_MAX_RATE"
+
+# Largest stream, such as stdin, that can be uploaded. Streams have no size
+# up front, so uploads are created with enough parts for this many bytes
+UPLOAD_STREAM_MAX_SIZE = int(
+    os.environ.get("EVALAI_UPLOAD_STREAM_MAX_SIZE", 20 * 1024 * 1024 * 1024)
+)
+
+# Maps the content hash of submitted files and images to their submissions
+SUBMISSION_INDEX_FILE_PATH = os.path.join(
+    AUTH_TOKEN_DIR, "submission_index.json"
+)
+
+# Submission files of this size or larger are uploaded using presigned urls
+LARGE_FILE_THRESHOLD = int(
+    os.environ.get("EVALAI_LARGE_FILE_THRESHOLD", 100 * 1024 * 1024)
+)
@@ -0,0 +1,494 @@
+import json
+import os
+import re
+import requests
+import threading
+import time
+
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
+from http import HTTPStatus
+from urllib3.exceptions import DecodeError, ProtocolError, ReadTimeoutError
+
+from evalai.utils.config import (
+    DOWNLOAD_BUFFER_SIZE,
+    DOWNLOAD_PART_SIZE,
+    DOWNLOAD_PROGRESS_INTERVAL,
+    DOWNLOAD_WORKERS,
+    UPLOAD_PART_ATTEMPTS,
+)
+from evalai.utils.files import create_journal, read_journal
+from evalai.utils.ratelimit import get_rate_limiter
+from evalai.utils.session import get_session
+from evalai.utils.uploads import get_backoff_delay, is_retryable_error
+
+
+# Read buffers of the download threads
+_buffers = threading.local()
+
+
+class RangeNotSatisfiedError(requests.exceptions.RequestException):
+    """
+    Raised when the server doesn't return the range which was requested.
+    """
+
+
+class DownloadJournal(object):
+    """
+    Records the completed ranges of a download written to a `.part` file so
+    that an interrupted download can be resumed.
+
+    The first line of the journal holds the size and validators of the
+    file and each following line a completed range, appended as soon as it
+    is written. The journal of a download streamed in order has no ranges,
+    as the size of the `.part` file tells how much of it was written.
+    """
+
+    def __init__(self, path, download, ranges):
+        self.path = path
+        self.download = download
+        self.ranges = ranges
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def get_path(path):
+        return "{}.part.jsonl".format(path)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Returns the journal of an interrupted download to `path`, or None.
+        """
+        journal_path = cls.get_path(path)
+        journal = read_journal(journal_path)
+        if journal is None:
+            return None
+        download, ranges = journal
+        return cls(journal_path, download, dict(ranges))
+
+    @classmethod
+    def create(cls, path, download):
+        journal_path = cls.get_path(path)
+        create_journal(journal_path, download)
+        return cls(journal_path, download, {})
+
+    @property
+    def validator(self):
+        """
+        Returns the value of the If-Range header which only lets the server
+        return ranges of the same version of the file.
+        """
+        etag = self.download.get("etag")
+        if etag and not etag.startswith("W/"):
+            return etag
+        return self.download.get("last_modified")
+
+    @property
+    def num_bytes(self):
+        return sum(end - start + 1 for start, end in self.ranges.items())
+
+    def record_range(self, start, end):
+        with self._lock:
+            self.ranges[start] = end
+            with open(self.path, "a") as fw:
+                fw.write("{}\n".format(json.dumps([start, end])))
+
+    def delete(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def parse_content_range(content_range):
+    """
+    Returns the first byte, last byte and total size of a Content-Range
+    header such as "bytes 0-99/1000", or None if it can't be parsed. The
+    total size is None if the server doesn't know it.
+    """
+    match = re.match(r"^bytes (\d+)-(\d+)/(\d+|\*)$", content_range or "")
+    if match is None:
+        return None
+    start, end, size = match.groups()
+    return int(start), int(end), None if size == "*" else int(size)
+
+
+def get_ranges(start, end, part_size):
+    """
+    Returns the inclusive byte ranges of `part_size` bytes from `start` up to
+    `end`, excluded.
+    """
+    return [
+        (offset, min(offset + part_size, end) - 1)
+        for offset in range(start, end, part_size)
+    ]
+
+
+def preallocate(fd, size):
+    """
+    Reserves `size` bytes for the file, so that parts written out of order
+    don't fragment it.
+    """
+    try:
+        os.posix_fallocate(fd, 0, size)
+    except (AttributeError, OSError):
+        os.ftruncate(fd, size)
+
+
+def pwrite(fd, data, offset):
+    """
+    Writes all of `data` at `offset` without moving the file position, so
+    that threads can write their ranges to the same file.
+    """
+    view = memoryview(data)
+    while view:
+        written = os.pwrite(fd, view, offset)
+        view = view[written:]
+        offset += written
+
+
+def get_buffer(size):
+    """
+    Returns a buffer of `size` bytes reused by all the reads of the thread.
+    """
+    buffer = getattr(_buffers, "buffer", None)
+    if buffer is None or len(buffer) != size:
+        buffer = _buffers.buffer = bytearray(size)
+    return buffer
+
+
+def write_body(
+    response,
+    write,
+    offset,
+    callback=None,
+    buffer_size=DOWNLOAD_BUFFER_SIZE,
+):
+    """
+    Writes the body of `response` with `write(data, offset)` starting at
+    `offset` and returns the offset following the body.
+
+    The body is read into a buffer reused by the thread, `buffer_size`
+    bytes at a time, so the data isn't copied into a new object for every
+    read. `callback` is called with the number of bytes written at most
+    every DOWNLOAD_PROGRESS_INTERVAL seconds and once at the end.
+    """
+    view = memoryview(get_buffer(buffer_size))
+    # requests only decodes the body when iterating over it
+    response.raw.decode_content = True
+    num_bytes = 0
+    reported_at = time.monotonic()
+    try:
+        while True:
+            try:
+                count = response.raw.readinto(view)
+            except ProtocolError as err:
+                raise requests.exceptions.ChunkedEncodingError(err)
+            except DecodeError as err:
+                raise requests.exceptions.ContentDecodingError(err)
+            except ReadTimeoutError as err:
+                raise requests.exceptions.ConnectionError(err)
+            if not count:
+                break
+            rate_limiter = get_rate_limiter()
+            if rate_limiter is not None:
+                rate_limiter.consume(count)
+            write(view[:count], offset)
+            offset += count
+            num_bytes += count
+            if (
+                callback is not None
+                and time.monotonic() - reported_at >= DOWNLOAD_PROGRESS_INTERVAL
+            ):
+                callback(num_bytes)
+                num_bytes = 0
+                reported_at = time.monotonic()
+    finally:
+        if callback is not None and num_bytes:
+            callback(num_bytes)
+    return offset
+
+
+def download_range(
+    url,
+    fd,
+    start,
+    end,
+    callback=None,
+    attempts=UPLOAD_PART_ATTEMPTS,
+    if_range=None,
+):
+    """
+    Downloads the bytes from `start` to `end`, included, into the file `fd`.
+
+    Failed requests are retried up to `attempts` times in total and each
+    retry only requests the bytes which weren't received yet. With
+    `if_range`, the range is only accepted from the version of the file
+    with that ETag or Last-Modified date.
+    """
+    offset = start
+    for attempt in range(1, attempts + 1):
+        try:
+            headers = {"Range": "bytes={}-{}".format(offset, end)}
+            if if_range is not None:
+                headers["If-Range"] = if_range
+            with get_session().get(url, headers=headers, stream=True) as response:
+                response.raise_for_status()
+                content_range = parse_content_range(
+                    response.headers.get("Content-Range")
+                )
+                if (
+                    response.status_code != HTTPStatus.PARTIAL_CONTENT
+                    or content_range is None
+                    or content_range[0] != offset
+                ):
+                    raise RangeNotSatisfiedError(
+                        "The server didn't return the bytes {}-{}.".format(
+                            offset, end
+                        )
+                    )
+                offset = write_body(
+                    response,
+                    lambda data, offset: pwrite(fd, data, offset),
+                    offset,
+                    callback,
+                )
+            if offset > end:
+                return
+            raise requests.exceptions.ConnectionError(
+                "The connection was closed before the end of the range."
+            )
+        except requests.exceptions.RequestException as err:
+            if attempt == attempts or not is_retryable_error(err):
+                raise
+        time.sleep(get_backoff_delay(attempt))
+
+
+def download(
+    url,
+    path,
+    workers=DOWNLOAD_WORKERS,
+    part_size=DOWNLOAD_PART_SIZE,
+    callback=None,
+    on_size=None,
+):
+    """
+    Downloads `url` to `path` with up to `workers` concurrent range requests.
+
+    The first request asks for the first byte only. If the server answers
+    with a range, the size of the file is known from its Content-Range and
+    the parts are requested concurrently, each written in place into the
+    preallocated file. Otherwise the file is downloaded as a single stream
+    from the response to the first request, as it is with a single worker.
+
+    The file is written to `path` with a `.part` suffix and renamed once it
+    is complete. The ranges written are recorded in a DownloadJournal, so
+    that downloading the same file to the same path again only requests
+    the missing ranges, as long as the file didn't change in between. An
+    interrupted stream is resumed from the end of its `.part` file.
+
+    Arguments:
+        url (str) -- the url of the file
+        path (str) -- the path the file is written to
+        workers (int) -- number of parts downloaded concurrently
+        part_size (int) -- number of bytes requested at a time
+        callback (callable) -- called with the number of bytes of every chunk written
+        on_size (callable) -- called with the size of the file, or None if unknown
+    Returns:
+        dict: the size and the ETag of the downloaded file
+    """
+    lock = threading.Lock()
+
+    def on_data(num_bytes):
+        if callback is not None:
+            with lock:
+                callback(num_bytes)
+
+    part_path = "{}.part".format(path)
+    journal = None
+    if os.path.exists(part_path):
+        journal = DownloadJournal.load(path)
+
+    # Positional writes aren't available on every platform
+    parallel = hasattr(os, "pwrite") and workers > 1
+    headers = {}
+    offset = 0
+    if parallel:
+        headers["Range"] = "bytes=0-0"
+        if journal is not None and journal.validator is not None:
+            headers["If-Range"] = journal.validator
+    elif (
+        journal is not None
+        and journal.download.get("stream")
+        and journal.validator is not None
+    ):
+        # A stream is written in order, so the download continues from the
+        # end of the .part file
+        offset = os.path.getsize(part_path)
+        headers["Range"] = "bytes={}-".format(offset)
+        headers["If-Range"] = journal.validator
+    response = get_session().get(url, headers=headers, stream=True)
+    if (
+        offset
+        and response.status_code == HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE
+    ):
+        response.close()
+        if offset == journal.download.get("size"):
+            # The .part file already holds the whole file
+            os.replace(part_path, path)
+            journal.delete()
+            if on_size is not None:
+                on_size(offset)
+            return {"size": offset, "etag": journal.download.get("etag")}
+        offset = 0
+        response = get_session().get(url, stream=True)
+    if response.status_code == HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE:
+        # Even the first byte is out of range of an empty file
+        response.close()
+        if journal is not None:
+            journal.delete()
+        open(part_path, "wb").close()
+        os.replace(part_path, path)
+        if on_size is not None:
+            on_size(0)
+        return {"size": 0, "etag": response.headers.get("ETag")}
+    response.raise_for_status()
+    content_range = parse_content_range(response.headers.get("Content-Range"))
+    if (
+        offset
+        and response.status_code == HTTPStatus.PARTIAL_CONTENT
+        and content_range is not None
+        and content_range[0] == offset
+    ):
+        # The file didn't change, so the rest of it is appended
+        if on_size is not None:
+            on_size(content_range[2])
+        on_data(offset)
+        with response, open(part_path, "ab") as file:
+            size = write_body(
+                response, lambda data, offset: file.write(data), offset, on_data
+            )
+        os.replace(part_path, path)
+        journal.delete()
+        return {"size": size, "etag": journal.download.get("etag")}
+    if (
+        not parallel
+        or response.status_code != HTTPStatus.PARTIAL_CONTENT
+        or content_range is None
+        or content_range[2] is None
+    ):
+        # The server doesn't support ranges, or the file changed since the
+        # interrupted download, so the file comes in one stream
+        if journal is not None:
+            journal.delete()
+        if response.status_code == HTTPStatus.PARTIAL_CONTENT:
+            # The size of the file is unknown, or the range isn't the one
+            # requested, and the response only holds part of the file
+            response.close()
+            response = get_session().get(url, stream=True)
+            response.raise_for_status()
+            if response.status_code != HTTPStatus.OK:
+                response.close()
+                raise RangeNotSatisfiedError(
+                    "The server didn't return the whole file."
+                )
+        size = response.headers.get("Content-Length")
+        size = int(size) if size is not None else None
+        if on_size is not None:
+            on_size(size)
+        journal = None
+        if response.headers.get("Content-Encoding", "identity") == "identity":
+            # Ranges of encoded bodies don't match the decoded file, so only
+            # plain bodies can be resumed
+            journal = DownloadJournal.create(
+                path,
+                {
+                    "size": size,
+                    "etag": response.headers.get("ETag"),
+                    "last_modified": response.headers.get("Last-Modified"),
+                    "stream": True,
+                },
+            )
+        with response, open(part_path, "wb") as file:
+            size = write_body(
+                response, lambda data, offset: file.write(data), 0, on_data
+            )
+        os.replace(part_path, path)
+        if journal is not None:
+            journal.delete()
+        return {"size": size, "etag": response.headers.get("ETag")}
+
+    response.close()
+    download = {
+        "size": content_range[2],
+        "etag": response.headers.get("ETag"),
+        "last_modified": response.headers.get("Last-Modified"),
+        "part_size": part_size,
+    }
+    resume = (
+        journal is not None
+        and not journal.download.get("stream")
+        and all(
+            journal.download.get(key) == download[key]
+            for key in ("size", "etag", "last_modified")
+        )
+    )
+    if resume:
+        part_size = journal.download["part_size"]
+    else:
+        journal = DownloadJournal.create(path, download)
+    size = download["size"]
+    if on_size is not None:
+        on_size(size)
+
+    with open(part_path, "r+b" if resume else "wb") as file:
+        fd = file.fileno()
+        if resume:
+            on_data(journal.num_bytes)
+        else:
+            preallocate(fd, size)
+
+        def download_part(start, end):
+            download_range(
+                url, fd, start, end, on_data, if_range=journal.validator
+            )
+            journal.record_range(start, end)
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [
+                executor.submit(download_part, start, end)
+                for start, end in get_ranges(0, size, part_size)
+                if start not in journal.ranges
+            ]
+            try:
+                done, _ = wait(futures, return_when=FIRST_EXCEPTION)
+                for future in done:
+                    future.result()
+            except BaseException:
+                for future in futures:
+                    future.cancel()
+                raise
+    os.replace(part_path, path)
+    journal.delete()
+    return {"size": size, "etag": download["etag"]}
+
+
+def get_file_info(url):
+    """
+    Returns the size and the ETag of the file at `url` without downloading
+    it, the size being None if the server doesn't send it.
+
+    Only the first byte is requested, as presigned urls are only valid for
+    GET requests.
+    """
+    with get_session().get(
+        url, headers={"Range": "bytes=0-0"}, stream=True
+    ) as response:
+        if response.status_code == HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE:
+            return {"size": 0, "etag": response.headers.get("ETag")}
+        response.raise_for_status()
+        size = None
+        content_range = parse_content_range(response.headers.get("Content-Range"))
+        if response.status_code == HTTPStatus.PARTIAL_CONTENT:
+            if content_range is not None:
+                size = content_range[2]
+        elif response.headers.get("Content-Length") is not None:
+            size = int(response.headers["Content-Length"])
+        return {"size": size, "etag": response.headers.get("ETag")}
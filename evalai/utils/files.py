@@ -0,0 +1,88 @@
+import contextlib
+import json
+import os
+import tempfile
+
+try:
+    import fcntl
+except ImportError:
+    # Not available on Windows
+    fcntl = None
+
+
+def write_json_file(path, data, **kwargs):
+    """
+    Writes `data` as JSON to `path`, creating its directory if needed. The
+    keyword arguments are passed on to json.dump.
+
+    The data is written to a temporary file first and then renamed, so
+    readers never see a partial file. The temporary file is removed if the
+    data can't be written.
+    """
+    directory = os.path.dirname(path) or "."
+    if not os.path.exists(directory):
+        os.makedirs(directory)
+    fd, temp_path = tempfile.mkstemp(dir=directory)
+    try:
+        with os.fdopen(fd, "w") as fw:
+            json.dump(data, fw, **kwargs)
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+
+
+def create_journal(path, header):
+    """
+    Starts the journal at `path` with `header` as its first line, replacing
+    any earlier journal.
+
+    Journals may hold presigned urls, which grant access to their file, so
+    only the user can read them.
+    """
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w") as fw:
+        # The mode only applies to new files
+        os.chmod(path, 0o600)
+        fw.write("{}\n".format(json.dumps(header)))
+
+
+def read_journal(path):
+    """
+    Returns the first line of the journal at `path` and the list of its
+    following lines, each parsed as JSON, or None if it can't be read.
+    """
+    try:
+        with open(path, "r") as fr:
+            lines = fr.read().splitlines()
+        header = json.loads(lines[0])
+    except (OSError, IOError, IndexError, ValueError):
+        return None
+    records = []
+    for line in lines[1:]:
+        try:
+            records.append(json.loads(line))
+        except ValueError:
+            # The last line may be incomplete if the process was killed
+            continue
+    return header, records
+
+
+@contextlib.contextmanager
+def file_lock(path):
+    """
+    Holds an exclusive lock on the file at `path`, so that processes which
+    read, modify and write the same file don't overwrite each other's
+    changes. Nothing is locked on platforms without fcntl.
+    """
+    directory = os.path.dirname(path)
+    if not os.path.exists(directory):
+        os.makedirs(directory)
+    with open(path, "a") as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        # The lock is released when the file is closed
+        yield
@@ -0,0 +1,22 @@
+import subprocess
+
+
+def spawn_detached(args, env=None):
+    """
+    Runs `args` in a detached process which outlives the CLI call.
+
+    The process has no access to the terminal and failures to start it are
+    ignored, as it only does work in the background.
+    """
+    try:
+        subprocess.Popen(
+            args,
+            env=env,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            close_fds=True,
+            start_new_session=True,
+        )
+    except OSError:
+        pass
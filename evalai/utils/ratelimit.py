@@ -0,0 +1,100 @@
+import re
+import threading
+import time
+
+
+RATE_UNITS = {"": 1, "K": 1024, "M": 1024 ** 2, "G": 1024 ** 3}
+
+
+def parse_rate(value):
+    """
+    Returns the number of bytes per second of a rate such as 500K or 50M.
+
+    Units are powers of 1024 and an optional trailing B or /s is allowed.
+    """
+    match = re.match(
+        r"^\s*(\d+(?:\.\d+)?)\s*([KMG]?)(?:B)?(?:/s)?\s*$", str(value), re.IGNORECASE
+    )
+    if match is None:
+        raise ValueError("Invalid rate: {}".format(value))
+    rate = int(float(match.group(1)) * RATE_UNITS[match.group(2).upper()])
+    if rate <= 0:
+        raise ValueError("The rate must be greater than zero.")
+    return rate
+
+
+class TokenBucket(object):
+    """
+    Limits the bytes transferred by all the threads sharing it to `rate`
+    bytes per second, with bursts of up to `burst` bytes.
+
+    Transfers take the tokens for their bytes and wait while the bucket is
+    in debt, so concurrent transfers share the rate between them.
+    """
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.burst = burst if burst is not None else max(rate // 10, 64 * 1024)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def consume(self, num_bytes):
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(
+                self.burst, self._tokens + (now - self._updated) * self.rate
+            )
+            self._updated = now
+            self._tokens -= num_bytes
+            delay = -self._tokens / self.rate
+        if delay > 0:
+            time.sleep(delay)
+
+
+class ThrottledReader(object):
+    """
+    Reads `data` as a file whose reads are limited by `bucket`.
+
+    The length is known, so requests sends it with a Content-Length header
+    and reads it in blocks, each of which waits for its tokens.
+    """
+
+    def __init__(self, data, bucket):
+        self.data = memoryview(data)
+        self.bucket = bucket
+        self._offset = 0
+
+    def __len__(self):
+        return len(self.data) - self._offset
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = len(self)
+        chunk = self.data[self._offset:self._offset + size]
+        self._offset += len(chunk)
+        if chunk:
+            self.bucket.consume(len(chunk))
+        return chunk
+
+    def close(self):
+        self.data.release()
+
+
+_rate_limiter = None
+
+
+def set_max_rate(rate):
+    """
+    Limits all uploads and downloads of the process to `rate` bytes per
+    second together, or removes the limit if `rate` is None.
+    """
+    global _rate_limiter
+    _rate_limiter = TokenBucket(rate) if rate else None
+
+
+def get_rate_limiter():
+    """
+    Returns the TokenBucket shared by all transfers, or None without a limit.
+    """
+    return _rate_limiter
@@ -1,22 +1,150 @@
 import json
+import math
 import requests
 import sys
+import urllib.parse as urlparse
 
 from click import echo, style
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from itertools import islice
 
-from evalai.utils.config import EVALAI_ERROR_CODES
+from evalai.utils.config import EVALAI_ERROR_CODES, PAGINATE_WORKERS
 from evalai.utils.common import validate_token
 
 from .auth import get_request_header, get_host_url
+from .cache import cached_get
+from .session import get_session
+from .uploads import post_multipart
 
 
-def make_request(path, method, files=None, data=None):
+def get_page(url, headers=None, endpoint=None, stale_while_revalidate=False):
+    if endpoint is not None:
+        response = cached_get(url, headers, endpoint, stale_while_revalidate)
+    else:
+        response = get_session().get(url, headers=headers)
+    response.raise_for_status()
+    return response.json()
+
+
+def get_page_url(next_url, number, page_size):
+    """
+    Returns the url of the page `number`, counted from 1, built from the
+    `next` link of the first page, or None if the link doesn't have a page
+    number or an offset.
+    """
+    parsed_url = urlparse.urlparse(next_url)
+    query = urlparse.parse_qs(parsed_url.query, keep_blank_values=True)
+    if "page" in query:
+        query["page"] = [str(number)]
+    elif "offset" in query:
+        query["offset"] = [str((number - 1) * page_size)]
+    else:
+        return None
+    return urlparse.urlunparse(
+        parsed_url._replace(query=urlparse.urlencode(query, doseq=True))
+    )
+
+
+def get_next_url(url, page):
+    next_url = page.get("next")
+    return urlparse.urljoin(url, next_url) if next_url else None
+
+
+def paginate(
+    url,
+    headers=None,
+    limit=None,
+    workers=PAGINATE_WORKERS,
+    endpoint=None,
+    stale_while_revalidate=False,
+):
+    """
+    Yields the rows of a paginated list endpoint in the order of the server.
+
+    The `count` of the first page tells how many pages follow, so they are
+    requested concurrently, up to `workers` pages ahead of the rows being
+    consumed, rather than one `next` link after the other. Callers can stop
+    early without the remaining pages being requested, and with `limit`
+    only the pages holding the first `limit` rows are requested. Errors are
+    raised like the ones of the requests themselves.
+
+    Arguments:
+        url (str) -- the url of the first page
+        headers (dict) -- the headers sent with every page request
+        limit (int) -- the maximum number of rows yielded, or None for all
+        workers (int) -- the number of pages requested concurrently
+        endpoint (URLS) -- the endpoint of the list, whose pages are cached
+        stale_while_revalidate (bool) -- whether stale cached pages are used
+            while they are refreshed in the background
+    """
+    cache_args = (endpoint, stale_while_revalidate)
+    if limit is not None and limit <= 0:
+        return
+    page = get_page(url, headers, *cache_args)
+    next_url = get_next_url(url, page)
+    page_size = len(page["results"])
+    page_urls = []
+    if next_url and page.get("count") and page_size and workers > 1:
+        num_rows = page["count"] if limit is None else min(page["count"], limit)
+        num_pages = int(math.ceil(num_rows / page_size))
+        page_urls = [
+            get_page_url(next_url, number, page_size)
+            for number in range(2, num_pages + 1)
+        ]
+        if None in page_urls:
+            page_urls = []
+
+    num_rows = 0
+    executor = None
+    futures = deque()
+    try:
+        if page_urls:
+            executor = ThreadPoolExecutor(max_workers=workers)
+            page_urls = iter(page_urls)
+            for page_url in islice(page_urls, workers):
+                futures.append(executor.submit(get_page, page_url, headers, *cache_args))
+        while True:
+            for row in page["results"]:
+                yield row
+                num_rows += 1
+                if num_rows == limit:
+                    return
+            if futures:
+                try:
+                    page = futures.popleft().result()
+                except requests.exceptions.HTTPError as err:
+                    # The list got shorter since its count was read
+                    if err.response.status_code == HTTPStatus.NOT_FOUND:
+                        return
+                    raise
+                for page_url in islice(page_urls, 1):
+                    futures.append(executor.submit(get_page, page_url, headers, *cache_args))
+            else:
+                # Without a count, or for rows added since it was read, the
+                # `next` links are followed one after the other
+                next_url = get_next_url(url, page)
+                if not next_url:
+                    return
+                page = get_page(next_url, headers, *cache_args)
+    finally:
+        for future in futures:
+            future.cancel()
+        if executor is not None:
+            executor.shutdown(wait=False)
+
+
+def make_request(path, method, files=None, data=None, endpoint=None):
     url = "{}{}".format(get_host_url(), path)
     headers = get_request_header()
 
     if method == "GET":
         try:
-            response = requests.get(url, headers=headers)
+            if endpoint is not None:
+                response = cached_get(url, headers, endpoint)
+            else:
+                response = get_session().get(url, headers=headers)
             response.raise_for_status()
         except requests.exceptions.HTTPError as err:
             if response.status_code in EVALAI_ERROR_CODES:
@@ -52,9 +180,10 @@ def make_request(path, method, files=None, data=None):
         else:
             data = {"status": "submitting"}
         try:
-            response = requests.post(
-                url, headers=headers, files=files, data=data
-            )
+            if files:
+                response = post_multipart(url, headers, data, files)
+            else:
+                response = get_session().post(url, headers=headers, data=data)
             response.raise_for_status()
         except requests.exceptions.HTTPError as err:
             if response.status_code in EVALAI_ERROR_CODES:
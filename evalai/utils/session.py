@@ -0,0 +1,80 @@
+import requests
+import threading
+
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from evalai.utils.config import (
+    HTTP_MAX_RETRIES,
+    HTTP_POOL_BLOCK,
+    HTTP_POOL_CONNECTIONS,
+    HTTP_POOL_MAXSIZE,
+)
+
+
+requests.packages.urllib3.disable_warnings()
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def create_session():
+    """
+    Creates a keep-alive session backed by a tuned connection pool.
+
+    Only connection failures are retried by the adapter, so a request
+    which reached the server is never sent twice.
+    """
+    retries = Retry(
+        total=HTTP_MAX_RETRIES,
+        read=0,
+        status=0,
+        backoff_factor=0.3,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=HTTP_POOL_CONNECTIONS,
+        pool_maxsize=HTTP_POOL_MAXSIZE,
+        max_retries=retries,
+        pool_block=HTTP_POOL_BLOCK,
+    )
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+class OfflineAdapter(requests.adapters.BaseAdapter):
+    """
+    Adapter which fails every request, so that nothing is sent in offline
+    mode.
+    """
+
+    def send(self, request, **kwargs):
+        raise requests.exceptions.ConnectionError(
+            "No requests are made in offline mode."
+        )
+
+    def close(self):
+        pass
+
+
+def set_offline():
+    """
+    Makes every request of the shared session fail without being sent.
+    """
+    session = get_session()
+    session.mount("https://", OfflineAdapter())
+    session.mount("http://", OfflineAdapter())
+
+
+def get_session():
+    """
+    Returns the process-wide session through which every API call is made.
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = create_session()
+    return _session
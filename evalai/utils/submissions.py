@@ -1,13 +1,33 @@
+import io
 import json
+import os
 import requests
 import sys
+import urllib.parse as urlparse
 
 from beautifultable import BeautifulTable
 from click import echo, style
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 
 from evalai.utils.auth import get_request_header, get_host_url
-from evalai.utils.config import EVALAI_ERROR_CODES
+from evalai.utils.cache import cached_get
+from evalai.utils.config import (
+    DOWNLOAD_MANIFEST_FILE_NAME,
+    EVALAI_ERROR_CODES,
+    LARGE_FILE_THRESHOLD,
+)
+from evalai.utils.downloads import download, get_file_info
+from evalai.utils.files import write_json_file
+from evalai.utils.requests import paginate
+from evalai.utils.session import get_session
+from evalai.utils.uploads import (
+    SUBMISSION_SUBMITTED,
+    SUBMISSION_UPLOADING,
+    get_indexed_submission,
+    index_submission,
+    post_multipart,
+)
 from evalai.utils.urls import URLS
 from evalai.utils.common import (
     convert_UTC_date_to_local,
@@ -34,7 +54,7 @@ def get_submission_meta_attributes(challenge_id, phase_id):
     url = url.format(challenge_id, phase_id)
     headers = get_request_header()
     try:
-        response = requests.get(url, headers=headers)
+        response = cached_get(url, headers, URLS.challenge_phase_detail)
         response.raise_for_status()
     except requests.exceptions.HTTPError as err:
         if response.status_code in EVALAI_ERROR_CODES:
@@ -66,29 +86,87 @@ def get_submission_meta_attributes(challenge_id, phase_id):
     return response["submission_meta_attributes"]
 
 
+def is_large_file(file):
+    """
+    Returns True if the file should be uploaded using presigned urls.
+    """
+    try:
+        file_size = os.fstat(file.fileno()).st_size
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        return False
+    return file_size >= LARGE_FILE_THRESHOLD
+
+
+def is_duplicate_submission(content_hash, phase_id, skip_duplicates, resume=False):
+    """
+    Warns if `content_hash` was already submitted to the phase.
+
+    Returns True if the submission should be skipped.
+    """
+    submission = get_indexed_submission(content_hash, phase_id)
+    if submission is None:
+        return False
+    if submission["state"] == SUBMISSION_UPLOADING:
+        if not resume:
+            echo(
+                style(
+                    "\nAn earlier upload of {} to phase {} was interrupted."
+                    " Use --resume to upload only the remaining parts.".format(
+                        submission["name"], phase_id
+                    ),
+                    fg="yellow",
+                )
+            )
+        return False
+    if skip_duplicates:
+        echo(
+            style(
+                "\nSkipping the submission: {} was already submitted to phase {}"
+                " as submission {}.\n".format(
+                    submission["name"], phase_id, submission["submission_pk"]
+                ),
+                fg="yellow",
+                bold=True,
+            )
+        )
+        return True
+    echo(
+        style(
+            "\nWarning: {} was already submitted to phase {} as submission {}."
+            " Use --skip-duplicates to skip identical submissions.".format(
+                submission["name"], phase_id, submission["submission_pk"]
+            ),
+            fg="yellow",
+        )
+    )
+    return False
+
+
 def make_submission(
     challenge_id,
     phase_id,
     file,
     submission_metadata={},
     submission_attribute_metadata={},
+    content_hash=None,
+    file_name=None,
 ):
     """
-    Function to submit a file to a challenge
+    Function to submit a file to a challenge, named `file_name` if given
     """
+    if file_name is None:
+        file_name = file.name
     url = "{}{}".format(get_host_url(), URLS.make_submission.value)
     url = url.format(challenge_id, phase_id)
     headers = get_request_header()
-    input_file = {"input_file": file}
+    input_file = {"input_file": (file_name, file)}
     data = {
         "status": "submitting",
         "submission_metadata": json.dumps(submission_attribute_metadata),
     }
     data = dict(data, **submission_metadata)
     try:
-        response = requests.post(
-            url, headers=headers, files=input_file, data=data
-        )
+        response = post_multipart(url, headers, data, input_file)
         file.close()
         response.raise_for_status()
     except requests.exceptions.HTTPError as err:
@@ -120,10 +198,14 @@ def make_submission(
         )
         sys.exit(1)
     response = response.json()
+    if content_hash is not None:
+        index_submission(
+            content_hash, phase_id, response["id"], SUBMISSION_SUBMITTED, file_name
+        )
     echo(
         style(
             "\nYour file {} with the ID {} is successfully submitted.\n".format(
-                file.name, response["id"]
+                file_name, response["id"]
             ),
             fg="green",
             bold=True,
@@ -197,11 +279,9 @@ def pretty_print_my_submissions_data(submissions, start_date, end_date):
     echo(table)
 
 
-def display_my_submission_details(
-    challenge_id, phase_id, start_date, end_date
-):
+def get_my_submissions(challenge_id, phase_id, limit=None):
     """
-    Function to display the details of a particular submission.
+    Function to fetch the submissions of the user to a challenge phase
     """
     url = URLS.my_submissions.value
     url = "{}{}".format(get_host_url(), url)
@@ -209,9 +289,9 @@ def display_my_submission_details(
     headers = get_request_header()
 
     try:
-        response = requests.get(url, headers=headers)
-        response.raise_for_status()
+        submissions = list(paginate(url, headers, limit))
     except requests.exceptions.HTTPError as err:
+        response = err.response
         if response.status_code in EVALAI_ERROR_CODES:
             validate_token(response.json())
             echo(
@@ -237,13 +317,158 @@ def display_my_submission_details(
             )
         )
         sys.exit(1)
+    return submissions
 
-    response = response.json()
 
-    submissions = response["results"]
+def display_my_submission_details(
+    challenge_id, phase_id, start_date, end_date, limit=None
+):
+    """
+    Function to display the details of a particular submission.
+    """
+    submissions = get_my_submissions(challenge_id, phase_id, limit)
     pretty_print_my_submissions_data(submissions, start_date, end_date)
 
 
+def get_submission_file_path(out, submission, url):
+    """
+    Returns the path of a file of a submission in the directory `out`.
+    """
+    file_name = os.path.basename(urlparse.urlparse(url).path)
+    return os.path.join(out, "submission_{}".format(submission["id"]), file_name)
+
+
+def read_download_manifest(out):
+    """
+    Returns the size and ETag of every file downloaded to the directory `out`.
+    """
+    try:
+        with open(os.path.join(out, DOWNLOAD_MANIFEST_FILE_NAME), "r") as fr:
+            return json.load(fr)
+    except (OSError, IOError, ValueError):
+        return {}
+
+
+def write_download_manifest(out, manifest):
+    write_json_file(
+        os.path.join(out, DOWNLOAD_MANIFEST_FILE_NAME),
+        manifest,
+        indent=2,
+        sort_keys=True,
+    )
+
+
+def is_downloaded(url, path, entry):
+    """
+    Checks whether the file at `path` is the same as the one at `url`,
+    using the size and ETag recorded in `entry` when it was downloaded.
+    """
+    if entry is None or not os.path.isfile(path):
+        return False
+    info = get_file_info(url)
+    if info["size"] is None or info["size"] != os.path.getsize(path):
+        return False
+    return info["etag"] == entry.get("etag")
+
+
+def download_submission_file(url, path, entry):
+    """
+    Downloads the file at `url` to `path` unless it's already there.
+
+    Returns:
+        dict: the size and ETag of the file, or None if it was skipped
+    """
+    if is_downloaded(url, path, entry):
+        return None
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # The files are downloaded concurrently, so each one is a single request
+    return download(url, path, workers=1)
+
+
+def download_submission_files(challenge_id, phase_id, fields, out, workers):
+    """
+    Function to download the files of all the submissions of the user to a
+    challenge phase into the directory `out`.
+
+    Arguments:
+        fields (list) -- the submission fields holding the urls of the files
+        workers (int) -- the number of files downloaded concurrently
+    """
+    from tqdm import tqdm
+
+    submissions = get_my_submissions(challenge_id, phase_id)
+    host_url = get_host_url()
+    files = []
+    for submission in submissions:
+        for field in fields:
+            url = submission.get(field)
+            if not url:
+                continue
+            url = urlparse.urljoin(host_url, url)
+            files.append((url, get_submission_file_path(out, submission, url)))
+
+    if not files:
+        echo(
+            style(
+                "\nThere are no files to download for your submissions.\n",
+                bold=True,
+            )
+        )
+        return
+
+    os.makedirs(out, exist_ok=True)
+    manifest = read_download_manifest(out)
+    num_downloaded = num_skipped = 0
+    failures = []
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor, tqdm(
+            total=len(files), desc="Downloading files", unit="file", disable=None
+        ) as progress_bar:
+            futures = {
+                executor.submit(
+                    download_submission_file,
+                    url,
+                    path,
+                    manifest.get(os.path.relpath(path, out)),
+                ): path
+                for url, path in files
+            }
+            try:
+                for future in as_completed(futures):
+                    path = futures[future]
+                    progress_bar.update(1)
+                    try:
+                        info = future.result()
+                    except requests.exceptions.RequestException as err:
+                        failures.append((path, err))
+                        continue
+                    if info is None:
+                        num_skipped += 1
+                    else:
+                        num_downloaded += 1
+                        manifest[os.path.relpath(path, out)] = info
+            except BaseException:
+                for future in futures:
+                    future.cancel()
+                raise
+    finally:
+        write_download_manifest(out, manifest)
+
+    for path, err in failures:
+        echo(style("Could not download {}: {}".format(path, err), fg="red"))
+    echo(
+        style(
+            "\n{} files downloaded to {}, {} already up to date.\n".format(
+                num_downloaded, out, num_skipped
+            ),
+            fg="red" if failures else "green",
+            bold=True,
+        )
+    )
+    if failures:
+        sys.exit(1)
+
+
 def pretty_print_submission_details(submission):
     """
     Function to print details of a submission
@@ -280,7 +505,7 @@ def submission_details_request(submission_id):
     url = url.format(submission_id)
     headers = get_request_header()
     try:
-        response = requests.get(url, headers=headers)
+        response = get_session().get(url, headers=headers)
         response.raise_for_status()
     except requests.exceptions.HTTPError as err:
         if response.status_code in EVALAI_ERROR_CODES:
@@ -326,7 +551,7 @@ def display_submission_result(submission_id):
     """
     try:
         response = submission_details_request(submission_id).json()
-        echo(requests.get(response["submission_result_file"]).text)
+        echo(get_session().get(response["submission_result_file"]).text)
     except requests.exceptions.MissingSchema:
         echo(
             style(
@@ -6,9 +6,12 @@ from beautifultable import BeautifulTable
 from click import echo, style
 
 from evalai.utils.auth import get_request_header, get_host_url
+from evalai.utils.cache import invalidate
 from evalai.utils.common import validate_token
 from evalai.utils.urls import URLS
 from evalai.utils.config import EVALAI_ERROR_CODES
+from evalai.utils.requests import paginate
+from evalai.utils.session import get_session
 
 
 requests.packages.urllib3.disable_warnings()
@@ -47,21 +50,30 @@ def pretty_print_team_data(teams, is_host):
     echo(table)
 
 
-def display_teams(is_host):
+def display_teams(is_host, limit=None):
     """
     Function to display all the participant or host teams of a user
     """
     url = "{}{}"
     headers = get_request_header()
     if is_host:
-        url = url.format(get_host_url(), URLS.host_team_list.value)
+        endpoint = URLS.host_team_list
     else:
-        url = url.format(get_host_url(), URLS.participant_team_list.value)
+        endpoint = URLS.participant_team_list
+    url = url.format(get_host_url(), endpoint.value)
 
     try:
-        response = requests.get(url, headers=headers)
-        response.raise_for_status()
+        teams = list(
+            paginate(
+                url,
+                headers,
+                limit,
+                endpoint=endpoint,
+                stale_while_revalidate=True,
+            )
+        )
     except requests.exceptions.HTTPError as err:
+        response = err.response
         if response.status_code in EVALAI_ERROR_CODES:
             validate_token(response.json())
             echo(
@@ -84,9 +96,7 @@ def display_teams(is_host):
             )
         )
         sys.exit(1)
-    response = response.json()
 
-    teams = response["results"]
     if len(teams) != 0:
         pretty_print_team_data(teams, is_host)
     else:
@@ -113,7 +123,7 @@ def create_team(team_name, team_url, is_host):
         data["team_url"] = team_url
     data = json.dumps(data)
     try:
-        response = requests.post(url, headers=headers, data=data)
+        response = get_session().post(url, headers=headers, data=data)
         response.raise_for_status()
     except requests.exceptions.HTTPError as err:
         if response.status_code in EVALAI_ERROR_CODES:
@@ -149,6 +159,9 @@ def create_team(team_name, team_url, is_host):
         )
         sys.exit(1)
 
+    # The cached list of teams doesn't have the new team
+    invalidate([URLS.host_teams if is_host else URLS.participant_teams], headers)
+
     if response.status_code == 201:
         response = response.json()
         if is_host:
@@ -184,7 +197,7 @@ def participate_in_a_challenge(challenge_id, participant_team_id):
     headers = get_request_header()
     headers["Content-Type"] = "application/json"
     try:
-        response = requests.post(url, headers=headers)
+        response = get_session().post(url, headers=headers)
         response.raise_for_status()
     except requests.exceptions.HTTPError as err:
         if response.status_code in EVALAI_ERROR_CODES:
@@ -213,6 +226,9 @@ def participate_in_a_challenge(challenge_id, participant_team_id):
         )
         sys.exit(1)
 
+    # The cached challenges of the teams don't have this challenge
+    invalidate([URLS.participant_challenges], headers)
+
     if response.status_code == 201:
         echo(
             style(
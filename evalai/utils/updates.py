@@ -1,12 +1,108 @@
-import requests
+import json
+import os
+import re
+import sys
+import time
 
-from distutils.version import StrictVersion
+from evalai.utils.config import (
+    DISABLE_UPDATE_CHECK_ENV_VAR,
+    OFFLINE_ENV_VAR,
+    TRUTHY_VALUES,
+    UPDATE_CHECK_FILE_PATH,
+    UPDATE_CHECK_TIMEOUT,
+    UPDATE_CHECK_TTL,
+)
+from evalai.utils.files import write_json_file
+from evalai.utils.processes import spawn_detached
 
 
 def get_latest_version():
+    """
+    Fetches the version of the latest evalai release from PyPI.
+    """
+    import requests
+
     url = "https://pypi.org/pypi/evalai/json"
-    response = requests.get(url)
-    data = response.json()
-    versions = list(data["releases"].keys())
-    versions.sort(key=StrictVersion)
-    return versions[-1]
+    response = requests.get(url, timeout=UPDATE_CHECK_TIMEOUT)
+    response.raise_for_status()
+    return response.json()["info"]["version"]
+
+
+def is_update_check_disabled():
+    for env_var in (DISABLE_UPDATE_CHECK_ENV_VAR, OFFLINE_ENV_VAR):
+        if os.environ.get(env_var, "").lower() in TRUTHY_VALUES:
+            return True
+    return False
+
+
+def is_newer_version(version, current_version):
+    """
+    Returns True if `version` is a later release than `current_version`.
+    """
+
+    def parse(value):
+        return tuple(int(part) for part in re.findall(r"\d+", value))
+
+    return parse(version) > parse(current_version)
+
+
+def read_latest_version_cache():
+    """
+    Returns the cached latest version and the time it was last checked.
+    """
+    try:
+        with open(UPDATE_CHECK_FILE_PATH, "r") as fr:
+            data = json.load(fr)
+        return data.get("latest_version"), float(data.get("checked_at", 0))
+    except (OSError, IOError, ValueError, TypeError):
+        return None, 0
+
+
+def write_latest_version_cache(latest_version):
+    data = {"latest_version": latest_version, "checked_at": time.time()}
+    write_json_file(UPDATE_CHECK_FILE_PATH, data)
+
+
+def refresh_latest_version_cache():
+    """
+    Fetches the latest version from PyPI and stores it in the cache.
+    """
+    import requests
+
+    try:
+        latest_version = get_latest_version()
+    except (requests.exceptions.RequestException, ValueError, KeyError):
+        return
+    write_latest_version_cache(latest_version)
+
+
+def spawn_latest_version_refresh():
+    """
+    Refreshes the cache in a detached process which outlives the CLI call.
+    """
+    spawn_detached([sys.executable, "-m", "evalai.utils.updates"])
+
+
+def get_cached_latest_version():
+    """
+    Returns the latest version recorded in the cache without blocking.
+
+    When the cache is older than UPDATE_CHECK_TTL it is refreshed in the
+    background, so the result is picked up by a later invocation.
+    """
+    if is_update_check_disabled():
+        return None
+    latest_version, checked_at = read_latest_version_cache()
+    if time.time() - checked_at > UPDATE_CHECK_TTL:
+        # Record the attempt so that an unreachable PyPI is retried only
+        # once per TTL instead of on every invocation.
+        try:
+            write_latest_version_cache(latest_version)
+        except (OSError, IOError):
+            return latest_version
+        spawn_latest_version_refresh()
+    return latest_version
+
+
+if __name__ == "__main__":
+    refresh_latest_version_cache()
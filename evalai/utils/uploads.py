@@ -0,0 +1,738 @@
+import base64
+import hashlib
+import io
+import json
+import math
+import mmap
+import os
+import queue
+import random
+import requests
+import stat
+import threading
+import time
+import uuid
+
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from http import HTTPStatus
+
+from evalai.utils.config import (
+    S3_MAX_PART_SIZE,
+    S3_MAX_PARTS,
+    S3_MIN_PART_SIZE,
+    SUBMISSION_INDEX_FILE_PATH,
+    UPLOAD_CHECKSUM,
+    UPLOAD_DEFAULT_PART_SIZE,
+    UPLOAD_JOURNAL_DIR,
+    UPLOAD_MAX_PART_SIZE,
+    UPLOAD_MIN_PART_SIZE,
+    UPLOAD_PART_ATTEMPTS,
+    UPLOAD_RETRY_BASE_DELAY,
+    UPLOAD_RETRY_BUDGET,
+    UPLOAD_RETRY_MAX_DELAY,
+    UPLOAD_STATS_FILE_PATH,
+    UPLOAD_TARGET_PART_SECONDS,
+)
+from evalai.utils.files import (
+    create_journal,
+    file_lock,
+    read_journal,
+    write_json_file,
+)
+from evalai.utils.ratelimit import ThrottledReader, get_rate_limiter
+from evalai.utils.session import get_session
+
+
+class UploadJournal(object):
+    """
+    Records the completed parts of a multipart upload so that an
+    interrupted upload can be resumed.
+
+    The first line of the journal holds the upload details and each
+    following line an uploaded part, appended as soon as it completes.
+    """
+
+    def __init__(self, path, upload, parts):
+        self.path = path
+        self.upload = upload
+        self.parts = parts
+
+    @staticmethod
+    def get_path(file_hash, challenge_phase_pk, file_type):
+        key = "{}:{}:{}".format(file_hash, challenge_phase_pk, file_type)
+        file_name = "{}.jsonl".format(hashlib.sha256(key.encode()).hexdigest())
+        return os.path.join(UPLOAD_JOURNAL_DIR, file_name)
+
+    @classmethod
+    def load(cls, file_hash, challenge_phase_pk, file_type):
+        """
+        Returns the journal of an interrupted upload, or None.
+        """
+        path = cls.get_path(file_hash, challenge_phase_pk, file_type)
+        journal = read_journal(path)
+        if journal is None:
+            return None
+        upload, parts = journal
+        return cls(
+            path, upload, {part["PartNumber"]: part["ETag"] for part in parts}
+        )
+
+    @classmethod
+    def create(cls, file_hash, challenge_phase_pk, file_type, upload):
+        """
+        Starts a new journal, replacing the one of any earlier upload.
+        """
+        path = cls.get_path(file_hash, challenge_phase_pk, file_type)
+        if not os.path.exists(UPLOAD_JOURNAL_DIR):
+            os.makedirs(UPLOAD_JOURNAL_DIR)
+        create_journal(path, upload)
+        return cls(path, upload, {})
+
+    def record_part(self, part_number, etag):
+        self.parts[part_number] = etag
+        with open(self.path, "a") as fw:
+            fw.write(
+                "{}\n".format(json.dumps({"PartNumber": part_number, "ETag": etag}))
+            )
+
+    def delete(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def is_regular_file(file):
+    """
+    Returns False for streams such as stdin or pipes, whose size isn't known
+    and which can only be read once.
+    """
+    try:
+        return stat.S_ISREG(os.fstat(file.fileno()).st_mode)
+    except (AttributeError, OSError, ValueError, io.UnsupportedOperation):
+        return False
+
+
+def get_file_hash(file, sample_size=1024 * 1024):
+    """
+    Returns a hash identifying the contents of a file without reading all of it.
+
+    The hash covers the size and modification time of the file along with
+    its first and last `sample_size` bytes.
+    """
+    file_stat = os.fstat(file.fileno())
+    file_hash = hashlib.sha256(
+        "{}:{}".format(file_stat.st_size, file_stat.st_mtime_ns).encode()
+    )
+    position = file.tell()
+    file.seek(0)
+    file_hash.update(file.read(sample_size))
+    file.seek(max(0, file_stat.st_size - sample_size))
+    file_hash.update(file.read(sample_size))
+    file.seek(position)
+    return file_hash.hexdigest()
+
+
+def get_content_hash(file, chunk_size=1024 * 1024):
+    """
+    Returns the sha256 hash of the contents of a file.
+    """
+    content_hash = hashlib.sha256()
+    position = file.tell()
+    file.seek(0)
+    for chunk in iter(lambda: file.read(chunk_size), b""):
+        content_hash.update(chunk)
+    file.seek(position)
+    return content_hash.hexdigest()
+
+
+SUBMISSION_SUBMITTED = "submitted"
+SUBMISSION_UPLOADING = "uploading"
+
+
+def read_submission_index():
+    try:
+        with open(SUBMISSION_INDEX_FILE_PATH, "r") as fr:
+            return json.load(fr)
+    except (OSError, IOError, ValueError):
+        return {}
+
+
+def get_indexed_submission(content_hash, challenge_phase_pk):
+    """
+    Returns the submission made from `content_hash` to the phase, or None.
+    """
+    key = "{}:{}".format(content_hash, challenge_phase_pk)
+    return read_submission_index().get(key)
+
+
+def get_indexed_content_hash(file_hash):
+    """
+    Returns the content hash recorded for a file with the sampled hash
+    `file_hash` from `get_file_hash`, so that an unchanged file isn't read
+    again to hash it, or None.
+    """
+    for submission in read_submission_index().values():
+        if file_hash is not None and submission.get("file_hash") == file_hash:
+            return submission["content_hash"]
+    return None
+
+
+def index_submission(
+    content_hash, challenge_phase_pk, submission_pk, state, name, file_hash=None
+):
+    """
+    Records that the submission `submission_pk` was made from `content_hash`.
+
+    `state` is SUBMISSION_UPLOADING while the file is being uploaded and
+    SUBMISSION_SUBMITTED once the submission is sent for evaluation.
+    """
+    key = "{}:{}".format(content_hash, challenge_phase_pk)
+    try:
+        # Concurrent submissions mustn't drop each other's entries
+        with file_lock("{}.lock".format(SUBMISSION_INDEX_FILE_PATH)):
+            index = read_submission_index()
+            index[key] = {
+                "submission_pk": submission_pk,
+                "state": state,
+                "name": name,
+                "content_hash": content_hash,
+                "file_hash": file_hash,
+                "updated_at": time.time(),
+            }
+            write_json_file(SUBMISSION_INDEX_FILE_PATH, index)
+    except (OSError, IOError):
+        pass
+
+
+def format_header_param(name, value):
+    """
+    Returns the parameter `name="value"` of a multipart part header.
+
+    Like urllib3, line breaks and quotes are percent encoded as the WHATWG
+    HTML standard does, so that a value can't end the header.
+    """
+    value = str(value).translate({10: "%0A", 13: "%0D", 34: "%22"})
+    return '{}="{}"'.format(name, value)
+
+
+class MultipartEncoder(object):
+    """
+    Streams a multipart/form-data body instead of building it in memory.
+
+    The length of the body is known up front, so it is sent with a
+    Content-Length header, and files are read in chunks of `chunk_size`
+    bytes as the body is sent. `callback` is called with the number of
+    bytes of every chunk handed to the connection.
+
+    As with requests, a file can be given as a (file name, file) tuple to
+    send it with another name than its own.
+    """
+
+    def __init__(self, fields, files, chunk_size=64 * 1024, callback=None):
+        self.boundary = uuid.uuid4().hex
+        self.content_type = "multipart/form-data; boundary={}".format(
+            self.boundary
+        )
+        self.chunk_size = chunk_size
+        self.callback = callback
+        self.parts = []
+        for name, value in fields.items():
+            if value is None:
+                continue
+            if not isinstance(value, bytes):
+                value = str(value).encode("utf-8")
+            header = self._get_part_header(name)
+            self.parts.append(header + value + b"\r\n")
+        for name, file in files.items():
+            if isinstance(file, tuple):
+                file_name, file = file
+            else:
+                file_name = getattr(file, "name", name)
+            file_name = os.path.basename(str(file_name))
+            header = self._get_part_header(name, file_name)
+            self.parts.extend([header, file, b"\r\n"])
+        self.parts.append("--{}--\r\n".format(self.boundary).encode())
+        self._positions = {
+            id(part): part.tell()
+            for part in self.parts
+            if not isinstance(part, bytes)
+        }
+
+    def _get_part_header(self, name, file_name=None):
+        disposition = "form-data; {}".format(format_header_param("name", name))
+        if file_name is not None:
+            disposition = "{}; {}".format(
+                disposition, format_header_param("filename", file_name)
+            )
+        return "--{}\r\nContent-Disposition: {}\r\n\r\n".format(
+            self.boundary, disposition
+        ).encode("utf-8")
+
+    def __len__(self):
+        length = 0
+        for part in self.parts:
+            if isinstance(part, bytes):
+                length += len(part)
+            else:
+                length += os.fstat(part.fileno()).st_size - self._positions[id(part)]
+        return length
+
+    def __iter__(self):
+        for part in self.parts:
+            if isinstance(part, bytes):
+                chunks = [part]
+            else:
+                # Rewind so that the body can be sent again on a retry
+                part.seek(self._positions[id(part)])
+                chunks = iter(lambda: part.read(self.chunk_size), b"")
+            for chunk in chunks:
+                rate_limiter = get_rate_limiter()
+                if rate_limiter is not None:
+                    rate_limiter.consume(len(chunk))
+                if self.callback is not None:
+                    self.callback(len(chunk))
+                yield chunk
+
+
+def post_multipart(url, headers, data, files):
+    """
+    Posts `data` and `files` as a streamed multipart body.
+
+    A progress bar of the bytes sent is shown when stderr is a terminal.
+    """
+    from tqdm import tqdm
+
+    body = MultipartEncoder(data, files)
+    headers = dict(headers, **{"Content-Type": body.content_type})
+    with tqdm(
+        total=len(body), unit="B", unit_scale=True, disable=None
+    ) as progress_bar:
+        body.callback = progress_bar.update
+        return get_session().post(url, headers=headers, data=body)
+
+
+def read_upload_throughput():
+    """
+    Returns the upload throughput per connection measured by earlier
+    uploads in bytes per second, or None if it hasn't been measured yet.
+    """
+    try:
+        with open(UPLOAD_STATS_FILE_PATH, "r") as fr:
+            return float(json.load(fr)["throughput"])
+    except (OSError, IOError, ValueError, KeyError, TypeError):
+        return None
+
+
+def record_upload_throughput(num_bytes, seconds, connections):
+    """
+    Updates the measured throughput per connection with an upload of
+    `num_bytes` which took `seconds` over `connections` connections.
+    """
+    if num_bytes < UPLOAD_MIN_PART_SIZE or seconds <= 0:
+        return
+    throughput = num_bytes / seconds / max(1, connections)
+    previous_throughput = read_upload_throughput()
+    if previous_throughput is not None:
+        throughput = (throughput + previous_throughput) / 2
+    try:
+        write_json_file(UPLOAD_STATS_FILE_PATH, {"throughput": throughput})
+    except (OSError, IOError):
+        pass
+
+
+def get_part_size(file_size, throughput=None):
+    """
+    Returns the part size for a multipart upload of `file_size` bytes.
+
+    Parts are sized to take about UPLOAD_TARGET_PART_SECONDS each at the
+    measured `throughput`, within UPLOAD_MIN_PART_SIZE and
+    UPLOAD_MAX_PART_SIZE. S3's limits on part size and part count always
+    take precedence. Files which fit in one part are sent in one request.
+    """
+    part_size = UPLOAD_DEFAULT_PART_SIZE
+    if throughput:
+        part_size = int(throughput * UPLOAD_TARGET_PART_SECONDS)
+    part_size = min(max(part_size, UPLOAD_MIN_PART_SIZE), UPLOAD_MAX_PART_SIZE)
+    part_size = max(
+        part_size, S3_MIN_PART_SIZE, math.ceil(file_size / S3_MAX_PARTS)
+    )
+    # Round up to whole MiB so that parts stay page aligned
+    mebibyte = 1024 * 1024
+    part_size = math.ceil(part_size / mebibyte) * mebibyte
+    return min(part_size, S3_MAX_PART_SIZE)
+
+
+def get_num_parts(file_size, part_size):
+    return max(1, math.ceil(file_size / part_size))
+
+
+class FileParts(object):
+    """
+    Provides the parts of a file as memoryviews without copying them.
+
+    Regular files are mapped into memory and each part is a slice of the
+    map. Files which can't be mapped are read with `readinto` into a pool of
+    up to `num_buffers` reusable buffers, allocated as they are needed.
+    Either way memory use is bounded by the number of parts in flight
+    rather than by the size of the file.
+
+    Streams are read part by part as they are uploaded, and end with the
+    first part which isn't full, so only as many parts as the stream fills
+    are uploaded. `num_bytes` counts the bytes of the parts yielded.
+
+    The parts are hashed in order as they are yielded, while the earlier
+    parts are being uploaded, so `content_hash` is the sha256 digest of the
+    whole file once all the parts are yielded, without another pass over it.
+
+    Every part yielded must be handed back with `release` once uploaded.
+    """
+
+    def __init__(
+        self, file, presigned_urls, chunk_size, skip_parts=(), num_buffers=1
+    ):
+        self.file = file
+        self.presigned_urls = presigned_urls
+        self.chunk_size = chunk_size
+        self.skip_parts = skip_parts
+        self.num_bytes = 0
+        self._digest = hashlib.sha256()
+        self._mmap = None
+        try:
+            if os.fstat(file.fileno()).st_size > 0:
+                self._mmap = mmap.mmap(
+                    file.fileno(), 0, access=mmap.ACCESS_READ
+                )
+        except (AttributeError, OSError, ValueError, io.UnsupportedOperation):
+            self._mmap = None
+        self._buffers = queue.Queue()
+        self._num_buffers = num_buffers
+        self._num_allocated_buffers = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __iter__(self):
+        if self._mmap is not None:
+            return self._iter_mapped_parts()
+        return self._iter_buffered_parts()
+
+    def _iter_mapped_parts(self):
+        for index, offset in enumerate(
+            range(0, len(self._mmap), self.chunk_size)
+        ):
+            presigned_url_object = self.presigned_urls[index]
+            data = memoryview(self._mmap)[offset:offset + self.chunk_size]
+            self._digest.update(data)
+            if presigned_url_object["partNumber"] in self.skip_parts:
+                data.release()
+                continue
+            self.num_bytes += len(data)
+            yield presigned_url_object, data
+
+    def _iter_buffered_parts(self):
+        for index, presigned_url_object in enumerate(self.presigned_urls):
+            buffer = self._get_buffer()
+            size = self._fill(buffer)
+            self._digest.update(memoryview(buffer)[:size])
+            # An empty file is uploaded as one empty part, since a multipart
+            # upload needs at least one part
+            if (size == 0 and index > 0) or presigned_url_object[
+                "partNumber"
+            ] in self.skip_parts:
+                self._buffers.put(buffer)
+            else:
+                self.num_bytes += size
+                yield presigned_url_object, memoryview(buffer)[:size]
+            if size < self.chunk_size:
+                break
+        else:
+            if self.file.read(1):
+                raise ValueError(
+                    "The file is larger than the {} parts the upload was"
+                    " created for.".format(len(self.presigned_urls))
+                )
+
+    @property
+    def content_hash(self):
+        return self._digest.hexdigest()
+
+    def _get_buffer(self):
+        """
+        Returns a free buffer, waiting for an uploaded part to hand one back
+        once `num_buffers` buffers are allocated.
+        """
+        try:
+            return self._buffers.get_nowait()
+        except queue.Empty:
+            pass
+        if self._num_allocated_buffers < self._num_buffers:
+            # Buffers are only allocated when needed, so short streams and
+            # mapped files don't take memory for all of them
+            self._num_allocated_buffers += 1
+            return bytearray(self.chunk_size)
+        return self._buffers.get()
+
+    def _fill(self, buffer):
+        """
+        Reads into `buffer` until it is full or the end of the file.
+        """
+        view = memoryview(buffer)
+        size = 0
+        while size < len(buffer):
+            count = self.file.readinto(view[size:])
+            if not count:
+                break
+            size += count
+        view.release()
+        return size
+
+    def release(self, data):
+        """
+        Hands back the memory of an uploaded part.
+        """
+        owner = data.obj
+        data.release()
+        if owner is not self._mmap:
+            self._buffers.put(owner)
+
+    def close(self):
+        if self._mmap is not None:
+            try:
+                self._mmap.close()
+            except BufferError:
+                # Parts still referenced by cancelled uploads; the map is
+                # closed when they are garbage collected
+                pass
+
+
+class RetryBudget(object):
+    """
+    Number of retries shared by all the parts of an upload.
+    """
+
+    def __init__(self, retries):
+        self.remaining = retries
+        self._lock = threading.Lock()
+
+    def consume(self):
+        """
+        Takes one retry from the budget, returns False if none is left.
+        """
+        with self._lock:
+            if self.remaining <= 0:
+                return False
+            self.remaining -= 1
+            return True
+
+
+class PartChecksumError(requests.exceptions.RequestException):
+    """
+    Raised when S3 received a part which doesn't match the data sent.
+
+    `repeated` is True when S3 returned the same ETag for the part on the
+    previous try, so the mismatch isn't due to corruption in transit and
+    won't go away on a retry.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self.repeated = kwargs.pop("repeated", False)
+        super(PartChecksumError, self).__init__(*args, **kwargs)
+
+
+def is_retryable_error(err):
+    """
+    Returns True for errors which are likely to go away on a retry.
+    """
+    if isinstance(err, PartChecksumError):
+        return not err.repeated
+    if isinstance(err, requests.exceptions.HTTPError):
+        status_code = err.response.status_code if err.response is not None else 0
+        return status_code >= 500 or status_code in (
+            HTTPStatus.REQUEST_TIMEOUT,
+            HTTPStatus.TOO_MANY_REQUESTS,
+        )
+    return isinstance(
+        err,
+        (
+            requests.exceptions.ConnectionError,
+            requests.exceptions.Timeout,
+            requests.exceptions.ChunkedEncodingError,
+            PartChecksumError,
+        ),
+    )
+
+
+def get_backoff_delay(attempt):
+    """
+    Returns the exponential backoff delay with full jitter for an attempt.
+    """
+    delay = UPLOAD_RETRY_BASE_DELAY * 2 ** (attempt - 1)
+    return random.uniform(0, min(UPLOAD_RETRY_MAX_DELAY, delay))
+
+
+def has_unverifiable_etag(response):
+    """
+    Returns True if the ETag of an uploaded part can't be its MD5 digest, as
+    with parts encrypted with SSE-KMS or SSE-C, whose ETags look like one.
+    """
+    encryption = response.headers.get("x-amz-server-side-encryption", "")
+    return encryption.startswith("aws:kms") or (
+        "x-amz-server-side-encryption-customer-algorithm" in response.headers
+    )
+
+
+def is_matching_etag(etag, md5_digest):
+    """
+    Returns False if `etag` is an MD5 digest other than `md5_digest`.
+
+    ETags which aren't plain MD5 digests can't be checked and always match.
+    """
+    etag = etag.strip('"').lower()
+    if len(etag) != 32 or any(char not in "0123456789abcdef" for char in etag):
+        return True
+    return etag == md5_digest
+
+
+def upload_part(
+    url,
+    data,
+    attempts=UPLOAD_PART_ATTEMPTS,
+    retry_budget=None,
+    checksum=UPLOAD_CHECKSUM,
+):
+    """
+    Uploads a single part to its presigned url and returns the ETag.
+
+    Transient failures are retried up to `attempts` times in total, as long
+    as the `retry_budget` shared with the other parts isn't exhausted. The
+    part is sent at the rate allowed by the shared rate limiter, if any.
+
+    The MD5 digest of the part is computed in the uploading thread and
+    checked as set by `checksum`, see UPLOAD_CHECKSUM. A corrupted part is
+    retried like a failed one, unless S3 returns the same ETag again, and
+    the ETags of encrypted parts aren't checked.
+    """
+    headers = {}
+    md5_digest = None
+    mismatched_etag = None
+    if checksum != "none":
+        md5 = hashlib.md5(data)
+        md5_digest = md5.hexdigest()
+        if checksum == "content-md5":
+            headers["Content-MD5"] = base64.b64encode(md5.digest()).decode()
+    for attempt in range(1, attempts + 1):
+        rate_limiter = get_rate_limiter()
+        if len(data) == 0:
+            # requests sends empty streams chunked, which S3 rejects, while
+            # empty bytes are sent with a Content-Length of 0
+            body = b""
+        elif rate_limiter is None:
+            body = data
+        else:
+            body = ThrottledReader(data, rate_limiter)
+        try:
+            response = get_session().put(url, data=body, headers=headers)
+            if response.status_code != HTTPStatus.OK:
+                response.raise_for_status()
+            etag = response.headers["ETag"]
+            if (
+                checksum == "etag"
+                and not has_unverifiable_etag(response)
+                and not is_matching_etag(etag, md5_digest)
+            ):
+                if etag == mismatched_etag:
+                    raise PartChecksumError(
+                        "S3 returned the ETag {} for the part twice, which"
+                        " doesn't match its MD5 digest {}. If the bucket"
+                        " encrypts the files, set EVALAI_UPLOAD_CHECKSUM=none"
+                        " to skip the check.".format(etag, md5_digest),
+                        response=response,
+                        repeated=True,
+                    )
+                mismatched_etag = etag
+                raise PartChecksumError(
+                    "The uploaded part doesn't match its MD5 digest {}.".format(
+                        md5_digest
+                    ),
+                    response=response,
+                )
+            return etag
+        except requests.exceptions.RequestException as err:
+            if (
+                attempt == attempts
+                or not is_retryable_error(err)
+                or (retry_budget is not None and not retry_budget.consume())
+            ):
+                raise
+        finally:
+            if isinstance(body, ThrottledReader):
+                body.close()
+        time.sleep(get_backoff_delay(attempt))
+
+
+def upload_parts(
+    parts,
+    workers,
+    callback=None,
+    attempts=UPLOAD_PART_ATTEMPTS,
+    retry_budget=UPLOAD_RETRY_BUDGET,
+):
+    """
+    Uploads the parts yielded by `parts` using a pool of `workers` threads.
+
+    At most `workers` parts are in flight, so only that many parts are
+    held in memory at a time. Each part is tried up to `attempts` times,
+    and at most `retry_budget` retries are made for the whole upload. The
+    first part which still fails cancels the parts which haven't started
+    yet and its exception is raised.
+
+    Arguments:
+        parts (FileParts) -- the parts of the file to be uploaded
+        workers (int) -- number of parts uploaded concurrently
+        callback (callable) -- called with the part number and ETag of every uploaded part
+        attempts (int) -- number of times each part is tried
+        retry_budget (int) -- number of retries allowed for all parts together
+    Returns:
+        list: ETag and PartNumber of the uploaded parts ordered by PartNumber
+    """
+    etags = {}
+    pending = {}
+    retry_budget = RetryBudget(retry_budget)
+
+    def collect():
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            part_number, data = pending.pop(future)
+            try:
+                etags[part_number] = future.result()
+            finally:
+                parts.release(data)
+            if callback is not None:
+                callback(part_number, etags[part_number])
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        try:
+            for presigned_url_object, data in parts:
+                if len(pending) >= workers:
+                    collect()
+                future = executor.submit(
+                    upload_part,
+                    presigned_url_object["url"],
+                    data,
+                    attempts,
+                    retry_budget,
+                )
+                pending[future] = (presigned_url_object["partNumber"], data)
+            while pending:
+                collect()
+        except BaseException:
+            for future in pending:
+                future.cancel()
+            raise
+
+    return [
+        {"ETag": etags[part_number], "PartNumber": part_number}
+        for part_number in sorted(etags)
+    ]
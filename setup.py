@@ -62,6 +62,7 @@ setup(
     scripts=[],
     provides=[],
     install_requires=requirements,
+    extras_require={"zstd": ["zstandard>=0.15"]},
     tests_require=tests_require,
     namespace_packages=[],
     packages=find_packages(exclude=("docs", "scripts", "tests")),
@@ -3,7 +3,10 @@ import os
 import random
 import string
 
-from evalai.utils.config import AUTH_TOKEN_FILE_NAME, AUTH_TOKEN_DIR
+from evalai.utils.config import (
+    AUTH_TOKEN_FILE_NAME,
+    AUTH_TOKEN_DIR,
+)
 
 random.seed(10)
 
@@ -0,0 +1,23 @@
+import pytest
+
+from evalai.utils import cache, config, session, uploads
+
+
+@pytest.fixture(autouse=True)
+def isolate_cache(monkeypatch, tmpdir):
+    # Responses cached by one test mustn't be served to the next one
+    monkeypatch.setattr(cache, "CACHE_DIR", str(tmpdir.join("cache")))
+    monkeypatch.setattr(cache, "_cache_mode", cache.CACHE_ENABLED)
+    monkeypatch.setattr(cache, "_stale_requests", [])
+    monkeypatch.setattr(cache, "_data_as_of_shown", False)
+    # Offline mode changes the adapters of the shared session
+    monkeypatch.setattr(session, "_session", None)
+
+
+@pytest.fixture(autouse=True)
+def isolate_submission_index(monkeypatch, tmpdir):
+    # Tests submit the same files, which mustn't be flagged as duplicates,
+    # and mustn't touch the index of the user running them
+    path = str(tmpdir.join("submission_index.json"))
+    monkeypatch.setattr(config, "SUBMISSION_INDEX_FILE_PATH", path)
+    monkeypatch.setattr(uploads, "SUBMISSION_INDEX_FILE_PATH", path)
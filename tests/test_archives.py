@@ -0,0 +1,53 @@
+import io
+import os
+import pytest
+import tarfile
+
+from evalai.utils.archives import DirectoryArchive
+
+
+def make_directory(tmpdir):
+    directory = tmpdir.mkdir("predictions")
+    directory.join("a.json").write("[1, 2, 3]")
+    directory.mkdir("split").join("b.json").write("[4, 5, 6]")
+    return directory
+
+
+class TestDirectoryArchive:
+    def test_gzip_archive_contains_directory_contents(self, tmpdir):
+        directory = make_directory(tmpdir)
+        with DirectoryArchive(str(directory)) as archive:
+            assert archive.name == "predictions.tar.gz"
+            data = archive.read()
+        with tarfile.open(fileobj=io.BytesIO(data), mode="r:gz") as tar:
+            assert tar.getnames() == ["a.json", "split", "split/b.json"]
+            assert tar.extractfile("split/b.json").read() == b"[4, 5, 6]"
+
+    def test_zstd_archive_contains_directory_contents(self, tmpdir):
+        zstandard = pytest.importorskip("zstandard")
+        directory = make_directory(tmpdir)
+        with DirectoryArchive(str(directory), "zstd") as archive:
+            assert archive.name == "predictions.tar.zst"
+            data = archive.read()
+        data = zstandard.ZstdDecompressor().stream_reader(io.BytesIO(data)).read()
+        with tarfile.open(fileobj=io.BytesIO(data), mode="r:") as tar:
+            assert tar.getnames() == ["a.json", "split", "split/b.json"]
+
+    def test_archive_errors_are_raised_to_the_reader(self, tmpdir, monkeypatch):
+        def add(self, name, arcname=None, **kwargs):
+            raise OSError("Permission denied")
+
+        monkeypatch.setattr(tarfile.TarFile, "add", add)
+        directory = make_directory(tmpdir)
+        with DirectoryArchive(str(directory)) as archive:
+            with pytest.raises(IOError) as err:
+                archive.read()
+        assert "Permission denied" in str(err.value)
+
+    def test_closing_before_the_end_stops_the_archive(self, tmpdir):
+        directory = tmpdir.mkdir("predictions")
+        directory.join("a.bin").write_binary(os.urandom(1024 * 1024))
+        archive = DirectoryArchive(str(directory))
+        archive.read(10)
+        archive.close()
+        assert not archive._thread.is_alive()
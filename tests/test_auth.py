@@ -8,9 +8,16 @@ from termcolor import colored
 
 from evalai.challenges import challenge, challenges
 from evalai.set_host import host
+from evalai.utils.auth import (
+    get_host_url,
+    get_request_header,
+    get_user_auth_token,
+)
 from evalai.utils.urls import URLS
 from evalai.utils.config import (
     API_HOST_URL,
+    API_HOST_URL_ENV_VAR,
+    AUTH_TOKEN_ENV_VAR,
     AUTH_TOKEN_DIR,
     AUTH_TOKEN_FILE_NAME,
     HOST_URL_FILE_PATH,
@@ -219,3 +226,34 @@ class TestSetAndLoadHostURL(BaseTestClass):
         result = runner.invoke(challenges)
         response = result.output.strip()
         assert str(response) == self.output
+
+
+class TestConfig(BaseTestClass):
+    def teardown(self):
+        if os.path.exists(HOST_URL_FILE_PATH):
+            os.remove(HOST_URL_FILE_PATH)
+
+    def test_host_url_is_reloaded_when_file_changes(self):
+        assert get_host_url() == API_HOST_URL
+        with open(HOST_URL_FILE_PATH, "w") as fw:
+            fw.write("https://staging.eval.ai")
+        assert get_host_url() == "https://staging.eval.ai"
+        with open(HOST_URL_FILE_PATH, "w") as fw:
+            fw.write("http://localhost:8888")
+        assert get_host_url() == "http://localhost:8888"
+        os.remove(HOST_URL_FILE_PATH)
+        assert get_host_url() == API_HOST_URL
+
+    def test_environment_overrides_config_files(self, monkeypatch):
+        with open(HOST_URL_FILE_PATH, "w") as fw:
+            fw.write("https://staging.eval.ai")
+        monkeypatch.setenv(API_HOST_URL_ENV_VAR, "http://localhost:8888")
+        monkeypatch.setenv(AUTH_TOKEN_ENV_VAR, "abc")
+        assert get_host_url() == "http://localhost:8888"
+        assert get_user_auth_token() == "abc"
+        assert get_request_header() == {"Authorization": "Bearer abc"}
+
+    def test_request_header_is_a_copy(self):
+        header = get_request_header()
+        header["Content-Type"] = "application/json"
+        assert "Content-Type" not in get_request_header()
@@ -0,0 +1,300 @@
+import json
+import os
+import pytest
+import requests
+import responses
+
+from click.testing import CliRunner
+
+from evalai.challenges import challenge
+from evalai.main import main
+from evalai.utils import cache
+from evalai.utils.cache import (
+    CACHE_DISABLED,
+    CACHE_ENABLED,
+    CACHE_OFFLINE,
+    CACHE_REFRESH,
+    cached_get,
+    get_cache_key,
+    get_freshness_lifetime,
+    set_cache_mode,
+)
+from evalai.utils.config import API_HOST_URL, AUTH_TOKEN_ENV_VAR
+from evalai.utils.session import get_session
+from evalai.utils.urls import URLS
+from tests.data import challenge_response
+
+from .base import BaseTestClass
+
+
+class TestCachedGet(BaseTestClass):
+    def setup(self):
+        self.url = "{}{}".format(API_HOST_URL, URLS.challenge_details.value).format("1")
+        self.headers = {"Authorization": "Bearer token"}
+        self.body = json.loads(challenge_response.challenge_details)
+
+    def add_response(self, headers=None, status=200):
+        responses.add(
+            responses.GET,
+            self.url,
+            json=self.body if status == 200 else None,
+            headers=headers or {},
+            status=status,
+        )
+
+    @responses.activate
+    def test_fresh_response_is_served_from_the_cache(self):
+        self.add_response()
+        first = cached_get(self.url, self.headers, URLS.challenge_details)
+        second = cached_get(self.url, self.headers, URLS.challenge_details)
+        assert len(responses.calls) == 1
+        assert second.json() == first.json() == self.body
+        assert second.from_cache
+
+    @responses.activate
+    def test_stale_response_is_revalidated(self, monkeypatch):
+        monkeypatch.setenv("EVALAI_CACHE_TTLS", "challenge_details=0")
+        self.add_response({"ETag": '"v1"', "Last-Modified": "Mon, 01 Jun 2020 00:00:00 GMT"})
+        cached_get(self.url, self.headers, URLS.challenge_details)
+        responses.replace(responses.GET, self.url, status=304)
+        response = cached_get(self.url, self.headers, URLS.challenge_details)
+        request = responses.calls[1].request
+        assert request.headers["If-None-Match"] == '"v1"'
+        assert request.headers["If-Modified-Since"] == "Mon, 01 Jun 2020 00:00:00 GMT"
+        assert response.status_code == 200
+        assert response.json() == self.body
+
+    @responses.activate
+    def test_cache_control_is_honored_without_ttl(self):
+        self.add_response({"Cache-Control": "private, max-age=60"})
+        cached_get(self.url, self.headers)
+        cached_get(self.url, self.headers)
+        assert len(responses.calls) == 1
+
+    @responses.activate
+    def test_no_store_responses_are_not_cached(self):
+        self.add_response({"Cache-Control": "no-store"})
+        cached_get(self.url, self.headers, URLS.challenge_details)
+        cached_get(self.url, self.headers, URLS.challenge_details)
+        assert len(responses.calls) == 2
+
+    @responses.activate
+    def test_errors_are_not_cached(self):
+        self.add_response(status=404)
+        assert cached_get(self.url, self.headers, URLS.challenge_details).status_code == 404
+        assert not os.path.exists(cache.CACHE_DIR)
+
+    @responses.activate
+    def test_users_do_not_share_responses(self):
+        self.add_response()
+        cached_get(self.url, self.headers, URLS.challenge_details)
+        cached_get(self.url, {"Authorization": "Bearer other"}, URLS.challenge_details)
+        assert len(responses.calls) == 2
+        assert get_cache_key(self.url, self.headers) != get_cache_key(
+            self.url, {"Authorization": "Bearer other"}
+        )
+
+    @responses.activate
+    def test_refresh_revalidates_fresh_responses(self):
+        self.add_response({"ETag": '"v1"'})
+        cached_get(self.url, self.headers, URLS.challenge_details)
+        set_cache_mode(CACHE_REFRESH)
+        cached_get(self.url, self.headers, URLS.challenge_details)
+        assert len(responses.calls) == 2
+        assert responses.calls[1].request.headers["If-None-Match"] == '"v1"'
+
+    @responses.activate
+    def test_disabled_cache_is_bypassed(self):
+        self.add_response()
+        set_cache_mode(CACHE_DISABLED)
+        cached_get(self.url, self.headers, URLS.challenge_details)
+        cached_get(self.url, self.headers, URLS.challenge_details)
+        assert len(responses.calls) == 2
+        assert not os.path.exists(cache.CACHE_DIR)
+
+    def test_get_freshness_lifetime(self):
+        assert get_freshness_lifetime({"Cache-Control": "max-age=60", "Age": "10"}, None) == 50
+        assert get_freshness_lifetime({"Cache-Control": "max-age=60"}, 300) == 300
+        assert get_freshness_lifetime({"Cache-Control": "no-cache"}, 300) == 0
+        assert get_freshness_lifetime({}, None) == 0
+
+
+class TestStaleWhileRevalidate(BaseTestClass):
+    def setup(self):
+        self.url = "{}{}".format(API_HOST_URL, URLS.challenge_details.value).format("1")
+        self.headers = {"Authorization": "Bearer token"}
+        self.body = json.loads(challenge_response.challenge_details)
+
+    def cache_stale_response(self, monkeypatch):
+        monkeypatch.setenv("EVALAI_CACHE_TTLS", "challenge_details=0")
+        responses.add(responses.GET, self.url, json=self.body, status=200)
+        cached_get(self.url, self.headers, URLS.challenge_details)
+        responses.calls.reset()
+
+    @responses.activate
+    def test_stale_response_is_revalidated_when_the_server_answers(self, monkeypatch):
+        self.cache_stale_response(monkeypatch)
+        body = dict(self.body, title="Updated")
+        responses.replace(responses.GET, self.url, json=body, status=200)
+        response = cached_get(
+            self.url, self.headers, URLS.challenge_details, stale_while_revalidate=True
+        )
+        assert response.json() == body
+        assert len(responses.calls) == 1
+        assert cache._stale_requests == []
+        assert not cache._data_as_of_shown
+
+    @responses.activate
+    def test_stale_response_is_served_and_refreshed_later_when_slow(self, monkeypatch):
+        self.cache_stale_response(monkeypatch)
+        responses.replace(
+            responses.GET, self.url, body=requests.exceptions.ReadTimeout("slow")
+        )
+        response = cached_get(
+            self.url, self.headers, URLS.challenge_details, stale_while_revalidate=True
+        )
+        assert response.json() == self.body
+        assert responses.calls[0].request.req_kwargs["timeout"] == cache.CACHE_REVALIDATE_TIMEOUT
+        assert cache._stale_requests == [
+            (self.url, self.headers, URLS.challenge_details)
+        ]
+
+    @responses.activate
+    def test_too_stale_response_is_fetched(self, monkeypatch):
+        self.cache_stale_response(monkeypatch)
+        monkeypatch.setattr(cache, "CACHE_MAX_STALE", 0)
+        cached_get(
+            self.url, self.headers, URLS.challenge_details, stale_while_revalidate=True
+        )
+        assert len(responses.calls) == 1
+        assert cache._stale_requests == []
+
+    @responses.activate
+    def test_cached_response_is_served_when_the_host_is_down(self, monkeypatch):
+        self.cache_stale_response(monkeypatch)
+        monkeypatch.setattr(cache, "CACHE_MAX_STALE", 0)
+        responses.replace(
+            responses.GET,
+            self.url,
+            body=requests.exceptions.ConnectionError("down"),
+        )
+        response = cached_get(
+            self.url, self.headers, URLS.challenge_details, stale_while_revalidate=True
+        )
+        assert response.json() == self.body
+
+    @responses.activate
+    def test_refresh_revalidates_with_the_token_of_the_environment(self, monkeypatch):
+        self.cache_stale_response(monkeypatch)
+        monkeypatch.setenv(AUTH_TOKEN_ENV_VAR, "token")
+        cache.refresh([[self.url, "challenge_details"]])
+        assert len(responses.calls) == 1
+        assert responses.calls[0].request.headers["Authorization"] == "Bearer token"
+
+    def test_spawn_refresh_passes_the_token_in_the_environment(self, monkeypatch):
+        spawned = []
+        monkeypatch.setattr(
+            cache, "spawn_detached", lambda args, env: spawned.append((args, env))
+        )
+        cache.spawn_refresh([(self.url, self.headers, URLS.challenge_details)])
+        args, env = spawned[0]
+        assert args[1:3] == ["-m", "evalai.utils.cache"]
+        assert json.loads(args[3]) == [[self.url, "challenge_details"]]
+        assert env[AUTH_TOKEN_ENV_VAR] == "token"
+        assert "token" not in " ".join(args[3:]).replace(self.url, "")
+
+
+class TestInvalidate(BaseTestClass):
+    @responses.activate
+    def test_entries_of_the_endpoints_and_user_are_deleted(self):
+        headers = {"Authorization": "Bearer token"}
+        other_headers = {"Authorization": "Bearer other"}
+        teams_url = "{}{}".format(API_HOST_URL, URLS.participant_teams.value)
+        details_url = "{}{}".format(API_HOST_URL, URLS.challenge_details.value).format("1")
+        for url in (teams_url, details_url):
+            responses.add(responses.GET, url, json={}, status=200)
+        cached_get(teams_url, headers, URLS.participant_teams)
+        cached_get(teams_url, other_headers, URLS.participant_teams)
+        cached_get(details_url, headers, URLS.challenge_details)
+
+        cache.invalidate([URLS.participant_team_list], headers)
+        assert cache.read_entry(get_cache_key(teams_url, headers)) is None
+        assert cache.read_entry(get_cache_key(teams_url, other_headers)) is not None
+        assert cache.read_entry(get_cache_key(details_url, headers)) is not None
+
+
+class TestOfflineMode(BaseTestClass):
+    def setup(self):
+        self.url = "{}{}".format(API_HOST_URL, URLS.challenge_details.value).format("1")
+        self.headers = {"Authorization": "Bearer token"}
+
+    @responses.activate
+    def test_cached_response_is_served_offline(self):
+        body = json.loads(challenge_response.challenge_details)
+        responses.add(responses.GET, self.url, json=body, status=200)
+        cached_get(self.url, self.headers)
+        set_cache_mode(CACHE_OFFLINE)
+        assert cached_get(self.url, self.headers).json() == body
+        assert len(responses.calls) == 1
+
+    @responses.activate
+    def test_no_request_is_sent_offline(self):
+        responses.add(responses.GET, self.url, json={}, status=200)
+        set_cache_mode(CACHE_OFFLINE)
+        with pytest.raises(requests.exceptions.ConnectionError):
+            get_session().get(self.url)
+        assert len(responses.calls) == 0
+
+
+class TestCachedCommands(BaseTestClass):
+    def setup(self):
+        url = "{}{}".format(API_HOST_URL, URLS.challenge_details.value).format("1")
+        responses.add(
+            responses.GET,
+            url,
+            json=json.loads(challenge_response.challenge_details),
+            status=200,
+        )
+
+    @responses.activate
+    def test_challenge_details_are_cached(self):
+        runner = CliRunner()
+        first = runner.invoke(challenge, ["1"])
+        second = runner.invoke(challenge, ["1"])
+        assert second.output == first.output
+        assert len(responses.calls) == 1
+
+    @responses.activate
+    def test_no_cache_flag(self, monkeypatch):
+        # The update check of the main group doesn't make requests
+        monkeypatch.setenv("EVALAI_DISABLE_UPDATE_CHECK", "1")
+        runner = CliRunner()
+        runner.invoke(main, ["challenge", "1"])
+        runner.invoke(main, ["--no-cache", "challenge", "1"])
+        assert len(responses.calls) == 2
+        # Every invocation of the CLI is a new process
+        set_cache_mode(CACHE_ENABLED)
+        runner.invoke(main, ["challenge", "1"])
+        assert len(responses.calls) == 2
+        runner.invoke(main, ["--refresh", "challenge", "1"])
+        assert len(responses.calls) == 3
+
+    @responses.activate
+    def test_offline_flag(self, monkeypatch):
+        monkeypatch.setenv("EVALAI_DISABLE_UPDATE_CHECK", "1")
+        runner = CliRunner()
+        first = runner.invoke(main, ["challenge", "1"])
+        result = runner.invoke(main, ["--offline", "challenge", "1"])
+        assert len(responses.calls) == 1
+        assert result.exit_code == 0
+        assert result.output.startswith("Data as of ")
+        assert result.output.split("\n", 1)[1] == first.output
+
+    @responses.activate
+    def test_offline_flag_without_cached_response(self, monkeypatch):
+        monkeypatch.setenv("EVALAI_DISABLE_UPDATE_CHECK", "1")
+        runner = CliRunner()
+        result = runner.invoke(main, ["--offline", "challenge", "1"])
+        assert result.exit_code == 1
+        assert "isn't cached, so it can't be shown in offline mode" in result.output
+        assert len(responses.calls) == 0
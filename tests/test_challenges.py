@@ -563,6 +563,33 @@ class TestParticipantOrHostTeamChallenges(BaseTestClass):
         response = result.output.rstrip()
         assert str(response) == self.output
 
+    @responses.activate
+    def test_display_host_challenge_list_of_several_teams(self):
+        host_team_data = json.loads(challenge_response.challenge_host_teams)
+        team = dict(host_team_data["results"][0], id=5)
+        host_team_data["results"].append(team)
+        host_team_data["count"] = 2
+        url = "{}{}"
+        responses.replace(
+            responses.GET,
+            url.format(API_HOST_URL, URLS.host_teams.value),
+            json=host_team_data,
+            status=200,
+        )
+        responses.add(
+            responses.GET,
+            url.format(API_HOST_URL, URLS.host_challenges.value).format("5"),
+            json=json.loads(challenge_response.challenges),
+            status=200,
+        )
+        runner = CliRunner()
+        result = runner.invoke(challenges, ["--host"])
+        response = result.output.rstrip()
+        # The challenges of both teams are only listed once
+        assert str(response) == "\nHosted Challenges\n\n{}".format(self.output)
+        urls = [call.request.url for call in responses.calls]
+        assert url.format(API_HOST_URL, URLS.host_challenges.value).format("5") in urls
+
 
 class TestDisplayChallengePhases(BaseTestClass):
     def setup(self):
@@ -1063,3 +1090,125 @@ class TestDisplaySubmissionWithoutSubmissionData(BaseTestClass):
         result = runner.invoke(challenge, ["two", "participate", "3"])
         response = result.output
         assert response == output
+
+
+class TestDownloadSubmissionFiles(BaseTestClass):
+    def setup(self):
+        self.files = {
+            "https://evalai.s3.amazonaws.com/submission_8/result.json": b'{"score": 8}',
+            "https://evalai.s3.amazonaws.com/submission_7/result.json": b'{"score": 7}',
+        }
+        self.etags = {url: '"v1"' for url in self.files}
+        json_data = {
+            "count": 3,
+            "next": None,
+            "previous": None,
+            "results": [
+                {"id": 9, "submission_result_file": None, "stdout_file": None},
+                {
+                    "id": 8,
+                    "submission_result_file": "https://evalai.s3.amazonaws.com/submission_8/result.json",
+                    "stdout_file": None,
+                },
+                {
+                    "id": 7,
+                    "submission_result_file": "https://evalai.s3.amazonaws.com/submission_7/result.json",
+                    "stdout_file": None,
+                },
+            ],
+        }
+        url = "{}{}"
+        responses.add(
+            responses.GET,
+            url.format(API_HOST_URL, URLS.my_submissions.value).format(
+                "3", "7"
+            ),
+            json=json_data,
+            status=200,
+        )
+        for file_url in self.files:
+            responses.add_callback(
+                responses.GET, file_url, callback=self.serve_file
+            )
+
+    def serve_file(self, request):
+        content = self.files[request.url]
+        headers = {"ETag": self.etags[request.url]}
+        if request.headers.get("Range") == "bytes=0-0":
+            headers["Content-Range"] = "bytes 0-0/{}".format(len(content))
+            return (206, headers, content[:1])
+        return (200, headers, content)
+
+    def get_file_requests(self):
+        return [
+            call.request
+            for call in responses.calls
+            if call.request.url in self.files
+        ]
+
+    @responses.activate
+    def test_download_submission_files(self, tmpdir):
+        out = str(tmpdir.join("results"))
+        runner = CliRunner()
+        result = runner.invoke(
+            challenge, ["3", "phase", "7", "download", "--out", out]
+        )
+        assert result.exit_code == 0
+        assert "2 files downloaded to {}, 0 already up to date.".format(out) in result.output
+        with open(tmpdir.join("results", "submission_8", "result.json").strpath, "rb") as fr:
+            assert fr.read() == b'{"score": 8}'
+        with open(tmpdir.join("results", "submission_7", "result.json").strpath, "rb") as fr:
+            assert fr.read() == b'{"score": 7}'
+        assert not tmpdir.join("results", "submission_9").exists()
+
+    @responses.activate
+    def test_download_submission_files_skips_unchanged_files(self, tmpdir):
+        out = str(tmpdir)
+        runner = CliRunner()
+        runner.invoke(challenge, ["3", "phase", "7", "download", "--out", out])
+        responses.calls.reset()
+        self.etags["https://evalai.s3.amazonaws.com/submission_8/result.json"] = '"v2"'
+        result = runner.invoke(
+            challenge, ["3", "phase", "7", "download", "--out", out]
+        )
+        assert result.exit_code == 0
+        assert "1 files downloaded to {}, 1 already up to date.".format(out) in result.output
+        # Both files are probed and only the changed one is downloaded again
+        ranges = sorted(
+            (request.url, request.headers.get("Range", ""))
+            for request in self.get_file_requests()
+        )
+        assert ranges == [
+            ("https://evalai.s3.amazonaws.com/submission_7/result.json", "bytes=0-0"),
+            ("https://evalai.s3.amazonaws.com/submission_8/result.json", ""),
+            ("https://evalai.s3.amazonaws.com/submission_8/result.json", "bytes=0-0"),
+        ]
+
+    @responses.activate
+    def test_download_submission_files_without_files(self, tmpdir):
+        runner = CliRunner()
+        result = runner.invoke(
+            challenge,
+            ["3", "phase", "7", "download", "--what", "stdout", "--out", str(tmpdir)],
+        )
+        assert result.exit_code == 0
+        assert "There are no files to download for your submissions." in result.output
+        assert self.get_file_requests() == []
+
+    @responses.activate
+    def test_download_submission_files_when_a_file_fails(self, tmpdir):
+        self.files.pop("https://evalai.s3.amazonaws.com/submission_7/result.json")
+        responses.replace(
+            responses.GET,
+            "https://evalai.s3.amazonaws.com/submission_7/result.json",
+            status=403,
+        )
+        runner = CliRunner()
+        result = runner.invoke(
+            challenge, ["3", "phase", "7", "download", "--out", str(tmpdir)]
+        )
+        assert result.exit_code == 1
+        assert "Could not download {}".format(
+            tmpdir.join("submission_7", "result.json")
+        ) in result.output
+        assert tmpdir.join("submission_8", "result.json").exists()
@@ -0,0 +1,305 @@
+import gzip
+import os
+import pytest
+import re
+import responses
+
+from requests.exceptions import HTTPError
+
+from evalai.utils import downloads
+from evalai.utils.downloads import (
+    DownloadJournal,
+    download,
+    get_file_info,
+    get_ranges,
+    parse_content_range,
+    write_body,
+)
+from evalai.utils.session import get_session
+
+
+FILE_URL = "https://evalai.s3.amazonaws.com/file.json?Signature=abc"
+
+CONTENT = os.urandom(100)
+
+
+def serve_ranges(content, failures=None, etag='"v1"'):
+    """
+    Returns a responses callback serving ranges of `content` like S3.
+
+    `failures` maps the first byte of ranges to the number of times they fail.
+    """
+    failures = dict(failures or {})
+
+    def callback(request):
+        match = re.match(r"bytes=(\d+)-(\d*)", request.headers.get("Range", ""))
+        if_range = request.headers.get("If-Range")
+        if match is None or (if_range is not None and if_range != etag):
+            return (200, {"ETag": etag}, content)
+        start = int(match.group(1))
+        end = int(match.group(2) or len(content) - 1)
+        if start >= len(content):
+            return (416, {"Content-Range": "bytes */{}".format(len(content))}, b"")
+        if failures.get(start):
+            failures[start] -= 1
+            return (503, {}, b"")
+        end = min(end, len(content) - 1)
+        headers = {
+            "Content-Range": "bytes {}-{}/{}".format(start, end, len(content)),
+            "ETag": etag,
+        }
+        return (206, headers, content[start:end + 1])
+
+    return callback
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(downloads, "get_backoff_delay", lambda attempt: 0)
+
+
+class TestRanges:
+    def test_parse_content_range(self):
+        assert parse_content_range("bytes 0-99/1000") == (0, 99, 1000)
+        assert parse_content_range("bytes 0-99/*") == (0, 99, None)
+        assert parse_content_range(None) is None
+
+    def test_get_ranges(self):
+        assert get_ranges(0, 25, 10) == [(0, 9), (10, 19), (20, 24)]
+
+
+class TestDownload:
+    @responses.activate
+    def test_parts_are_downloaded_in_parallel(self, tmpdir):
+        responses.add_callback(responses.GET, FILE_URL, callback=serve_ranges(CONTENT))
+        path = str(tmpdir.join("file.json"))
+        sizes = []
+        downloaded = []
+        download(FILE_URL, path, 3, 16, downloaded.append, sizes.append)
+        with open(path, "rb") as fr:
+            assert fr.read() == CONTENT
+        assert sizes == [100]
+        assert sum(downloaded) == 100
+        ranges = sorted(call.request.headers["Range"] for call in responses.calls)
+        assert len(ranges) == 1 + 7
+        assert "bytes=96-99" in ranges
+
+    @responses.activate
+    def test_download_without_range_support(self, tmpdir):
+        responses.add(
+            responses.GET,
+            FILE_URL,
+            body=CONTENT,
+            headers={"Content-Length": "100"},
+            status=200,
+        )
+        path = str(tmpdir.join("file.json"))
+        sizes = []
+        download(FILE_URL, path, 3, 16, on_size=sizes.append)
+        with open(path, "rb") as fr:
+            assert fr.read() == CONTENT
+        assert sizes == [100]
+        assert len(responses.calls) == 1
+
+    @responses.activate
+    def test_download_of_ranges_without_size(self, tmpdir):
+        def callback(request):
+            if "Range" in request.headers:
+                return (206, {"Content-Range": "bytes 0-0/*"}, CONTENT[:1])
+            return (200, {"Content-Length": "100"}, CONTENT)
+
+        responses.add_callback(responses.GET, FILE_URL, callback=callback)
+        path = str(tmpdir.join("file.json"))
+        assert download(FILE_URL, path, 3, 16)["size"] == 100
+        with open(path, "rb") as fr:
+            assert fr.read() == CONTENT
+        assert "Range" not in responses.calls[1].request.headers
+
+    @responses.activate
+    def test_failed_ranges_are_retried(self, tmpdir):
+        responses.add_callback(
+            responses.GET, FILE_URL, callback=serve_ranges(CONTENT, {32: 2})
+        )
+        path = str(tmpdir.join("file.json"))
+        download(FILE_URL, path, 3, 16)
+        with open(path, "rb") as fr:
+            assert fr.read() == CONTENT
+
+    @responses.activate
+    def test_failed_download_raises(self, tmpdir):
+        responses.add_callback(
+            responses.GET, FILE_URL, callback=serve_ranges(CONTENT, {32: 10})
+        )
+        with pytest.raises(HTTPError):
+            download(FILE_URL, str(tmpdir.join("file.json")), 3, 16)
+
+    @responses.activate
+    def test_empty_file(self, tmpdir):
+        responses.add_callback(responses.GET, FILE_URL, callback=serve_ranges(b""))
+        path = str(tmpdir.join("file.json"))
+        download(FILE_URL, path, 3, 16)
+        assert os.path.getsize(path) == 0
+
+
+class TestResumeDownload:
+    @responses.activate
+    def test_interrupted_download_is_resumed(self, tmpdir):
+        path = str(tmpdir.join("file.json"))
+        responses.add_callback(
+            responses.GET, FILE_URL, callback=serve_ranges(CONTENT, {32: 10})
+        )
+        with pytest.raises(HTTPError):
+            download(FILE_URL, path, 3, 16)
+        assert not os.path.exists(path)
+        assert os.path.exists(path + ".part")
+
+        responses.reset()
+        responses.add_callback(responses.GET, FILE_URL, callback=serve_ranges(CONTENT))
+        downloaded = []
+        download(FILE_URL, path, 3, 16, downloaded.append)
+        with open(path, "rb") as fr:
+            assert fr.read() == CONTENT
+        assert sum(downloaded) == 100
+        assert [call.request.headers["Range"] for call in responses.calls] == [
+            "bytes=0-0",
+            "bytes=32-47",
+        ]
+        assert all(call.request.headers["If-Range"] == '"v1"' for call in responses.calls)
+        assert os.listdir(str(tmpdir)) == ["file.json"]
+
+    @responses.activate
+    def test_changed_file_is_downloaded_again(self, tmpdir):
+        path = str(tmpdir.join("file.json"))
+        responses.add_callback(
+            responses.GET, FILE_URL, callback=serve_ranges(CONTENT, {32: 10})
+        )
+        with pytest.raises(HTTPError):
+            download(FILE_URL, path, 3, 16)
+
+        responses.reset()
+        content = os.urandom(50)
+        responses.add_callback(
+            responses.GET, FILE_URL, callback=serve_ranges(content, etag='"v2"')
+        )
+        download(FILE_URL, path, 3, 16)
+        with open(path, "rb") as fr:
+            assert fr.read() == content
+        assert os.listdir(str(tmpdir)) == ["file.json"]
+
+    def interrupt_stream(self, path, num_bytes):
+        DownloadJournal.create(
+            path,
+            {"size": 100, "etag": '"v1"', "last_modified": None, "stream": True},
+        )
+        with open(path + ".part", "wb") as fw:
+            fw.write(CONTENT[:num_bytes])
+
+    @responses.activate
+    def test_interrupted_stream_is_resumed(self, tmpdir):
+        path = str(tmpdir.join("file.json"))
+        self.interrupt_stream(path, 40)
+        responses.add_callback(responses.GET, FILE_URL, callback=serve_ranges(CONTENT))
+        downloaded = []
+        assert download(FILE_URL, path, 1, callback=downloaded.append)["size"] == 100
+        with open(path, "rb") as fr:
+            assert fr.read() == CONTENT
+        assert sum(downloaded) == 100
+        assert len(responses.calls) == 1
+        assert responses.calls[0].request.headers["Range"] == "bytes=40-"
+        assert responses.calls[0].request.headers["If-Range"] == '"v1"'
+        assert os.listdir(str(tmpdir)) == ["file.json"]
+
+    @responses.activate
+    def test_complete_stream_is_not_downloaded_again(self, tmpdir):
+        path = str(tmpdir.join("file.json"))
+        self.interrupt_stream(path, 100)
+        responses.add_callback(responses.GET, FILE_URL, callback=serve_ranges(CONTENT))
+        assert download(FILE_URL, path, 1)["size"] == 100
+        with open(path, "rb") as fr:
+            assert fr.read() == CONTENT
+        assert len(responses.calls) == 1
+        assert os.listdir(str(tmpdir)) == ["file.json"]
+
+    @responses.activate
+    def test_changed_stream_is_downloaded_again(self, tmpdir):
+        path = str(tmpdir.join("file.json"))
+        self.interrupt_stream(path, 40)
+        content = os.urandom(50)
+        responses.add_callback(
+            responses.GET, FILE_URL, callback=serve_ranges(content, etag='"v2"')
+        )
+        assert download(FILE_URL, path, 1)["size"] == 50
+        with open(path, "rb") as fr:
+            assert fr.read() == content
+        assert os.listdir(str(tmpdir)) == ["file.json"]
+
+    @responses.activate
+    def test_stream_is_journaled_while_it_is_written(self, tmpdir):
+        path = str(tmpdir.join("file.json"))
+        responses.add(responses.GET, FILE_URL, body=CONTENT, headers={"ETag": '"v1"'})
+        journals = []
+        download(
+            FILE_URL,
+            path,
+            1,
+            callback=lambda num_bytes: journals.append(DownloadJournal.load(path)),
+        )
+        assert journals[0].download["stream"]
+        assert journals[0].validator == '"v1"'
+        assert os.listdir(str(tmpdir)) == ["file.json"]
+
+
+class TestWriteBody:
+    @responses.activate
+    def test_body_is_read_into_a_reused_buffer(self):
+        responses.add(responses.GET, FILE_URL, body=CONTENT)
+        response = get_session().get(FILE_URL, stream=True)
+        writes = []
+
+        def write(data, offset):
+            writes.append((offset, bytes(data), data.obj))
+
+        assert write_body(response, write, 10, buffer_size=16) == 110
+        assert b"".join(data for _, data, _ in writes) == CONTENT
+        assert [offset for offset, _, _ in writes] == list(range(10, 110, 16))
+        assert len(set(id(buffer) for _, _, buffer in writes)) == 1
+
+    @responses.activate
+    def test_progress_is_batched_with_true_byte_counts(self, monkeypatch):
+        monkeypatch.setattr(downloads, "DOWNLOAD_PROGRESS_INTERVAL", 1000)
+        responses.add(responses.GET, FILE_URL, body=CONTENT)
+        response = get_session().get(FILE_URL, stream=True)
+        progress = []
+        write_body(response, lambda data, offset: None, 0, progress.append, 16)
+        assert progress == [100]
+
+    @responses.activate
+    def test_encoded_body_is_decoded(self, tmpdir):
+        responses.add(
+            responses.GET,
+            FILE_URL,
+            body=gzip.compress(CONTENT),
+            headers={"Content-Encoding": "gzip"},
+        )
+        path = str(tmpdir.join("file.json"))
+        download(FILE_URL, path, 1)
+        with open(path, "rb") as fr:
+            assert fr.read() == CONTENT
+
+
+class TestGetFileInfo:
+    @responses.activate
+    def test_get_file_info(self):
+        responses.add_callback(responses.GET, FILE_URL, callback=serve_ranges(CONTENT))
+        assert get_file_info(FILE_URL) == {"size": 100, "etag": '"v1"'}
+        assert responses.calls[0].request.headers["Range"] == "bytes=0-0"
+
+    @responses.activate
+    def test_get_file_info_without_ranges(self):
+        responses.add(
+            responses.GET,
+            FILE_URL,
+            body=CONTENT,
+            headers={"Content-Length": "100", "ETag": '"v1"'},
+        )
+        assert get_file_info(FILE_URL) == {"size": 100, "etag": '"v1"'}
@@ -0,0 +1,38 @@
+import json
+import pytest
+
+from evalai.utils.files import read_journal, write_json_file
+
+
+class TestWriteJsonFile:
+    def test_file_is_replaced(self, tmpdir):
+        path = str(tmpdir.join("dir", "data.json"))
+        write_json_file(path, {"a": 1})
+        write_json_file(path, {"a": 2})
+        with open(path, "r") as fr:
+            assert json.load(fr) == {"a": 2}
+        assert tmpdir.join("dir").listdir() == [tmpdir.join("dir", "data.json")]
+
+    def test_file_in_the_current_directory(self, tmpdir):
+        with tmpdir.as_cwd():
+            write_json_file("data.json", {"a": 1}, indent=2)
+        assert tmpdir.join("data.json").read() == '{\n  "a": 1\n}'
+
+    def test_temporary_file_is_removed_on_failure(self, tmpdir):
+        path = str(tmpdir.join("data.json"))
+        write_json_file(path, {"a": 1})
+        with pytest.raises(TypeError):
+            write_json_file(path, {"a": object()})
+        with open(path, "r") as fr:
+            assert json.load(fr) == {"a": 1}
+        assert tmpdir.listdir() == [tmpdir.join("data.json")]
+
+
+class TestReadJournal:
+    def test_incomplete_last_line_is_ignored(self, tmpdir):
+        path = tmpdir.join("journal.jsonl")
+        path.write('{"size": 10}\n[0, 4]\n[5, ')
+        assert read_journal(str(path)) == ({"size": 10}, [[0, 4]])
+
+    def test_missing_journal(self, tmpdir):
+        assert read_journal(str(tmpdir.join("journal.jsonl"))) is None
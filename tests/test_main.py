@@ -0,0 +1,18 @@
+import click
+
+from evalai.main import main
+from evalai.set_host import host
+
+
+class TestLazyGroup:
+    def test_list_commands_includes_lazy_commands(self):
+        ctx = click.Context(main)
+        commands = main.list_commands(ctx)
+        assert "challenges" in commands
+        assert "push" in commands
+        assert "login" in commands
+
+    def test_get_command_loads_subcommand(self):
+        ctx = click.Context(main)
+        assert main.get_command(ctx, "host") is host
+        assert main.get_command(ctx, "unknown") is None
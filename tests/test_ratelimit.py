@@ -0,0 +1,104 @@
+import pytest
+import responses
+
+from click.testing import CliRunner
+
+from evalai.challenges import challenge
+from evalai.utils import ratelimit
+from evalai.utils.ratelimit import (
+    ThrottledReader,
+    TokenBucket,
+    get_rate_limiter,
+    parse_rate,
+    set_max_rate,
+)
+from evalai.utils.uploads import upload_part
+
+from .base import BaseTestClass
+
+
+PART_URL = "https://evalai.s3.amazonaws.com/file?partNumber=1"
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    delays = []
+    monkeypatch.setattr(ratelimit.time, "sleep", delays.append)
+    return delays
+
+
+class TestParseRate:
+    @pytest.mark.parametrize(
+        "value, rate",
+        [
+            ("100", 100),
+            ("500K", 500 * 1024),
+            ("50m", 50 * 1024 * 1024),
+            ("1.5G", 3 * 1024 * 1024 * 1024 // 2),
+            ("50MB/s", 50 * 1024 * 1024),
+        ],
+    )
+    def test_parse_rate(self, value, rate):
+        assert parse_rate(value) == rate
+
+    @pytest.mark.parametrize("value", ["fast", "50T", "0", "-5M"])
+    def test_parse_invalid_rate(self, value):
+        with pytest.raises(ValueError):
+            parse_rate(value)
+
+
+class TestTokenBucket:
+    def test_bursts_are_not_delayed(self, sleeps):
+        bucket = TokenBucket(1000, burst=1000)
+        bucket.consume(1000)
+        assert sleeps == []
+
+    def test_debt_is_waited_for(self, sleeps):
+        bucket = TokenBucket(1000, burst=1000)
+        bucket.consume(1000)
+        bucket.consume(500)
+        assert len(sleeps) == 1
+        assert 0.45 < sleeps[0] <= 0.5
+
+    def test_throttled_reader_takes_tokens_for_every_read(self, sleeps):
+        bucket = TokenBucket(1000, burst=0)
+        reader = ThrottledReader(b"x" * 300, bucket)
+        assert len(reader) == 300
+        blocks = []
+        while True:
+            block = reader.read(100)
+            if not block:
+                break
+            blocks.append(bytes(block))
+        assert blocks == [b"x" * 100] * 3
+        assert len(sleeps) == 3
+
+
+class TestMaxRate(BaseTestClass):
+    def teardown(self):
+        set_max_rate(None)
+
+    @responses.activate
+    def test_throttled_part_is_sent_with_its_length(self):
+        set_max_rate(1024 * 1024)
+        responses.add(responses.PUT, PART_URL, headers={"ETag": "etag-1"})
+        assert upload_part(PART_URL, memoryview(b"data")) == "etag-1"
+        assert responses.calls[0].request.headers["Content-Length"] == "4"
+
+    def test_max_rate_is_shared(self):
+        set_max_rate(1024)
+        assert get_rate_limiter() is get_rate_limiter()
+        set_max_rate(None)
+        assert get_rate_limiter() is None
+
+    def test_submit_with_invalid_max_rate(self):
+        runner = CliRunner()
+        with runner.isolated_filesystem():
+            with open("test_file.txt", "w") as f:
+                f.write("1 2 3 4 5 6")
+            result = runner.invoke(
+                challenge,
+                ["1", "phase", "2", "submit", "--file", "test_file.txt", "--max-rate", "fast"],
+            )
+        assert result.exit_code == 2
+        assert "Invalid rate fast" in result.output
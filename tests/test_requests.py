@@ -1,13 +1,18 @@
 import json
 import responses
+import time
 
 from click.testing import CliRunner
 from requests.exceptions import RequestException
+from responses import matchers
 
 from evalai.challenges import challenge, challenges
 from evalai.teams import teams
 from evalai.submissions import submission
 from evalai.utils.auth import get_request_header, get_host_url
+from evalai.utils.config import HTTP_POOL_MAXSIZE
+from evalai.utils.requests import get_page_url, paginate
+from evalai.utils.session import get_session
 from evalai.utils.urls import URLS
 from evalai.utils.config import API_HOST_URL
 
@@ -1040,3 +1045,102 @@ class TestTeamsSuccess(BaseTestClass):
         result = runner.invoke(challenge, [self.challenge_id, "participate", self.team_id], input="N")
         response = result.output
         assert response == expected
+
+
+class TestSharedSession(BaseTestClass):
+    def test_get_session_returns_same_session(self):
+        assert get_session() is get_session()
+
+    def test_session_uses_pooled_adapter(self):
+        adapter = get_session().get_adapter(API_HOST_URL)
+        assert adapter._pool_maxsize == HTTP_POOL_MAXSIZE
+        assert adapter.max_retries.read == 0
+
+
+class TestPaginate(BaseTestClass):
+    def setup(self):
+        self.url = "{}{}".format(API_HOST_URL, URLS.leaderboard.value).format("1")
+        leaderboard = json.loads(challenge_response.leaderboard)
+        self.rows = leaderboard["results"]
+        pages = [self.rows[:2], self.rows[2:4], self.rows[4:]]
+        for number, rows in enumerate(pages, start=1):
+            next_url = None
+            if number < len(pages):
+                next_url = "{}?page={}".format(self.url, number + 1)
+            responses.add(
+                responses.GET,
+                self.url if number == 1 else "{}?page={}".format(self.url, number),
+                json={
+                    "count": len(self.rows),
+                    "next": next_url,
+                    "previous": None,
+                    "results": rows,
+                },
+                status=200,
+                match=[
+                    matchers.query_string_matcher(
+                        "" if number == 1 else "page={}".format(number)
+                    )
+                ],
+            )
+
+    @responses.activate
+    def test_paginate_follows_next(self):
+        assert list(paginate(self.url)) == self.rows
+        assert len(responses.calls) == 3
+
+    @responses.activate
+    def test_paginate_fetches_pages_as_rows_are_consumed(self):
+        rows = paginate(self.url, workers=1)
+        assert next(rows) == self.rows[0]
+        assert next(rows) == self.rows[1]
+        assert len(responses.calls) == 1
+        assert next(rows) == self.rows[2]
+        assert len(responses.calls) == 2
+
+    @responses.activate
+    def test_paginate_requests_pages_concurrently_in_order(self, monkeypatch):
+        # The second page is the slowest, yet its rows come before the third
+        slow_url = "{}?page=2".format(self.url)
+        session = get_session()
+        get = session.get
+
+        def slow_get(url, **kwargs):
+            if url == slow_url:
+                time.sleep(0.2)
+            return get(url, **kwargs)
+
+        monkeypatch.setattr(session, "get", slow_get)
+        assert list(paginate(self.url)) == self.rows
+        urls = [call.request.url for call in responses.calls]
+        assert urls.index(slow_url) > urls.index("{}?page=3".format(self.url))
+
+    @responses.activate
+    def test_paginate_stops_when_the_list_gets_shorter(self):
+        responses.replace(
+            responses.GET,
+            "{}?page=3".format(self.url),
+            status=404,
+            match=[matchers.query_string_matcher("page=3")],
+        )
+        assert list(paginate(self.url)) == self.rows[:4]
+
+    def test_get_page_url(self):
+        assert get_page_url("https://host/list/?page=2&x=1", 5, 10) == "https://host/list/?page=5&x=1"
+        assert get_page_url("https://host/list/?limit=10&offset=10", 3, 10) == "https://host/list/?limit=10&offset=20"
+        assert get_page_url("https://host/list/?cursor=abc", 2, 10) is None
+
+    @responses.activate
+    def test_paginate_with_limit(self):
+        assert list(paginate(self.url, limit=4)) == self.rows[:4]
+        assert len(responses.calls) == 2
+
+    @responses.activate
+    def test_leaderboard_with_limit(self):
+        runner = CliRunner()
+        result = runner.invoke(challenge, ["2", "leaderboard", "1", "--limit", "3"])
+        assert result.exit_code == 0
+        for row in self.rows[:3]:
+            assert row["submission__participant_team__team_name"] in result.output
+        assert self.rows[3]["submission__participant_team__team_name"] not in result.output
+        assert len(responses.calls) == 2
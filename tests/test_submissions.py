@@ -1,4 +1,5 @@
 import docker
+import hashlib
 import json
 import os
 import pytest
@@ -9,15 +10,30 @@ from click.testing import CliRunner
 from datetime import datetime
 from dateutil import tz
 
+from urllib.parse import parse_qs
+
 from evalai.challenges import challenge
 from evalai.submissions import submission, push
 from tests.data import submission_response, challenge_response
 
-from evalai.utils.config import API_HOST_URL
+from evalai.utils import common, uploads
+from evalai.utils.common import upload_file_using_presigned_url
+from evalai.utils.config import (
+    API_HOST_URL,
+    UPLOAD_DEFAULT_PART_SIZE,
+    UPLOAD_STREAM_MAX_SIZE,
+)
+from evalai.utils.uploads import UploadJournal, get_file_hash, get_num_parts
 from evalai.utils.urls import URLS
 from .base import BaseTestClass
 
 
+def upload_part_to_s3(request):
+    # S3 returns the MD5 digest of the part as its ETag
+    etag = '"{}"'.format(hashlib.md5(request.body).hexdigest())
+    return (200, {"ETag": etag}, "")
+
+
 class TestGetSubmissionDetails(BaseTestClass):
     def setup(self):
 
@@ -207,11 +223,8 @@ class TestMakeSubmission(BaseTestClass):
         # To get presigned URL for part
         presigned_url_response = json.loads(challenge_response.get_submission_file_presigned_url)
         part_file_upload_url = presigned_url_response["presigned_urls"][0]["url"]
-        responses.add(
-            responses.PUT,
-            part_file_upload_url,
-            headers=json.loads(challenge_response.part_file_upload_to_s3),
-            status=200,
+        responses.add_callback(
+            responses.PUT, part_file_upload_url, callback=upload_part_to_s3
         )
 
         # To publish submission message
@@ -248,11 +261,8 @@ class TestMakeSubmission(BaseTestClass):
         # To get presigned URL for part
         presigned_url_response = json.loads(challenge_response.get_annotation_file_presigned_url)
         part_file_upload_url = presigned_url_response["presigned_urls"][0]["url"]
-        responses.add(
-            responses.PUT,
-            part_file_upload_url,
-            headers=json.loads(challenge_response.annotation_part_file_upload_to_s3),
-            status=200,
+        responses.add_callback(
+            responses.PUT, part_file_upload_url, callback=upload_part_to_s3
         )
 
         responses.add_passthru("http+docker://localhost/")
@@ -417,6 +427,253 @@ class TestMakeSubmission(BaseTestClass):
             response = "\n".join(splitted_response)
             assert response == expected
 
+    @responses.activate
+    def test_make_submission_above_large_file_threshold(self, monkeypatch):
+        monkeypatch.setattr("evalai.challenges.LARGE_FILE_THRESHOLD", 10)
+        monkeypatch.setattr("evalai.utils.submissions.LARGE_FILE_THRESHOLD", 10)
+        expected = (
+            "Do you want to include the Submission Details? [y/N]: N\n"
+            "Do you want to include the Submission Metadata? [y/N]: N\n\n"
+            "The file is larger than 0 MB, so it will be uploaded in parts.\n"
+            "Uploading the file...\n\n"
+            "Your submission test_file.txt with the id 9 is successfully submitted for evaluation.\n\n"
+        )
+        runner = CliRunner()
+        with runner.isolated_filesystem():
+            with open("test_file.txt", "w") as f:
+                f.write("1 2 3 4 5 6")
+
+            result = runner.invoke(
+                challenge,
+                ["1", "phase", "2", "submit", "--file", "test_file.txt"],
+                input="N\nN"
+            )
+            response = result.output
+
+            # Remove progress bar from response
+            splitted_response = response.split("\n")
+            splitted_response.pop(5)
+            response = "\n".join(splitted_response)
+            assert response == expected
+
+    @responses.activate
+    def test_make_submission_when_file_was_already_submitted(self):
+        expected = (
+            "Warning: test_file.txt was already submitted to phase 2 as submission 9."
+            " Use --skip-duplicates to skip identical submissions."
+        )
+        runner = CliRunner()
+        with runner.isolated_filesystem():
+            with open("test_file.txt", "w") as f:
+                f.write("1 2 3 4 5 6")
+
+            args = ["1", "phase", "2", "submit", "--file", "test_file.txt"]
+            result = runner.invoke(challenge, args, input="N\nN")
+            assert expected not in result.output
+            result = runner.invoke(challenge, args, input="N\nN")
+            assert result.exit_code == 0
+            assert expected in result.output
+            assert "is successfully submitted" in result.output
+
+    @responses.activate
+    def test_unchanged_large_file_is_not_hashed_again(self, monkeypatch):
+        def get_content_hash(file):
+            raise AssertionError("Unchanged files aren't read again to hash them")
+
+        expected = (
+            "Warning: test_file.txt was already submitted to phase 2 as submission 9."
+        )
+        runner = CliRunner()
+        with runner.isolated_filesystem():
+            with open("test_file.txt", "w") as f:
+                f.write("1 2 3 4 5 6")
+
+            args = ["1", "phase", "2", "submit", "--file", "test_file.txt", "--large"]
+            result = runner.invoke(challenge, args, input="N\nN")
+            assert result.exit_code == 0
+            assert expected not in result.output
+            monkeypatch.setattr("evalai.challenges.get_content_hash", get_content_hash)
+            result = runner.invoke(challenge, args, input="N\nN")
+            assert result.exit_code == 0
+            assert expected in result.output
+
+    @responses.activate
+    def test_make_submission_with_skip_duplicates(self):
+        expected = (
+            "Skipping the submission: test_file.txt was already submitted to phase 2"
+            " as submission 9."
+        )
+        runner = CliRunner()
+        with runner.isolated_filesystem():
+            with open("test_file.txt", "w") as f:
+                f.write("1 2 3 4 5 6")
+
+            args = ["1", "phase", "2", "submit", "--file", "test_file.txt", "--skip-duplicates"]
+            runner.invoke(challenge, args, input="N\nN")
+            num_calls = len(responses.calls)
+            result = runner.invoke(challenge, args, input="N\nN")
+            assert result.exit_code == 0
+            assert result.output.strip() == expected
+            assert len(responses.calls) == num_calls
+
+            # A changed file is submitted again
+            with open("test_file.txt", "w") as f:
+                f.write("1 2 3 4 5 6 7")
+            result = runner.invoke(challenge, args, input="N\nN")
+            assert "is successfully submitted" in result.output
+
+    @responses.activate
+    def test_regenerated_large_file_is_skipped(self):
+        expected = (
+            "Skipping the submission: test_file.txt was already submitted to phase 2"
+            " as submission 9."
+        )
+        runner = CliRunner()
+        with runner.isolated_filesystem():
+            with open("test_file.txt", "w") as f:
+                f.write("1 2 3 4 5 6")
+
+            args = ["1", "phase", "2", "submit", "--file", "test_file.txt", "--large", "--skip-duplicates"]
+            result = runner.invoke(challenge, args, input="N\nN")
+            assert "is successfully submitted" in result.output
+            # A pipeline writes the same content again
+            with open("test_file.txt", "w") as f:
+                f.write("1 2 3 4 5 6")
+            os.utime("test_file.txt", (0, 0))
+            num_calls = len(responses.calls)
+            result = runner.invoke(challenge, args, input="N\nN")
+            assert result.exit_code == 0
+            assert result.output.strip() == expected
+            assert len(responses.calls) == num_calls
+
+    @responses.activate
+    def test_make_submission_from_a_stream(self, capsys):
+        read_fd, write_fd = os.pipe()
+        os.write(write_fd, b"1 2 3 4 5 6")
+        os.close(write_fd)
+        with os.fdopen(read_fd, "rb") as file:
+            upload_file_using_presigned_url(2, file, "submission")
+        assert "is successfully submitted for evaluation" in capsys.readouterr().out
+
+        calls = {call.request.url: call.request for call in responses.calls}
+        presigned_url_request = calls[
+            "{}{}".format(API_HOST_URL, URLS.get_presigned_url_for_submission_file.value).format("2")
+        ]
+        # The size of a stream isn't known, so the upload is created with
+        # parts for the largest stream and only the parts read are uploaded
+        num_file_chunks = parse_qs(presigned_url_request.body)["num_file_chunks"][0]
+        assert int(num_file_chunks) > 1
+        part_uploads = [request for request in calls.values() if request.method == "PUT"]
+        assert [request.headers["Content-Length"] for request in part_uploads] == ["11"]
+        finish_request = calls[
+            "{}{}".format(API_HOST_URL, URLS.finish_upload_for_submission_file.value).format("2", "9")
+        ]
+        assert len(json.loads(parse_qs(finish_request.body)["parts"][0])) == 1
+
+    @responses.activate
+    def test_make_submission_from_stdin_redirected_from_a_file(self, capsys, tmpdir):
+        file_path = tmpdir.join("predictions.txt")
+        file_path.write("1 2 3 4 5 6")
+        with open(str(file_path), "rb") as file:
+            # Like `--file - < predictions.txt`
+            file.raw.name = "<stdin>"
+            upload_file_using_presigned_url(2, file, "submission", file_name="predictions.json")
+        assert (
+            "Your submission predictions.json with the id 9 is successfully submitted"
+            in capsys.readouterr().out
+        )
+        calls = {call.request.url: call.request for call in responses.calls}
+        presigned_url_request = calls[
+            "{}{}".format(API_HOST_URL, URLS.get_presigned_url_for_submission_file.value).format("2")
+        ]
+        assert parse_qs(presigned_url_request.body)["file_name"] == ["predictions.json"]
+
+    def test_make_submission_from_stdin_without_file_name(self):
+        expected = (
+            "Error: Please give the name of the file read from stdin with"
+            " --file-name, such as --file-name predictions.json"
+        )
+        runner = CliRunner()
+        result = runner.invoke(
+            challenge, ["1", "phase", "2", "submit", "--file", "-"], input="1 2 3"
+        )
+        assert result.output.strip() == expected
+
+    @responses.activate
+    def test_resumed_upload_with_expired_urls_is_discarded(self, capsys, monkeypatch, tmpdir):
+        monkeypatch.setattr(uploads, "UPLOAD_JOURNAL_DIR", str(tmpdir))
+        part_url = "https://evalai.s3.amazonaws.com/expired?partNumber=1"
+        responses.add(responses.PUT, part_url, status=403)
+        file_path = tmpdir.join("test_file.txt")
+        file_path.write("1 2 3 4 5 6")
+        with open(str(file_path), "rb") as file:
+            upload = {
+                "upload_id": "abc",
+                "presigned_urls": [{"partNumber": 1, "url": part_url}],
+                "submission_pk": 9,
+                "max_chunk_size": 1024,
+            }
+            UploadJournal.create(get_file_hash(file), 2, "submission", upload)
+            with pytest.raises(SystemExit):
+                upload_file_using_presigned_url(2, file, "submission", resume=True)
+            assert UploadJournal.load(get_file_hash(file), 2, "submission") is None
+        output = capsys.readouterr().out
+        assert "The upload links have expired" in output
+        assert "Run the same command with --resume" not in output
+
+    @responses.activate
+    def test_stream_parts_keep_the_default_size(self, monkeypatch):
+        # Stream parts are held in memory, so a fast connection mustn't
+        # make them larger
+        monkeypatch.setattr(common, "read_upload_throughput", lambda: 1024 ** 3)
+        read_fd, write_fd = os.pipe()
+        os.write(write_fd, b"1 2 3 4 5 6")
+        os.close(write_fd)
+        with os.fdopen(read_fd, "rb") as file:
+            upload_file_using_presigned_url(2, file, "submission")
+
+        calls = {call.request.url: call.request for call in responses.calls}
+        presigned_url_request = calls[
+            "{}{}".format(API_HOST_URL, URLS.get_presigned_url_for_submission_file.value).format("2")
+        ]
+        num_file_chunks = parse_qs(presigned_url_request.body)["num_file_chunks"][0]
+        assert int(num_file_chunks) == get_num_parts(
+            UPLOAD_STREAM_MAX_SIZE, UPLOAD_DEFAULT_PART_SIZE
+        )
+
+    @responses.activate
+    def test_make_submission_of_a_directory(self):
+        runner = CliRunner()
+        with runner.isolated_filesystem():
+            os.mkdir("predictions")
+            with open(os.path.join("predictions", "test_file.txt"), "w") as f:
+                f.write("1 2 3 4 5 6")
+
+            result = runner.invoke(
+                challenge,
+                ["1", "phase", "2", "submit", "--dir", "predictions"],
+                input="N\nN",
+            )
+            assert result.exit_code == 0
+            assert (
+                "Your submission predictions.tar.gz with the id 9 is successfully submitted"
+                in result.output
+            )
+
+    def test_make_submission_with_file_and_directory(self):
+        expected = "Error: Please select either --file or --dir"
+        runner = CliRunner()
+        with runner.isolated_filesystem():
+            os.mkdir("predictions")
+            with open("test_file.txt", "w") as f:
+                f.write("1 2 3 4 5 6")
+
+            result = runner.invoke(
+                challenge,
+                ["1", "phase", "2", "submit", "--file", "test_file.txt", "--dir", "predictions"],
+            )
+            assert result.output.strip() == expected
+
     @responses.activate
     def test_upload_annotation_using_presigned_url(self, request):
         expected = (
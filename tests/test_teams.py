@@ -9,7 +9,8 @@ from evalai.challenges import challenge
 
 from tests.data import teams_response
 
-from evalai.utils.auth import get_host_url
+from evalai.utils.auth import get_host_url, get_request_header
+from evalai.utils.cache import cached_get, get_cache_key, read_entry
 from evalai.utils.config import API_HOST_URL
 from evalai.utils.urls import URLS
 
@@ -237,6 +238,27 @@ class TestTeams:
         response = result.output
         assert response == output
 
+    @responses.activate
+    def test_created_team_is_not_hidden_by_the_cache(self):
+        url = "{}{}".format(API_HOST_URL, URLS.participant_team_list.value)
+        key = get_cache_key(url, get_request_header())
+        runner = CliRunner()
+        runner.invoke(teams, ["--participant"])
+        assert read_entry(key) is not None
+        runner.invoke(teams, ["create", "participant"], input="TeamTest\ny\nN")
+        assert read_entry(key) is None
+
+    @responses.activate
+    def test_challenge_participated_in_is_not_hidden_by_the_cache(self):
+        url = "{}{}".format(API_HOST_URL, URLS.participant_challenges.value).format("3")
+        responses.add(responses.GET, url, json={"results": []}, status=200)
+        cached_get(url, get_request_header(), URLS.participant_challenges)
+        key = get_cache_key(url, get_request_header())
+        assert read_entry(key) is not None
+        runner = CliRunner()
+        runner.invoke(challenge, ["2", "participate", "3"], input="Y")
+        assert read_entry(key) is None
+
     @responses.activate
     def test_participate_in_a_challenge_with_single_argument(self):
         output = (
@@ -0,0 +1,55 @@
+import json
+import time
+
+from evalai.utils import updates
+from evalai.utils.config import DISABLE_UPDATE_CHECK_ENV_VAR
+
+
+class TestUpdateCheck:
+    def setup(self):
+        self.spawned = []
+
+    def patch(self, monkeypatch, tmpdir):
+        monkeypatch.setattr(
+            updates,
+            "UPDATE_CHECK_FILE_PATH",
+            str(tmpdir.join("latest_version.json")),
+        )
+        monkeypatch.setattr(
+            updates,
+            "spawn_latest_version_refresh",
+            lambda: self.spawned.append(True),
+        )
+        monkeypatch.delenv(DISABLE_UPDATE_CHECK_ENV_VAR, raising=False)
+
+    def test_is_newer_version(self):
+        assert updates.is_newer_version("1.3.10", "1.3.9")
+        assert not updates.is_newer_version("1.3.9", "1.3.10")
+        assert not updates.is_newer_version("1.3.14", "1.3.14")
+
+    def test_fresh_cache_does_not_trigger_refresh(self, monkeypatch, tmpdir):
+        self.patch(monkeypatch, tmpdir)
+        tmpdir.join("latest_version.json").write(
+            json.dumps({"latest_version": "9.0.0", "checked_at": time.time()})
+        )
+        assert updates.get_cached_latest_version() == "9.0.0"
+        assert self.spawned == []
+
+    def test_stale_cache_triggers_background_refresh(
+        self, monkeypatch, tmpdir
+    ):
+        self.patch(monkeypatch, tmpdir)
+        tmpdir.join("latest_version.json").write(
+            json.dumps({"latest_version": "9.0.0", "checked_at": 0})
+        )
+        assert updates.get_cached_latest_version() == "9.0.0"
+        assert self.spawned == [True]
+        # The attempt is recorded so the next call doesn't spawn again
+        assert updates.get_cached_latest_version() == "9.0.0"
+        assert self.spawned == [True]
+
+    def test_update_check_can_be_disabled(self, monkeypatch, tmpdir):
+        self.patch(monkeypatch, tmpdir)
+        monkeypatch.setenv(DISABLE_UPDATE_CHECK_ENV_VAR, "1")
+        assert updates.get_cached_latest_version() is None
+        assert self.spawned == []
@@ -0,0 +1,414 @@
+import base64
+import hashlib
+import io
+import os
+import pytest
+import requests
+import responses
+import stat
+
+from concurrent.futures import ThreadPoolExecutor
+from requests.exceptions import ConnectionError, HTTPError
+
+from evalai.utils import uploads
+from evalai.utils.common import upload_file_to_s3
+from evalai.utils.config import (
+    S3_MAX_PARTS,
+    UPLOAD_DEFAULT_PART_SIZE,
+    UPLOAD_MAX_PART_SIZE,
+    UPLOAD_MIN_PART_SIZE,
+)
+from evalai.utils.ratelimit import TokenBucket
+from evalai.utils.session import get_session
+from evalai.utils.uploads import (
+    FileParts,
+    MultipartEncoder,
+    PartChecksumError,
+    RetryBudget,
+    UploadJournal,
+    get_num_parts,
+    get_part_size,
+    upload_part,
+    upload_parts,
+)
+
+
+PART_URL = "https://evalai.s3.amazonaws.com/file?partNumber={}"
+
+MB = 1024 * 1024
+
+
+def get_presigned_urls(num_parts):
+    return [
+        {"partNumber": part_number, "url": PART_URL.format(part_number)}
+        for part_number in range(1, num_parts + 1)
+    ]
+
+
+class TestPartSize:
+    def test_default_part_size_without_measured_throughput(self):
+        assert get_part_size(100 * MB) == UPLOAD_DEFAULT_PART_SIZE
+        assert get_num_parts(100, UPLOAD_DEFAULT_PART_SIZE) == 1
+        assert get_num_parts(0, UPLOAD_DEFAULT_PART_SIZE) == 1
+
+    def test_part_size_follows_throughput(self):
+        assert get_part_size(10 * 1024 * MB, 10 * MB) == 100 * MB
+        assert get_part_size(10 * 1024 * MB, 10) == UPLOAD_MIN_PART_SIZE
+        assert get_part_size(10 * 1024 * MB, 1024 * MB) == UPLOAD_MAX_PART_SIZE
+
+    def test_part_size_stays_within_s3_part_limit(self):
+        file_size = 300 * 1024 * MB
+        part_size = get_part_size(file_size)
+        assert get_num_parts(file_size, part_size) <= S3_MAX_PARTS
+        assert part_size % MB == 0
+
+
+class TestFileParts:
+    def test_mapped_file_parts_are_views(self, tmpdir):
+        file_path = tmpdir.join("submission.txt")
+        file_path.write("0123456789abcdefghijklmnopqrstuvwxyz")
+        with open(str(file_path), "rb") as file:
+            with FileParts(file, get_presigned_urls(4), 10, {2}) as parts:
+                chunks = []
+                for presigned_url_object, data in parts:
+                    assert isinstance(data, memoryview)
+                    chunks.append((presigned_url_object["partNumber"], bytes(data)))
+                    parts.release(data)
+        assert chunks == [(1, b"0123456789"), (3, b"klmnopqrst"), (4, b"uvwxyz")]
+
+    def test_buffered_parts_reuse_buffers(self):
+        file = io.BytesIO(b"0123456789abcdefghijklmnopqrstuvwxyz")
+        parts = FileParts(file, get_presigned_urls(4), 10, num_buffers=1)
+        buffers = set()
+        chunks = []
+        for presigned_url_object, data in parts:
+            buffers.add(id(data.obj))
+            chunks.append(bytes(data))
+            parts.release(data)
+        assert chunks == [b"0123456789", b"abcdefghij", b"klmnopqrst", b"uvwxyz"]
+        assert len(buffers) == 1
+
+    def test_buffers_are_allocated_when_needed(self, tmpdir):
+        parts = FileParts(io.BytesIO(b"x" * 5), get_presigned_urls(10), 10, num_buffers=5)
+        for presigned_url_object, data in parts:
+            parts.release(data)
+        assert parts._num_allocated_buffers == 1
+
+        file_path = tmpdir.join("submission.txt")
+        file_path.write("x" * 25)
+        with open(str(file_path), "rb") as file:
+            with FileParts(file, get_presigned_urls(3), 10, num_buffers=5) as parts:
+                for presigned_url_object, data in parts:
+                    parts.release(data)
+        assert parts._num_allocated_buffers == 0
+
+    def test_stream_parts_end_with_the_stream(self):
+        file = io.BytesIO(b"x" * 25)
+        parts = FileParts(file, get_presigned_urls(10), 10, num_buffers=2)
+        part_numbers = []
+        for presigned_url_object, data in parts:
+            part_numbers.append(presigned_url_object["partNumber"])
+            parts.release(data)
+        assert part_numbers == [1, 2, 3]
+        assert parts.num_bytes == 25
+
+    def test_empty_file_is_uploaded_as_one_empty_part(self):
+        parts = FileParts(io.BytesIO(), get_presigned_urls(2), 10)
+        assert [(url["partNumber"], bytes(data)) for url, data in parts] == [(1, b"")]
+
+    def test_parts_are_hashed_in_order_including_skipped_parts(self, tmpdir):
+        content = b"0123456789abcdefghijklmnopqrstuvwxyz"
+        file_path = tmpdir.join("submission.txt")
+        file_path.write_binary(content)
+        for file in (open(str(file_path), "rb"), io.BytesIO(content)):
+            with file, FileParts(file, get_presigned_urls(4), 10, {2}) as parts:
+                for presigned_url_object, data in parts:
+                    parts.release(data)
+            assert parts.content_hash == hashlib.sha256(content).hexdigest()
+
+    def test_buffered_parts_fail_when_file_outgrows_upload(self):
+        file = io.BytesIO(b"x" * 25)
+        parts = FileParts(file, get_presigned_urls(2), 10, num_buffers=2)
+        with pytest.raises(ValueError):
+            list(parts)
+
+
+class TestUploadParts:
+    @responses.activate
+    def test_upload_parts_returns_parts_in_order(self):
+        presigned_urls = get_presigned_urls(5)
+        for presigned_url in presigned_urls:
+            responses.add(
+                responses.PUT,
+                presigned_url["url"],
+                headers={"ETag": "etag-{}".format(presigned_url["partNumber"])},
+                status=200,
+            )
+        file = io.BytesIO(b"x" * 45)
+        uploaded = []
+        parts = upload_parts(
+            FileParts(file, presigned_urls, 10, num_buffers=4),
+            3,
+            lambda part_number, etag: uploaded.append(part_number),
+        )
+
+        assert parts == [
+            {"ETag": "etag-{}".format(part_number), "PartNumber": part_number}
+            for part_number in range(1, 6)
+        ]
+        assert sorted(uploaded) == [1, 2, 3, 4, 5]
+        sizes = sorted(
+            (call.request.url, call.request.headers["Content-Length"])
+            for call in responses.calls
+        )
+        assert sizes[-1] == (PART_URL.format(5), "5")
+
+    @responses.activate
+    def test_upload_parts_raises_on_failed_part(self):
+        presigned_urls = get_presigned_urls(2)
+        responses.add(
+            responses.PUT,
+            presigned_urls[0]["url"],
+            headers={"ETag": "etag-1"},
+            status=200,
+        )
+        responses.add(responses.PUT, presigned_urls[1]["url"], status=403)
+        file = io.BytesIO(b"x" * 20)
+        with pytest.raises(HTTPError):
+            upload_parts(FileParts(file, presigned_urls, 10, num_buffers=3), 2)
+
+
+class TestUploadJournal:
+    @pytest.fixture(autouse=True)
+    def journal_dir(self, monkeypatch, tmpdir):
+        monkeypatch.setattr(uploads, "UPLOAD_JOURNAL_DIR", str(tmpdir))
+
+    def test_journal_records_completed_parts(self):
+        upload = {"upload_id": "abc", "presigned_urls": get_presigned_urls(3)}
+        journal = UploadJournal.create("hash", 2, "submission", upload)
+        journal.record_part(1, "etag-1")
+        journal.record_part(3, "etag-3")
+
+        journal = UploadJournal.load("hash", 2, "submission")
+        assert journal.upload == upload
+        assert journal.parts == {1: "etag-1", 3: "etag-3"}
+        assert UploadJournal.load("hash", 3, "submission") is None
+
+        journal.delete()
+        assert UploadJournal.load("hash", 2, "submission") is None
+
+    def test_journal_is_only_readable_by_the_user(self):
+        journal = UploadJournal.create("hash", 2, "submission", {})
+        assert stat.S_IMODE(os.stat(journal.path).st_mode) == 0o600
+
+    def test_journal_ignores_incomplete_last_line(self):
+        journal = UploadJournal.create("hash", 2, "submission", {})
+        journal.record_part(1, "etag-1")
+        with open(journal.path, "a") as fw:
+            fw.write('{"PartNumber": 2, "ET')
+        assert UploadJournal.load("hash", 2, "submission").parts == {
+            1: "etag-1"
+        }
+
+    @responses.activate
+    def test_upload_skips_parts_in_journal(self, tmpdir):
+        presigned_urls = get_presigned_urls(3)
+        for presigned_url in presigned_urls[1:]:
+            responses.add(
+                responses.PUT,
+                presigned_url["url"],
+                headers={"ETag": "etag-{}".format(presigned_url["partNumber"])},
+                status=200,
+            )
+        journal = UploadJournal.create("hash", 2, "submission", {})
+        journal.record_part(1, "etag-1")
+        file_path = tmpdir.join("submission.txt")
+        file_path.write("x" * 25)
+        with open(str(file_path), "rb") as file:
+            response = upload_file_to_s3(file, presigned_urls, 10, 2, journal)
+
+        assert response["success"]
+        assert [part["ETag"] for part in response["parts"]] == [
+            "etag-1",
+            "etag-2",
+            "etag-3",
+        ]
+        assert len(responses.calls) == 2
+        assert UploadJournal.load("hash", 2, "submission").parts == {
+            1: "etag-1",
+            2: "etag-2",
+            3: "etag-3",
+        }
+
+
+class TestSubmissionIndex:
+    def test_concurrent_submissions_are_all_indexed(self, monkeypatch, tmpdir):
+        monkeypatch.setattr(
+            uploads,
+            "SUBMISSION_INDEX_FILE_PATH",
+            str(tmpdir.join("submission_index.json")),
+        )
+
+        def submit(number):
+            uploads.index_submission(
+                "hash-{}".format(number), 2, number, "submitted", "file.txt"
+            )
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            list(executor.map(submit, range(40)))
+        assert len(uploads.read_submission_index()) == 40
+
+
+class TestUploadPartRetries:
+    @pytest.fixture(autouse=True)
+    def no_backoff(self, monkeypatch):
+        monkeypatch.setattr(uploads, "get_backoff_delay", lambda attempt: 0)
+
+    @responses.activate
+    def test_transient_errors_are_retried(self):
+        url = PART_URL.format(1)
+        responses.add(responses.PUT, url, status=503)
+        responses.add(responses.PUT, url, body=ConnectionError())
+        responses.add(responses.PUT, url, headers={"ETag": "etag-1"})
+        assert upload_part(url, b"data", 3) == "etag-1"
+        assert len(responses.calls) == 3
+
+    @responses.activate
+    def test_client_errors_are_not_retried(self):
+        url = PART_URL.format(1)
+        responses.add(responses.PUT, url, status=403)
+        with pytest.raises(HTTPError):
+            upload_part(url, b"data", 3)
+        assert len(responses.calls) == 1
+
+    @responses.activate
+    def test_retries_stop_when_budget_is_exhausted(self):
+        url = PART_URL.format(1)
+        responses.add(responses.PUT, url, status=500)
+        with pytest.raises(HTTPError):
+            upload_part(url, b"data", 5, RetryBudget(1))
+        assert len(responses.calls) == 2
+
+
+class TestUploadPartChecksums:
+    @pytest.fixture(autouse=True)
+    def no_backoff(self, monkeypatch):
+        monkeypatch.setattr(uploads, "get_backoff_delay", lambda attempt: 0)
+
+    @responses.activate
+    def test_etag_matching_the_part_is_accepted(self):
+        url = PART_URL.format(1)
+        etag = '"{}"'.format(hashlib.md5(b"data").hexdigest())
+        responses.add(responses.PUT, url, headers={"ETag": etag})
+        assert upload_part(url, b"data", 3, checksum="etag") == etag
+
+    @responses.activate
+    def test_corrupted_part_is_retried(self):
+        url = PART_URL.format(1)
+        etag = '"{}"'.format(hashlib.md5(b"data").hexdigest())
+        responses.add(responses.PUT, url, headers={"ETag": '"{}"'.format("0" * 32)})
+        responses.add(responses.PUT, url, headers={"ETag": etag})
+        assert upload_part(url, b"data", 3, checksum="etag") == etag
+        assert len(responses.calls) == 2
+
+    @responses.activate
+    def test_corrupted_part_fails_after_all_attempts(self):
+        url = PART_URL.format(1)
+        responses.add(responses.PUT, url, headers={"ETag": '"{}"'.format("0" * 32)})
+        with pytest.raises(PartChecksumError):
+            upload_part(url, b"data", 2, checksum="etag")
+
+    @responses.activate
+    def test_repeated_etag_mismatch_is_not_retried(self):
+        url = PART_URL.format(1)
+        responses.add(responses.PUT, url, headers={"ETag": '"{}"'.format("0" * 32)})
+        with pytest.raises(PartChecksumError):
+            upload_part(url, b"data", 5, checksum="etag")
+        assert len(responses.calls) == 2
+
+    @responses.activate
+    def test_etags_of_encrypted_parts_are_not_checked(self):
+        url = PART_URL.format(1)
+        etag = '"{}"'.format("0" * 32)
+        for headers in (
+            {"x-amz-server-side-encryption": "aws:kms"},
+            {"x-amz-server-side-encryption-customer-algorithm": "AES256"},
+        ):
+            responses.add(responses.PUT, url, headers=dict(headers, ETag=etag))
+            assert upload_part(url, b"data", 3, checksum="etag") == etag
+        assert len(responses.calls) == 2
+
+    @responses.activate
+    def test_empty_part_is_sent_with_content_length(self, monkeypatch):
+        url = PART_URL.format(1)
+        etag = '"{}"'.format(hashlib.md5(b"").hexdigest())
+        responses.add(responses.PUT, url, headers={"ETag": etag})
+        session = get_session()
+        bodies = []
+        put = session.put
+        monkeypatch.setattr(
+            session,
+            "put",
+            lambda url, data, **kwargs: bodies.append(data) or put(url, data=data, **kwargs),
+        )
+        assert upload_part(url, memoryview(bytearray(0)), 1, checksum="etag") == etag
+        monkeypatch.setattr(uploads, "get_rate_limiter", lambda: TokenBucket(1024))
+        upload_part(url, memoryview(bytearray(0)), 1, checksum="etag")
+        # Empty streams would be sent chunked, which S3 rejects
+        for body in bodies:
+            headers = requests.Request("PUT", url, data=body).prepare().headers
+            assert headers["Content-Length"] == "0"
+            assert "Transfer-Encoding" not in headers
+        for call in responses.calls:
+            assert call.request.headers["Content-Length"] == "0"
+
+    @responses.activate
+    def test_content_md5_is_sent(self):
+        url = PART_URL.format(1)
+        responses.add(responses.PUT, url, headers={"ETag": "etag-1"})
+        upload_part(url, b"data", 1, checksum="content-md5")
+        expected = base64.b64encode(hashlib.md5(b"data").digest()).decode()
+        assert responses.calls[0].request.headers["Content-MD5"] == expected
+
+
+class TestMultipartEncoder:
+    def test_header_params_are_escaped(self):
+        body = MultipartEncoder({'a"b': "1"}, {})
+        assert (
+            b'Content-Disposition: form-data; name="a%22b"' in b"".join(body)
+        )
+        header = body._get_part_header("file", 'sub"mission\r\n.txt')
+        assert header.endswith(
+            b'name="file"; filename="sub%22mission%0D%0A.txt"\r\n\r\n'
+        )
+
+    def test_body_is_streamed_with_known_length(self, tmpdir):
+        file_path = tmpdir.join("submission.txt")
+        file_path.write("1 2 3 4 5 6")
+        sent = []
+        with open(str(file_path), "rb") as file:
+            body = MultipartEncoder(
+                {"status": "submitting", "is_public": None, "count": 2},
+                {"input_file": file},
+                chunk_size=4,
+                callback=sent.append,
+            )
+            content = b"".join(body)
+            # A second pass, as on a retry, yields the same body
+            assert b"".join(body) == content
+            assert len(body) == len(content) == sum(sent) // 2
+
+        boundary = body.boundary.encode()
+        assert content == (
+            b"--" + boundary + b"\r\n"
+            b'Content-Disposition: form-data; name="status"\r\n\r\n'
+            b"submitting\r\n"
+            b"--" + boundary + b"\r\n"
+            b'Content-Disposition: form-data; name="count"\r\n\r\n'
+            b"2\r\n"
+            b"--" + boundary + b"\r\n"
+            b'Content-Disposition: form-data; name="input_file"; '
+            b'filename="submission.txt"\r\n\r\n'
+            b"1 2 3 4 5 6\r\n"
+            b"--" + boundary + b"--\r\n"
+        )